@@ -0,0 +1,412 @@
+"""Нагрузочное тестирование HTTP API: пропускная способность и гистограммы задержек.
+
+Запуск:
+    python benchmarks/load_test.py --artifact server/mushrooms_model.pkl --concurrency 8 --duration 30
+    python benchmarks/load_test.py --url http://localhost:8000 --mix predict=1,predict_proba_batch=1
+    python benchmarks/load_test.py ... --output results.json --compare previous.json
+
+Без --url сервис запускается через uvicorn в отдельном процессе (порт
+выбирается свободный, число воркеров - --workers); с --artifact модель
+кладётся во временный реестр, иначе используется реестр из окружения.
+Нагрузку дают --concurrency потоков, у каждого своё keep-alive соединение
+(только стандартная библиотека). Эндпоинт каждого запроса выбирается по
+весам --mix, тела запросов заранее сгенерированы из benchmarks/synthetic.py,
+пакетные запросы содержат --batch-size грибов. Первые --warmup секунд не
+учитываются.
+
+Для каждого эндпоинта и в целом считаются запросы и строки в секунду,
+p50/p95/p99/max задержки, гистограмма задержек и доля ошибок; для
+запущенного сервиса - загрузка CPU и RSS (сумма по процессу uvicorn и его
+воркерам, из /proc). Результат в JSON (--output) содержит настройки,
+коммит и машину, чтобы сравнивать прогоны между коммитами (--compare).
+Клиент и сервер делят CPU машины: для честных цифр на одном CPU
+клиенту нужно немного потоков.
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCHMARKS_DIR)
+SERVER_DIR = os.path.join(ROOT_DIR, "server")
+sys.path.insert(0, SERVER_DIR)
+sys.path.insert(0, BENCHMARKS_DIR)
+
+ENDPOINTS = ("predict", "predict_proba", "predict_batch", "predict_proba_batch")
+BATCH_ENDPOINTS = ("predict_batch", "predict_proba_batch")
+# верхние границы корзин гистограммы, мс (последняя корзина - всё, что больше)
+HISTOGRAM_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+# сколько разных тел запросов заготавливается для каждого эндпоинта
+PAYLOADS_PER_ENDPOINT = 64
+STARTUP_TIMEOUT = 60
+SAMPLE_INTERVAL = 0.5
+
+
+def parse_mix(mix: str) -> dict:
+    """Веса эндпоинтов из строки вида "predict=4,predict_batch=1"
+
+    Raises:
+        ValueError: неизвестный эндпоинт или неположительный вес
+    """
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"Неизвестный эндпоинт {name!r}, доступны: {', '.join(ENDPOINTS)}")
+        weights[name] = float(weight or 1)
+        if weights[name] <= 0:
+            raise ValueError(f"Вес эндпоинта {name} должен быть положительным")
+    return weights
+
+
+def make_payloads(endpoint: str, batch_size: int, seed: int) -> list:
+    """Заготовленные запросы эндпоинта: (метод, путь, тело, заголовки, строк)"""
+    from synthetic import make_rows
+
+    rows_per_request = batch_size if endpoint in BATCH_ENDPOINTS else 1
+    rows = make_rows(PAYLOADS_PER_ENDPOINT * rows_per_request, seed)
+    payloads = []
+    for i in range(PAYLOADS_PER_ENDPOINT):
+        chunk = rows[i * rows_per_request:(i + 1) * rows_per_request]
+        if endpoint == "predict":
+            payloads.append(("GET", "/predict/?" + urlencode(chunk[0]), None, {}, 1))
+        elif endpoint == "predict_proba":
+            payloads.append(("GET", "/predict/predict_proba?" + urlencode(chunk[0]), None, {}, 1))
+        elif endpoint == "predict_batch":
+            body = json.dumps(chunk).encode()
+            payloads.append(("POST", "/predict/predict_batch", body,
+                             {"Content-Type": "application/json"}, len(chunk)))
+        else:
+            params = [(key, value) for row in chunk for key, value in row.items()]
+            payloads.append(("GET", "/predict/predict_proba_batch?" + urlencode(params), None, {},
+                             len(chunk)))
+    return payloads
+
+
+def percentile(values: list, q: float) -> float:
+    """Перцентиль q (0-100) отсортированного списка (ближайший ранг)"""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, round(q / 100 * len(values)) - 1))
+    return values[index]
+
+
+def histogram(latencies_ms: list) -> list:
+    """Гистограмма задержек: [{"le_ms": граница или None, "count": n}, ...]"""
+    counts = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+    for value in latencies_ms:
+        for i, bound in enumerate(HISTOGRAM_BOUNDS_MS):
+            if value <= bound:
+                counts[i] += 1
+                break
+        else:
+            counts[-1] += 1
+    return [{"le_ms": bound, "count": count}
+            for bound, count in zip(list(HISTOGRAM_BOUNDS_MS) + [None], counts)]
+
+
+def summarize(samples: list, elapsed: float) -> dict:
+    """Сводка по замерам (задержка, мс; строк; статус или текст ошибки)"""
+    latencies = sorted(latency for latency, _, _ in samples)
+    errors = {}
+    for _, _, status in samples:
+        if status != 200:
+            errors[str(status)] = errors.get(str(status), 0) + 1
+    error_count = sum(errors.values())
+    return {
+        "requests": len(samples),
+        "requests_per_s": len(samples) / elapsed if elapsed else 0.0,
+        "rows_per_s": sum(rows for _, rows, status in samples if status == 200) / elapsed if elapsed else 0.0,
+        "error_rate": error_count / len(samples) if samples else 0.0,
+        "errors": errors,
+        "latency_ms": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": latencies[-1] if latencies else 0.0,
+            "mean": sum(latencies) / len(latencies) if latencies else 0.0,
+        },
+        "histogram": histogram(latencies),
+    }
+
+
+class ServerProcess:
+    """uvicorn с сервисом в отдельном процессе"""
+    def __init__(self, workers: int, env: dict):
+        """Запуск uvicorn на свободном порту
+
+        Args:
+            workers (int): число воркеров uvicorn
+            env (dict): дополнительные переменные окружения сервиса
+        """
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", SERVER_DIR,
+             "--host", "127.0.0.1", "--port", str(self.port), "--workers", str(workers),
+             "--log-level", "warning", "--no-access-log"],
+            cwd=SERVER_DIR, env={**os.environ, **env},
+        )
+
+    def wait_ready(self, timeout: float = STARTUP_TIMEOUT) -> None:
+        """Ожидание, пока сервис не начнёт отвечать
+
+        Raises:
+            RuntimeError: процесс завершился или не ответил за timeout секунд
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"uvicorn завершился с кодом {self.process.returncode}")
+            try:
+                connection = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+                connection.request("GET", "/predict/status")
+                status = connection.getresponse().status
+                connection.close()
+                if status == 200:
+                    return
+            except OSError:
+                pass
+            time.sleep(0.2)
+        raise RuntimeError(f"Сервис не ответил за {timeout} с")
+
+    def pids(self) -> list:
+        """PID процесса uvicorn и всех его потомков (воркеров)"""
+        pids, queue = [], [self.process.pid]
+        while queue:
+            pid = queue.pop()
+            pids.append(pid)
+            try:
+                for task in os.listdir(f"/proc/{pid}/task"):
+                    with open(f"/proc/{pid}/task/{task}/children") as f:
+                        queue.extend(int(child) for child in f.read().split())
+            except OSError:
+                continue
+        return pids
+
+    def stop(self) -> None:
+        """Остановка uvicorn"""
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+def process_usage(pids: list) -> tuple:
+    """Суммарное процессорное время (с) и RSS (байт) процессов из /proc"""
+    ticks = os.sysconf("SC_CLK_TCK")
+    page = os.sysconf("SC_PAGE_SIZE")
+    cpu, rss = 0.0, 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                # поле comm может содержать пробелы: разбираем то, что после ")"
+                fields = f.read().rsplit(")", 1)[1].split()
+            with open(f"/proc/{pid}/statm") as f:
+                rss += int(f.read().split()[1]) * page
+        except OSError:
+            continue
+        cpu += (int(fields[11]) + int(fields[12])) / ticks
+    return cpu, rss
+
+
+class ResourceSampler(threading.Thread):
+    """Фоновый сбор загрузки CPU и RSS сервиса"""
+    def __init__(self, server: ServerProcess):
+        super().__init__(daemon=True)
+        self.server = server
+        self.samples = []
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            cpu, rss = process_usage(self.server.pids())
+            self.samples.append((time.monotonic(), cpu, rss))
+            self.stopped.wait(SAMPLE_INTERVAL)
+
+    def summary(self, since: float) -> dict:
+        """CPU (% одного ядра) и RSS (МБ) сервиса после момента since"""
+        samples = [sample for sample in self.samples if sample[0] >= since]
+        if len(samples) < 2:
+            return {}
+        elapsed = samples[-1][0] - samples[0][0]
+        rss = [sample[2] / (1 << 20) for sample in samples]
+        return {
+            "cpu_percent": 100 * (samples[-1][1] - samples[0][1]) / elapsed,
+            "rss_mb_mean": sum(rss) / len(rss),
+            "rss_mb_max": max(rss),
+        }
+
+
+def worker(url: str, payloads: dict, weights: dict, deadline: float, seed: int,
+           timeout: float, results: list) -> None:
+    """Поток нагрузки: запросы по одному keep-alive соединению до deadline"""
+    rng = random.Random(seed)
+    names, shares = list(weights), list(weights.values())
+    parts = urlsplit(url)
+    connection = None
+    while time.monotonic() < deadline:
+        endpoint = rng.choices(names, shares)[0]
+        method, path, body, headers, rows = rng.choice(payloads[endpoint])
+        started = time.monotonic()
+        try:
+            if connection is None:
+                connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=timeout)
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException) as e:
+            status = type(e).__name__
+            if connection is not None:
+                connection.close()
+            connection = None
+        results.append((started, endpoint, (time.monotonic() - started) * 1e3, rows, status))
+    if connection is not None:
+        connection.close()
+
+
+def run_load(url: str, weights: dict, batch_size: int, concurrency: int, duration: float,
+             warmup: float, timeout: float, seed: int) -> tuple:
+    """Нагрузка на сервис
+
+    Returns:
+        tuple: (сводка по эндпоинтам и в целом, момент начала учёта замеров)
+    """
+    payloads = {endpoint: make_payloads(endpoint, batch_size, seed + i)
+                for i, endpoint in enumerate(weights)}
+    started = time.monotonic()
+    measured_from = started + warmup
+    deadline = measured_from + duration
+    results = []
+    threads = [threading.Thread(target=worker, args=(url, payloads, weights, deadline, seed + i,
+                                                     timeout, results))
+               for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    measured = [r for r in results if r[0] >= measured_from]
+    report = {"total": summarize([(r[2], r[3], r[4]) for r in measured], duration)}
+    for endpoint in weights:
+        report[endpoint] = summarize([(r[2], r[3], r[4]) for r in measured if r[1] == endpoint], duration)
+    return report, measured_from
+
+
+def git_commit() -> str | None:
+    """Текущий коммит репозитория (если git доступен)"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report: dict, previous: dict | None = None) -> None:
+    """Таблица результатов (и изменение к предыдущему прогону)"""
+    print(f"{'эндпоинт':<22}{'запр/с':>10}{'строк/с':>11}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}{'ошибки':>9}")
+    for name, r in report["endpoints"].items():
+        latency = r["latency_ms"]
+        print(f"{name:<22}{r['requests_per_s']:>10.1f}{r['rows_per_s']:>11.0f}{latency['p50']:>9.1f}"
+              f"{latency['p95']:>9.1f}{latency['p99']:>9.1f}{latency['max']:>9.1f}{r['error_rate']:>9.1%}")
+        before = (previous or {}).get("endpoints", {}).get(name)
+        if before:
+            print(f"{'  к предыдущему':<22}{r['requests_per_s'] / max(before['requests_per_s'], 1e-9) - 1:>+10.0%}"
+                  f"{'':>11}{latency['p50'] / max(before['latency_ms']['p50'], 1e-9) - 1:>+9.0%}"
+                  f"{latency['p95'] / max(before['latency_ms']['p95'], 1e-9) - 1:>+9.0%}"
+                  f"{latency['p99'] / max(before['latency_ms']['p99'], 1e-9) - 1:>+9.0%}")
+    print("гистограмма задержек (все запросы), мс:")
+    for bucket in report["endpoints"]["total"]["histogram"]:
+        label = f"<= {bucket['le_ms']}" if bucket["le_ms"] is not None else f"> {HISTOGRAM_BOUNDS_MS[-1]}"
+        print(f"  {label:>9}: {bucket['count']}")
+    if report.get("server"):
+        server = report["server"]
+        print(f"сервер: CPU {server['cpu_percent']:.0f}%, RSS {server['rss_mb_mean']:.0f} МБ "
+              f"(макс. {server['rss_mb_max']:.0f} МБ)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="адрес уже запущенного сервиса (иначе запускается uvicorn)")
+    parser.add_argument("--workers", type=int, default=1, help="воркеры uvicorn")
+    parser.add_argument("--artifact", help="файл модели (.pkl) для временного реестра")
+    parser.add_argument("--mix", default="predict=1,predict_proba=1,predict_batch=1,predict_proba_batch=1",
+                        help="веса эндпоинтов")
+    parser.add_argument("--batch-size", type=int, default=100, help="грибов в пакетном запросе")
+    parser.add_argument("--concurrency", type=int, default=4, help="одновременных соединений")
+    parser.add_argument("--duration", type=float, default=30, help="длительность замера, с")
+    parser.add_argument("--warmup", type=float, default=3, help="неучитываемый разгон, с")
+    parser.add_argument("--timeout", type=float, default=30, help="таймаут запроса, с")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--env", action="append", default=[],
+                        help="переменная окружения сервиса KEY=VALUE (можно несколько)")
+    parser.add_argument("--output", help="файл для JSON с результатами")
+    parser.add_argument("--compare", help="JSON предыдущего прогона для сравнения")
+    args = parser.parse_args()
+
+    try:
+        weights = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+    server = sampler = None
+    url = args.url
+    if url is None:
+        env = dict(item.split("=", 1) for item in args.env)
+        if args.artifact:
+            import joblib
+            from ml.model_registry import ModelRegistry
+            models_dir = tempfile.mkdtemp(prefix="mushrooms-load-")
+            ModelRegistry(models_dir).save(joblib.load(args.artifact))
+            env["MUSHROOMS_MODELS_DIR"] = models_dir
+        server = ServerProcess(args.workers, env)
+    try:
+        if server is not None:
+            server.wait_ready()
+            url = server.url
+            sampler = ResourceSampler(server)
+            sampler.start()
+        endpoints, measured_from = run_load(url, weights, args.batch_size, args.concurrency,
+                                            args.duration, args.warmup, args.timeout, args.seed)
+    finally:
+        if sampler is not None:
+            sampler.stopped.set()
+            sampler.join()
+        if server is not None:
+            server.stop()
+
+    report = {
+        "commit": git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "cpus": os.cpu_count()},
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "endpoints": endpoints,
+        "server": sampler.summary(measured_from) if sampler is not None else {},
+    }
+    previous = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous = json.load(f)
+    print_report(report, previous)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Результаты записаны: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
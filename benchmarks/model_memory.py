@@ -0,0 +1,103 @@
+"""Память и время загрузки модели в нескольких воркерах: pickle против mmap.
+
+Запуск:
+    python benchmarks/model_memory.py --artifact server/mushrooms_model.pkl --workers 4
+
+Каждый воркер - отдельный процесс, как воркер uvicorn: загружает активную
+версию через ModelHandle, делает одно предсказание и сообщает время загрузки,
+RSS и PSS (доля общих страниц делится между процессами) из /proc.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "server")
+sys.path.insert(0, SERVER_DIR)
+
+
+def memory_kb() -> dict:
+    """RSS, PSS и приватная память процесса (кБ) из /proc/self/smaps_rollup"""
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return {
+        "rss_kb": fields.get("Rss", 0),
+        "pss_kb": fields.get("Pss", 0),
+        "private_kb": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
+
+
+def worker(models_dir: str, mmap: bool, barrier, results):
+    """Загрузка модели так же, как это делает воркер сервиса"""
+    import pandas as pd
+    from ml.model_registry import ModelHandle, ModelRegistry
+    from ml.prepared_data import prepared_data_inference
+
+    before = memory_kb()
+    start = time.perf_counter()
+    handle = ModelHandle(ModelRegistry(models_dir), legacy_path="", mmap=mmap)
+    load_time = time.perf_counter() - start
+    served = handle.current()
+    row = {"cap-shape": ["x"], "cap-surface": ["s"], "cap-color": ["n"],
+           "does-bruise-or-bleed": ["f"], "gill-attachment": ["a"], "gill-color": ["w"],
+           "stem-color": ["w"], "has-ring": ["f"], "ring-type": ["f"], "habitat": ["d"],
+           "season": ["a"], "cap-diameter": [5.0], "stem-height": [6.0], "stem-width": [1.0]}
+    prepared = prepared_data_inference(row)
+    if served.engine is not None:
+        served.engine.predict_proba(prepared)
+    else:
+        served.model.predict_proba(pd.DataFrame(prepared))
+    # замер после того, как все воркеры загрузили модель: общие страницы делятся между ними
+    barrier.wait()
+    after = memory_kb()
+    results.put({"load_s": load_time, **{k: after[k] - before[k] for k in after},
+                 "rss_total_kb": after["rss_kb"], "pss_total_kb": after["pss_kb"]})
+    barrier.wait()
+
+
+def measure(models_dir: str, mmap: bool, workers: int) -> dict:
+    """Запуск воркеров и сбор средних показателей"""
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(models_dir, mmap, barrier, results))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    rows = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return {key: round(sum(row[key] for row in rows) / len(rows), 3) for key in rows[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--artifact", help="файл модели (.pkl), который будет положен во временный реестр")
+    parser.add_argument("--models-dir", help="существующий реестр моделей")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    models_dir = args.models_dir
+    if models_dir is None:
+        import joblib
+        from ml.model_registry import ModelRegistry
+        models_dir = tempfile.mkdtemp(prefix="mushrooms-models-")
+        ModelRegistry(models_dir).save(joblib.load(args.artifact))
+    report = {}
+    for mode, mmap in (("pickle", False), ("mmap", True)):
+        # первый проход mmap выгружает массивы, замеряется второй
+        if mmap:
+            measure(models_dir, mmap, 1)
+        report[mode] = measure(models_dir, mmap, args.workers)
+    print(json.dumps({"workers": args.workers, **report}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Время подбора гиперпараметров с кэшем кодирования фолдов и без него.
+
+Запуск:
+    python benchmarks/search_cache.py --data data/train_mushrooms.zip --strategy capped --candidates 3
+
+Данные читаются и готовятся так же, как в MushroomsModel.preprocess_data,
+затем один и тот же подбор выполняется дважды: с cache_preprocessing и без.
+Печатается время подбора, время кодирования и доля сэкономленного времени.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "server")
+sys.path.insert(0, SERVER_DIR)
+
+
+def run(data: str, strategy: str, candidates: int) -> dict:
+    """Подбор с кэшем и без него на одних и тех же данных"""
+    from sklearn.metrics import f1_score, make_scorer
+    from sklearn.model_selection import train_test_split
+    from sklearn.pipeline import Pipeline
+    from ml.mushrooms_model import MushroomsModel
+    from ml.param_grid import param_grid
+    from ml.prepared_data import prepared_data
+    from ml.search import HyperparameterSearch
+    from utils.extract_csv_from_zip import open_csv_stream
+
+    with open(data, "rb") as f:
+        mushroom = MushroomsModel(open_csv_stream(f, data))
+    df = prepared_data(mushroom.df)
+    X, y = df.drop("class", axis=1), df["class"]
+    X_train, _, y_train, _ = train_test_split(X, y, random_state=42, test_size=0.25)
+    pipeline = Pipeline(steps=[("preprocessor", mushroom.make_preprocessor(X)),
+                               ("classifier", mushroom.model)])
+    report = {"rows": len(X_train), "strategy": strategy}
+    for cached in (True, False):
+        search = HyperparameterSearch(pipeline, param_grid, mushroom.kfold,
+                                      make_scorer(f1_score, average="binary"),
+                                      strategy=strategy, budget=0, n_candidates=candidates,
+                                      cache_preprocessing=cached)
+        started = time.perf_counter()
+        search.fit(X_train, y_train)
+        report["cached" if cached else "uncached"] = {
+            "elapsed_s": round(time.perf_counter() - started, 2),
+            "preprocess_s": round(search.preprocess_time, 2),
+            "fits": len(search.results) * mushroom.kfold.get_n_splits(),
+            "best_score": round(search.best_score_, 4),
+        }
+    saved = report["uncached"]["elapsed_s"] - report["cached"]["elapsed_s"]
+    report["saved_s"] = round(saved, 2)
+    report["saved_share"] = round(saved / report["uncached"]["elapsed_s"], 3)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", default="data/train_mushrooms.zip")
+    parser.add_argument("--strategy", default="capped")
+    parser.add_argument("--candidates", type=int, default=3)
+    args = parser.parse_args()
+    print(json.dumps(run(args.data, args.strategy, args.candidates), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""Бенчмарки горячих путей: подготовка данных, обучение и инференс.
+
+Запуск:
+    python benchmarks/suite.py                      # сравнение с benchmarks/baseline.json
+    python benchmarks/suite.py --save-baseline      # запись нового эталона
+    python benchmarks/suite.py --sizes 1,100,10000  # без миллиона строк
+
+Данные синтетические (benchmarks/synthetic.py), сеть не нужна, всё считается
+на CPU. Замеряются prepared_data, MushroomsModel.preprocess_data и fit_model
+(обучение на --train-rows строках, подбор - один кандидат сетки, см.
+MUSHROOMS_SEARCH_CANDIDATES) и предсказание predict/predict_proba
+(prepared_data_inference + модель, как в сервисе) для каждого размера пакета.
+Для каждого замера печатаются перцентили задержки, пропускная способность и
+пиковая память (tracemalloc, отдельным прогоном, чтобы не искажать время).
+Если медиана или пиковая память хуже эталона больше допуска, скрипт
+печатает регрессии и завершается с кодом 1.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVER_DIR = os.path.join(os.path.dirname(BENCHMARKS_DIR), "server")
+sys.path.insert(0, SERVER_DIR)
+sys.path.insert(0, BENCHMARKS_DIR)
+
+BASELINE_FILE = os.path.join(BENCHMARKS_DIR, "baseline.json")
+SIZES = (1, 100, 10_000, 1_000_000)
+# число повторов: много для маленьких пакетов, минимум 3 для больших
+MAX_REPEATS = 200
+MIN_REPEATS = 3
+ROWS_PER_REPEAT = 100_000
+
+
+def repeats_for(rows: int) -> int:
+    """Число повторов замера для пакета из rows строк"""
+    return max(MIN_REPEATS, min(MAX_REPEATS, ROWS_PER_REPEAT // max(rows, 1)))
+
+
+def percentile(values: list, q: float) -> float:
+    """Перцентиль q (0-100) по отсортированным значениям с интерполяцией"""
+    values = sorted(values)
+    position = (len(values) - 1) * q / 100
+    low = int(position)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+def peak_memory_mb(call) -> float:
+    """Пиковая память Python-аллокаций (включая буферы NumPy) за один вызов, МБ"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        call()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / (1 << 20)
+
+
+def measure(call, rows: int, repeats: int | None = None) -> dict:
+    """Задержки, пропускная способность и пиковая память вызова
+
+    Args:
+        call: функция без аргументов
+        rows (int): строк в одном вызове
+        repeats (int | None, optional): число повторов. По умолчанию repeats_for(rows).
+
+    Returns:
+        dict: p50_s, p95_s, p99_s, mean_s, rows_per_s, peak_mb, repeats
+    """
+    repeats = repeats or repeats_for(rows)
+    # прогрев: импорты, ленивые таблицы и кэши процессора (большим пакетам не нужен)
+    if rows < ROWS_PER_REPEAT:
+        call()
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - started)
+    p50 = percentile(timings, 50)
+    return {
+        "rows": rows,
+        "repeats": repeats,
+        "p50_s": p50,
+        "p95_s": percentile(timings, 95),
+        "p99_s": percentile(timings, 99),
+        "mean_s": sum(timings) / len(timings),
+        "rows_per_s": rows / p50 if p50 > 0 else float("inf"),
+        "peak_mb": peak_memory_mb(call),
+    }
+
+
+def measure_once(call, rows: int) -> dict:
+    """Однократный замер долгой операции (обучение) с пиковой памятью"""
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        call()
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"rows": rows, "repeats": 1, "p50_s": elapsed, "p95_s": elapsed, "p99_s": elapsed,
+            "mean_s": elapsed, "rows_per_s": rows / elapsed, "peak_mb": peak / (1 << 20)}
+
+
+def run(sizes: tuple, train_rows: int, strategy: str) -> dict:
+    """Все замеры на синтетических данных
+
+    Args:
+        sizes (tuple): размеры пакетов для prepared_data и инференса
+        train_rows (int): строк в обучающем файле
+        strategy (str): стратегия подбора гиперпараметров при обучении
+
+    Returns:
+        dict: имя замера -> показатели
+    """
+    workdir = tempfile.mkdtemp(prefix="mushrooms-bench-")
+    # обучение не должно трогать реестр моделей и кэш данных сервиса
+    os.environ["MUSHROOMS_MODELS_DIR"] = os.path.join(workdir, "models")
+    os.environ["MUSHROOMS_DATASET_CACHE_QUOTA_MB"] = "0"
+    # замеряется конвейер обучения, а не ширина подбора: один кандидат сетки
+    os.environ.setdefault("MUSHROOMS_SEARCH_CANDIDATES", "1")
+    import numpy as np
+    import pandas as pd
+    from ml.mushrooms_model import MushroomsModel
+    from ml.prepared_data import prepared_data, prepared_data_inference
+    from synthetic import make_columns, make_frame
+
+    results = {}
+    for rows in sizes:
+        frame = make_frame(rows)
+        results[f"prepared_data/{rows}"] = measure(lambda: prepared_data(frame), rows)
+        print(f"prepared_data/{rows}: {results[f'prepared_data/{rows}']['p50_s']:.4f} с", file=sys.stderr)
+
+    path = os.path.join(workdir, "train.csv")
+    make_frame(train_rows, seed=1).to_csv(path, index=False)
+    mushroom = MushroomsModel(path, strategy=strategy, budget=0)
+    results["preprocess_data"] = measure_once(mushroom.preprocess_data, train_rows)
+    results["fit_model"] = measure_once(mushroom.fit_model, train_rows)
+    if mushroom.pipeline is None:
+        raise RuntimeError("Модель не обучилась, см. лог")
+    print(f"preprocess_data: {results['preprocess_data']['p50_s']:.1f} с", file=sys.stderr)
+    model = mushroom.pipeline
+    classes = model.classes_
+
+    for rows in sizes:
+        columns = make_columns(rows, seed=2)
+
+        def predict_proba():
+            return model.predict_proba(pd.DataFrame(prepared_data_inference(columns)))
+
+        def predict():
+            return classes.take(np.argmax(predict_proba(), axis=1))
+
+        results[f"predict_proba/{rows}"] = measure(predict_proba, rows)
+        results[f"predict/{rows}"] = measure(predict, rows)
+        print(f"predict_proba/{rows}: {results[f'predict_proba/{rows}']['p50_s']:.4f} с", file=sys.stderr)
+    return results
+
+
+def compare(results: dict, baseline: dict, time_tolerance: float, memory_tolerance: float,
+            min_delta_s: float) -> list:
+    """Регрессии относительно эталона
+
+    Замер считается регрессией, если медиана задержки хуже эталона больше
+    чем на time_tolerance (и больше чем на min_delta_s - шум микросекундных
+    замеров не в счёт) или пиковая память больше чем на memory_tolerance.
+
+    Returns:
+        list: описания регрессий
+    """
+    regressions = []
+    for name, current in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        slower = current["p50_s"] - reference["p50_s"]
+        if slower > reference["p50_s"] * time_tolerance and slower > min_delta_s:
+            regressions.append(f"{name}: медиана {current['p50_s']:.4f} с, эталон {reference['p50_s']:.4f} с "
+                               f"(+{slower / reference['p50_s']:.0%})")
+        grown = current["peak_mb"] - reference["peak_mb"]
+        if grown > reference["peak_mb"] * memory_tolerance and grown > 1:
+            regressions.append(f"{name}: пиковая память {current['peak_mb']:.1f} МБ, "
+                               f"эталон {reference['peak_mb']:.1f} МБ (+{grown / reference['peak_mb']:.0%})")
+    return regressions
+
+
+def print_table(results: dict, baseline: dict) -> None:
+    """Таблица замеров с изменением медианы относительно эталона"""
+    print(f"{'замер':<28}{'p50, мс':>12}{'p95, мс':>12}{'p99, мс':>12}{'строк/с':>14}{'пик, МБ':>10}{'к эталону':>11}")
+    for name, r in results.items():
+        reference = baseline.get(name)
+        change = f"{r['p50_s'] / reference['p50_s'] - 1:+.0%}" if reference else "-"
+        print(f"{name:<28}{r['p50_s'] * 1e3:>12.3f}{r['p95_s'] * 1e3:>12.3f}{r['p99_s'] * 1e3:>12.3f}"
+              f"{r['rows_per_s']:>14.0f}{r['peak_mb']:>10.1f}{change:>11}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)),
+                        help="размеры пакетов через запятую")
+    parser.add_argument("--train-rows", type=int, default=12_000)
+    parser.add_argument("--strategy", default="capped", help="стратегия подбора при обучении")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true", help="записать результаты как эталон")
+    parser.add_argument("--time-tolerance", type=float, default=0.3, help="допустимое замедление медианы")
+    parser.add_argument("--memory-tolerance", type=float, default=0.2, help="допустимый рост пиковой памяти")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0,
+                        help="замедление меньше этого не считается регрессией")
+    parser.add_argument("--output", help="файл для JSON с результатами")
+    args = parser.parse_args()
+
+    sizes = tuple(int(size) for size in args.sizes.split(","))
+    results = run(sizes, args.train_rows, args.strategy)
+    report = {
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "cpus": os.cpu_count()},
+        "params": {"train_rows": args.train_rows, "strategy": args.strategy},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+        print_table(results, {})
+        print(f"Эталон записан: {args.baseline}")
+        return
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    print_table(results, baseline)
+    regressions = compare(results, baseline, args.time_tolerance, args.memory_tolerance,
+                          args.min_delta_ms / 1e3)
+    if regressions:
+        print("\nРЕГРЕССИИ ПРОИЗВОДИТЕЛЬНОСТИ:", file=sys.stderr)
+        for line in regressions:
+            print(f"  {line}", file=sys.stderr)
+        sys.exit(1)
+    print("\nРегрессий нет")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Синтетические грибы для бенчмарков.
+
+Категории берутся из перечислений API (ml.prepared_data.COLUMN_ENUMS,
+коды совпадают с кодами обучающего датасета), размеры - равномерно из
+допустимых диапазонов MushroomModel. Класс задаётся простым правилом с
+шумом, чтобы модели было чему учиться. Данные генерируются без сети.
+"""
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "server")
+if SERVER_DIR not in sys.path:
+    sys.path.insert(0, SERVER_DIR)
+
+from app.models import MushroomModel  # noqa: E402
+from ml.prepared_data import COLUMN_ENUMS, SIZE_COLUMNS  # noqa: E402
+
+
+def size_ranges() -> dict:
+    """Допустимые диапазоны размеров (ge/le полей MushroomModel), имя столбца -> (min, max)"""
+    ranges = {}
+    for column in SIZE_COLUMNS:
+        field = MushroomModel.model_fields[column.replace("-", "_")]
+        bounds = {}
+        for constraint in field.metadata:
+            for name in ("ge", "le"):
+                if getattr(constraint, name, None) is not None:
+                    bounds[name] = float(getattr(constraint, name))
+        ranges[column] = (bounds.get("ge", 0.0), bounds["le"])
+    return ranges
+
+
+def make_columns(n: int, seed: int = 0) -> dict:
+    """Столбцы запроса на предсказание (коды датасета и размеры)
+
+    Args:
+        n (int): количество строк
+        seed (int, optional): зерно генератора. По умолчанию 0.
+
+    Returns:
+        dict: имя столбца -> np.ndarray
+    """
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for column, enum in COLUMN_ENUMS.items():
+        codes = np.array([member.name for member in enum], dtype=object)
+        columns[column] = codes[rng.integers(0, len(codes), n)]
+    for column, (low, high) in size_ranges().items():
+        columns[column] = np.round(rng.uniform(low, high, n), 2)
+    return columns
+
+
+def make_frame(n: int, seed: int = 0) -> pd.DataFrame:
+    """Датафрейм в формате обучающего CSV (с id и class)
+
+    Args:
+        n (int): количество строк
+        seed (int, optional): зерно генератора. По умолчанию 0.
+
+    Returns:
+        pd.DataFrame: синтетические данные
+    """
+    rng = np.random.default_rng(seed + 1)
+    df = pd.DataFrame({"id": np.arange(n), **make_columns(n, seed)})
+    signal = (df["cap-diameter"] > 20) ^ (df["season"] == "a") ^ (df["habitat"] == "d")
+    df["class"] = np.where(rng.random(n) < 0.9, signal, ~signal).astype(int)
+    return df
+
+
+def make_rows(n: int, seed: int = 0) -> list:
+    """Грибы в формате запросов API: поля MushroomModel, категории - подписи перечислений
+
+    Args:
+        n (int): количество грибов
+        seed (int, optional): зерно генератора. По умолчанию 0.
+
+    Returns:
+        list: словари с полями MushroomModel
+    """
+    columns = make_columns(n, seed)
+    labels = {column: {member.name: member.value for member in enum}
+              for column, enum in COLUMN_ENUMS.items()}
+    rows = []
+    for i in range(n):
+        row = {}
+        for column, values in columns.items():
+            value = values[i]
+            row[column.replace("-", "_")] = labels[column][value] if column in labels else float(value)
+        rows.append(row)
+    return rows
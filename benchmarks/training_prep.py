@@ -0,0 +1,105 @@
+"""Где тратится время подготовки обучающих данных: чтение файла или prepared_data.
+
+Запуск:
+    python benchmarks/training_prep.py --rows 100000,1000000,3000000
+
+Для каждого размера синтетический обучающий CSV (benchmarks/synthetic.py)
+читается так же, как в MushroomsModel: read_training_data разбирает файл
+чанками и оставляет выборку из SAMPLE_SIZE строк, затем prepared_data
+очищает её и сворачивает категории. Для сравнения prepared_data
+замеряется и на всём файле - столько стоила бы очистка без выборки.
+Печатается JSON с временами (медиана из --repeats прогонов) и числом строк.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVER_DIR = os.path.join(os.path.dirname(BENCHMARKS_DIR), "server")
+sys.path.insert(0, SERVER_DIR)
+sys.path.insert(0, BENCHMARKS_DIR)
+
+
+def median_time(call, repeats: int) -> tuple:
+    """Медиана времени вызова и результат последнего вызова"""
+    timings, result = [], None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = call()
+        timings.append(time.perf_counter() - started)
+    return sorted(timings)[len(timings) // 2], result
+
+
+def prepare_unbounded(df):
+    """prepared_data без ограничения выборки: очистка всего файла"""
+    import ml.prepared_data as module
+
+    sample_size = module.SAMPLE_SIZE
+    module.SAMPLE_SIZE = len(df)
+    try:
+        return module.prepared_data(df)
+    finally:
+        module.SAMPLE_SIZE = sample_size
+
+
+def run(sizes: tuple, repeats: int) -> dict:
+    """Замеры чтения и подготовки для каждого размера файла
+
+    Args:
+        sizes (tuple): строк в обучающем файле
+        repeats (int): прогонов каждого замера
+
+    Returns:
+        dict: размер -> показатели
+    """
+    import pandas as pd
+    from ml.ingestion import read_training_data
+    from ml.prepared_data import prepared_data
+    from synthetic import make_frame
+
+    workdir = tempfile.mkdtemp(prefix="mushrooms-bench-")
+    results = {}
+    for rows in sizes:
+        path = os.path.join(workdir, f"train-{rows}.csv")
+        make_frame(rows, seed=1).to_csv(path, index=False)
+        read_s, sample = median_time(lambda: read_training_data(path), repeats)
+        prepare_sample_s, _ = median_time(lambda: prepared_data(sample), repeats)
+        full = pd.read_csv(path)
+        prepare_full_s, _ = median_time(lambda: prepare_unbounded(full), repeats)
+        results[rows] = {
+            "file_mb": round(os.path.getsize(path) / (1 << 20), 1),
+            "sample_rows": len(sample),
+            "read_training_data_s": round(read_s, 3),
+            "prepared_data_sample_s": round(prepare_sample_s, 4),
+            "prepared_data_full_s": round(prepare_full_s, 3),
+        }
+        print(f"{rows}: {results[rows]}", file=sys.stderr)
+        os.remove(path)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", default="100000,1000000,3000000", help="размеры файлов через запятую")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", help="файл для JSON с результатами")
+    args = parser.parse_args()
+
+    report = {
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "cpus": os.cpu_count()},
+        "results": run(tuple(int(rows) for rows in args.rows.split(",")), args.repeats),
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,162 @@
+import asyncio
 import json
 import os
 import requests
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from typing import List
 from urllib.parse import urlencode
-from data import data_list
+from data import data as data_list
 from server.utils.logger import log
 
+try:
+    import msgpack
+except ImportError:  # без MessagePack столбцы отправляются в JSON
+    msgpack = None
+
+try:
+    import httpx
+except ImportError:  # httpx нужен только асинхронному клиенту
+    httpx = None
+
+# с какого размера пакета predict_proba_batch отправляет данные по столбцам
+COLUMNAR_THRESHOLD = 50
+# размеры гриба: в MessagePack передаются байтами float64
+SIZE_FIELDS = ["cap_diameter", "stem_height", "stem_width"]
+# таймауты запроса, с: (установка соединения, ответ)
+REQUEST_TIMEOUT = (3.05, 60)
+# повторы при сетевых ошибках и временных ответах сервера, пауза backoff * 2^попытка
+RETRIES = 3
+BACKOFF = 0.5
+RETRY_STATUSES = (429, 502, 503, 504)
+# соединений в пуле сессии и одновременных запросов пакетных помощников
+POOL_SIZE = 10
+MAX_WORKERS = 4
+# грибов в одном запросе при разбиении большого списка
+CHUNK_SIZE = 1000
+
+
+def chunked(data: List[dict], size: int) -> List[List[dict]]:
+    """Разбиение списка грибов на части по size штук (порядок сохраняется)"""
+    if size < 1:
+        raise ValueError("Размер части должен быть положительным")
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def encode_columns(data: List[dict]) -> tuple:
+    """Тело запроса predict_proba_columns: столбцы в MessagePack или JSON
+
+    Args:
+        data (List[dict]): грибы
+
+    Returns:
+        tuple: (тело в байтах, заголовки)
+    """
+    columns = {key: [row[key] for row in data] for key in data[0]} if data else {}
+    if msgpack is None:
+        return json.dumps(columns).encode(), {"Content-Type": "application/json"}
+    for key in SIZE_FIELDS:
+        if key in columns:
+            columns[key] = struct.pack(f"<{len(data)}d", *columns[key])
+    return msgpack.packb(columns), {"Content-Type": "application/msgpack"}
+
+
+def decode_columns_response(content_type: str, content: bytes) -> dict:
+    """Ответ predict_proba_columns: вероятности списком чисел"""
+    if not content_type.startswith("application/msgpack"):
+        return json.loads(content)
+    result = msgpack.unpackb(content)
+    probabilities = result["probability_of_poisonous"]
+    if probabilities is not None:
+        result["probability_of_poisonous"] = list(
+            struct.unpack(f"<{len(probabilities) // 8}d", probabilities))
+    return result
+
+
+def merge_chunks(parts: list) -> list | dict:
+    """Склейка ответов частей в исходном порядке (или первая ошибка с номером части)"""
+    results = []
+    for i, part in enumerate(parts):
+        if isinstance(part, dict) and "error" in part:
+            return {**part, "chunk": i}
+        results.extend(part)
+    return results
+
+
+def probabilities_rows(result: dict) -> list | dict:
+    """Ответ predict_proba_columns в формате predict_proba_batch"""
+    if "error" in result or result["probability_of_poisonous"] is None:
+        return result
+    return [{"probability_of_poisonous": prob} for prob in result["probability_of_poisonous"]]
+
 
 class MushroomClient:
-    def __init__(self, base_url: str = "http://localhost:8000"):
+    def __init__(self, base_url: str = "http://localhost:8000", timeout: tuple = REQUEST_TIMEOUT,
+                 retries: int = RETRIES, backoff: float = BACKOFF, pool_size: int = POOL_SIZE,
+                 session=None):
         """Инициализация клиента
 
+        Все запросы идут через одну сессию requests с пулом keep-alive
+        соединений, поэтому соединение с сервером не устанавливается заново
+        на каждый запрос. Сессия потокобезопасна для пакетных помощников.
+
         Args:
             base_url (str, optional): url для подключения.
                      Defaults to "http://localhost:8000".
-        """        
+            timeout (tuple, optional): таймауты (соединение, ответ), с.
+            retries (int, optional): повторов при сетевых ошибках и ответах 429/502/503/504.
+            backoff (float, optional): начальная пауза между повторами, с.
+            pool_size (int, optional): соединений в пуле.
+            session (optional): готовая сессия (объект с методом request).
+        """
         self.base_url = base_url
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self.session = session
+
+    def close(self):
+        """Закрытие соединений пула"""
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _request(self, method: str, path: str, retries: int | None = None, **kwargs):
+        """Запрос с повторами при сетевых ошибках и временных ответах сервера
+
+        Args:
+            method (str): HTTP-метод
+            path (str): путь относительно base_url
+            retries (int | None, optional): число повторов. По умолчанию self.retries.
+
+        Returns:
+            requests.Response: последний ответ сервера
+        """
+        retries = self.retries if retries is None else retries
+        for attempt in range(retries + 1):
+            try:
+                response = self.session.request(method, f"{self.base_url}{path}",
+                                                timeout=self.timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == retries:
+                    raise
+                log.warning(f"{method} {path}: {e}, повтор {attempt + 1}/{retries}")
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt == retries:
+                    return response
+                log.warning(f"{method} {path}: код {response.status_code}, повтор {attempt + 1}/{retries}")
+            time.sleep(self.backoff * 2 ** attempt)
 
     def predict(self, data: dict) -> dict:
         """Определение(предсказывание) гриба: ядовитый или съедобный.
@@ -26,13 +167,13 @@ class MushroomClient:
         Returns:
             dict: Ответ сервера
         """
-        resp = requests.get(f"{self.base_url}/predict/", params=data)
-        log.info(f"Request: {resp.json()}, code: {resp.status_code}")
+        resp = self._request("GET", "/predict/", params=data)
+        log.info(f"Status code: {resp.status_code}")
         if resp.status_code == 200:
             return resp.json()
         else:
             return {"error": resp.text}
-    
+
     def predict_proba(self, data: dict) -> dict:
         """Определение(предсказывание) вероятности ядовитости гриба.
 
@@ -42,13 +183,13 @@ class MushroomClient:
         Returns:
             dict: Ответ сервера
         """
-        resp = requests.get(f"{self.base_url}/predict/predict_proba/", params=data)
-        log.info(f"Request: {resp.json()}, code: {resp.status_code}")
+        resp = self._request("GET", "/predict/predict_proba", params=data)
+        log.info(f"Status code: {resp.status_code}")
         if resp.status_code == 200:
             return resp.json()
         else:
             return {"error": resp.text}
-    
+
     def predict_batch(self, data: List[dict]) -> dict:
         """Определение(предсказывание) списка грибов: ядовитый или съедобный.
 
@@ -57,25 +198,48 @@ class MushroomClient:
 
         Returns:
             dict: Ответ сервера
-        """        
-        response = requests.post(
-            f"{self.base_url}/predict/predict_batch/",
-            json=data
-        )
-        log.info(f"Response: {response.json()}")
-        return response.json()
-    
+        """
+        response = self._request("POST", "/predict/predict_batch", json=data)
+        log.info(f"Status code: {response.status_code}, rows: {len(data)}")
+        if response.status_code == 200:
+            return response.json()
+        return {"error": response.text}
+
+    def predict_proba_columns(self, data: List[dict]) -> dict:
+        """Вероятности ядовитости списка грибов одним POST-запросом по столбцам.
+
+        Если установлен msgpack, тело и ответ передаются в MessagePack,
+        размеры - байтами little-endian float64.
+
+        Args:
+            data (List[dict]): данные для ввода
+
+        Returns:
+            dict: Ответ сервера {"probability_of_poisonous": [...]}
+        """
+        body, headers = encode_columns(data)
+        response = self._request("POST", "/predict/predict_proba_columns", data=body, headers=headers)
+        log.info(f"Status code: {response.status_code}, rows: {len(data)}")
+        if response.status_code != 200:
+            return {"error": response.text}
+        return decode_columns_response(response.headers.get("content-type", ""), response.content)
+
     def predict_proba_batch(self, data: List[dict]) -> dict:
         """Определение(предсказывание) вероятности ядовитости списка грибов.
 
+        Пакеты больше COLUMNAR_THRESHOLD отправляются по столбцам
+        (predict_proba_columns): длина URL не ограничивает размер пакета.
+
         Args:
             data (List[dict]): данные для ввода
 
         Returns:
             dict: Ответ сервера
-        """        
+        """
+        if len(data) > COLUMNAR_THRESHOLD:
+            return probabilities_rows(self.predict_proba_columns(data))
+
         # Формирование параметров GET-запроса
-        base_url = f"{self.base_url}/predict/predict_proba_batch?"
         params = []
         for row in data:
             for k, val in row.items():
@@ -83,44 +247,170 @@ class MushroomClient:
 
         # Кодировка параметров в URL
         query_string = urlencode(params)
-        url = base_url + query_string
+        response = self._request("GET", f"/predict/predict_proba_batch?{query_string}")
+        log.info(f"Status code: {response.status_code}, rows: {len(data)}")
+        return response.json()
 
-        log.info(f"GET url: {url}")
+    def _map_chunks(self, send, data: List[dict], chunk_size: int, max_workers: int) -> list | dict:
+        """Параллельная отправка частей списка и склейка ответов по порядку"""
+        chunks = chunked(data, chunk_size)
+        if len(chunks) <= 1:
+            return merge_chunks([send(chunk) for chunk in chunks])
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+            return merge_chunks(list(executor.map(send, chunks)))
 
-        # Отправка GET-запроса
-        response = requests.get(url)
-        log.info(f"Response: {response.json()}")
-        return response.json()
-    
-    def status(self) -> dict: 
+    def predict_batch_parallel(self, data: List[dict], chunk_size: int = CHUNK_SIZE,
+                               max_workers: int = MAX_WORKERS) -> list | dict:
+        """Ядовитость большого списка грибов: части по chunk_size параллельно
+
+        Args:
+            data (List[dict]): данные для ввода
+            chunk_size (int, optional): грибов в одном запросе
+            max_workers (int, optional): одновременных запросов
+
+        Returns:
+            list | dict: ответы в порядке data или первая ошибка с номером части
+        """
+        return self._map_chunks(self.predict_batch, data, chunk_size, max_workers)
+
+    def predict_proba_parallel(self, data: List[dict], chunk_size: int = CHUNK_SIZE,
+                               max_workers: int = MAX_WORKERS) -> list | dict:
+        """Вероятности ядовитости большого списка грибов: части по столбцам параллельно
+
+        Args:
+            data (List[dict]): данные для ввода
+            chunk_size (int, optional): грибов в одном запросе
+            max_workers (int, optional): одновременных запросов
+
+        Returns:
+            list | dict: ответы в формате predict_proba_batch в порядке data
+                         или первая ошибка с номером части
+        """
+        send = lambda chunk: probabilities_rows(self.predict_proba_columns(chunk))  # noqa: E731
+        return self._map_chunks(send, data, chunk_size, max_workers)
+
+    def status(self) -> dict:
         """Возвращает дату, когда модель была обучена.
 
         Returns:
             dict: Ответ сервера
-        """        
-        resp = requests.get(f"{self.base_url}/predict/status/")
-        log.info(f"Response: {resp.json()}")
+        """
+        resp = self._request("GET", "/predict/status")
+        log.info(f"Status code: {resp.status_code}")
         return resp.json()
-    
+
     def fit_model(self, file_name: str) -> dict:
         """Обучение модели на загруженном файле с данными.
 
+        Запрос не повторяется: повтор поставил бы в очередь второе обучение.
+
         Args:
             file_name (str): Имя файла
 
         Returns:
             dict: Ответ сервера
-        """        
+        """
         # Открытие файла в бинарном режиме
         filename = os.path.abspath(file_name)
         with open(filename, "rb") as f:
             files = {"filename": f}
-            response = requests.post(f"{self.base_url}/fit/", files=files)
+            response = self._request("POST", "/fit/", retries=0, files=files)
+
+        result = response.json()
+        log.info(f"Status code: {response.status_code}, response: {result}")
+        return result
+
+
+class AsyncMushroomClient:
+    """Асинхронный клиент на httpx с ограничением одновременных запросов"""
+    def __init__(self, base_url: str = "http://localhost:8000", concurrency: int = MAX_WORKERS,
+                 timeout: tuple = REQUEST_TIMEOUT, retries: int = RETRIES, backoff: float = BACKOFF,
+                 client=None):
+        """Инициализация клиента
+
+        Args:
+            base_url (str, optional): url для подключения.
+            concurrency (int, optional): одновременных запросов (и соединений в пуле).
+            timeout (tuple, optional): таймауты (соединение, ответ), с.
+            retries (int, optional): повторов при сетевых ошибках и ответах 429/502/503/504.
+            backoff (float, optional): начальная пауза между повторами, с.
+            client (optional): готовый httpx.AsyncClient (с base_url).
+
+        Raises:
+            ImportError: если httpx не установлен
+        """
+        if httpx is None:
+            raise ImportError("Для асинхронного клиента нужен пакет httpx")
+        self.retries = retries
+        self.backoff = backoff
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.client = client or httpx.AsyncClient(
+            base_url=base_url,
+            timeout=httpx.Timeout(timeout[1], connect=timeout[0]),
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+        )
+
+    async def aclose(self):
+        """Закрытие соединений пула"""
+        await self.client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def _request(self, method: str, path: str, **kwargs):
+        """Запрос с повторами (не больше concurrency запросов одновременно)"""
+        for attempt in range(self.retries + 1):
+            try:
+                async with self.semaphore:
+                    response = await self.client.request(method, path, **kwargs)
+            except httpx.TransportError as e:
+                if attempt == self.retries:
+                    raise
+                log.warning(f"{method} {path}: {e!r}, повтор {attempt + 1}/{self.retries}")
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                    return response
+                log.warning(f"{method} {path}: код {response.status_code}, повтор {attempt + 1}/{self.retries}")
+            await asyncio.sleep(self.backoff * 2 ** attempt)
+
+    async def predict(self, data: dict) -> dict:
+        """Ядовитость одного гриба (см. MushroomClient.predict)"""
+        response = await self._request("GET", "/predict/", params=data)
+        return response.json() if response.status_code == 200 else {"error": response.text}
+
+    async def predict_proba(self, data: dict) -> dict:
+        """Вероятность ядовитости одного гриба (см. MushroomClient.predict_proba)"""
+        response = await self._request("GET", "/predict/predict_proba", params=data)
+        return response.json() if response.status_code == 200 else {"error": response.text}
+
+    async def predict_batch(self, data: List[dict]) -> list | dict:
+        """Ядовитость списка грибов (см. MushroomClient.predict_batch)"""
+        response = await self._request("POST", "/predict/predict_batch", json=data)
+        return response.json() if response.status_code == 200 else {"error": response.text}
+
+    async def predict_proba_columns(self, data: List[dict]) -> dict:
+        """Вероятности ядовитости по столбцам (см. MushroomClient.predict_proba_columns)"""
+        body, headers = encode_columns(data)
+        response = await self._request("POST", "/predict/predict_proba_columns",
+                                       content=body, headers=headers)
+        if response.status_code != 200:
+            return {"error": response.text}
+        return decode_columns_response(response.headers.get("content-type", ""), response.content)
+
+    async def predict_batch_chunked(self, data: List[dict], chunk_size: int = CHUNK_SIZE) -> list | dict:
+        """Ядовитость большого списка: части отправляются одновременно, ответы - по порядку"""
+        parts = await asyncio.gather(*(self.predict_batch(chunk) for chunk in chunked(data, chunk_size)))
+        return merge_chunks(parts)
+
+    async def predict_proba_chunked(self, data: List[dict], chunk_size: int = CHUNK_SIZE) -> list | dict:
+        """Вероятности для большого списка: части по столбцам одновременно, ответы - по порядку"""
+        parts = await asyncio.gather(*(self.predict_proba_columns(chunk)
+                                       for chunk in chunked(data, chunk_size)))
+        return merge_chunks([probabilities_rows(part) for part in parts])
 
-        log.info(f"Status code: {response.status_code}")
-        log.info(f"Response: {response.json()}")
-        return response.json()
-    
 
 def main():
     """Запуск клиента"""    
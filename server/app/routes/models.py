@@ -0,0 +1,47 @@
+from typing import List
+from fastapi import APIRouter, HTTPException
+from ml.model_registry import registry
+from app.routes.predictions import model_handle
+
+router = APIRouter(prefix="/models", tags=["Models"])
+
+
+@router.get("/")
+def list_versions() -> List[dict]:
+    """Список сохранённых версий модели
+
+    Returns:
+        List[dict]: версии с датой обучения и признаком активной
+    """
+    return registry.versions()
+
+
+@router.post("/{version}/activate")
+def activate_version(version: str) -> dict:
+    """Активация версии модели без перезапуска сервиса
+
+    Args:
+        version (str): номер версии
+
+    Returns:
+        dict: активная версия
+    """
+    try:
+        registry.activate(version)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Версия {version} не найдена")
+    return {"active_version": model_handle.refresh(force=True).version}
+
+
+@router.post("/rollback")
+def rollback_version() -> dict:
+    """Откат к предыдущей активной версии модели
+
+    Returns:
+        dict: активная версия
+    """
+    try:
+        registry.rollback()
+    except LookupError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"active_version": model_handle.refresh(force=True).version}
@@ -1,11 +1,26 @@
+import itertools
+import json
 import os
-from pathlib import Path
-from fastapi import APIRouter, Depends, HTTPException, Query
-import joblib
+import shutil
+import tempfile
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
 import pandas as pd
 from typing import List
 from app.models import MushroomModel, MushroomsBatch
-from ml.prepared_data import prepared_data
+from ml.prepared_data import COLUMN_ENUMS, SIZE_COLUMNS, prepared_data_inference
+from ml.compiled_model import CompiledForest
+from ml.step_function import StepFunctionForest
+from ml.model_registry import ModelHandle, ServedModel, registry
+from ml.prediction_cache import PredictionCache
+from ml.micro_batcher import MicroBatcher
+from ml.parallel_inference import ParallelScorer, single_threaded
+from ml.bulk_scoring import (INPUT_EXTENSIONS, OUTPUT_MEDIA_TYPES, chunk_columns,
+                             decode_columns, format_results, input_format, read_chunks)
+from utils.extract_csv_from_zip import open_csv_stream
+from utils.metrics import StageTimer
 from app.enums.cap_shape import CapShape
 from app.enums.cap_surface import CapSurface
 from app.enums.color import Color
@@ -14,26 +29,168 @@ from app.enums.gill_attachment import GillAttachment
 from app.enums.habitat import Habitat
 from app.enums.ring_type import RingType
 from app.enums.season import Season
+from utils.logger import log as logger
+
+try:
+    import msgpack
+except ImportError:  # MessagePack необязателен: без него доступен только JSON
+    msgpack = None
 
 
 router = APIRouter(prefix="/predict", tags=["Prediction"])
 
-# путь к модели
-BASE_DIR = Path(__file__).parent.parent.parent
-MODEL_PATH = os.path.join(BASE_DIR, "mushrooms_model.pkl")
-if os.path.exists(MODEL_PATH):
-    artifact = joblib.load(MODEL_PATH)
-    model = artifact["model"]
-else:
-    artifact = None
-    model = None
-    print("Файл модели ещё не существует")
+# переключатель скомпилированного движка инференса (ml/compiled_model.py)
+USE_COMPILED = os.getenv("MUSHROOMS_COMPILED_INFERENCE", "0") == "1"
+# ступенчатые функции по комбинациям категорий поверх скомпилированного леса (ml/step_function.py)
+USE_STEP_FUNCTIONS = os.getenv("MUSHROOMS_STEP_FUNCTIONS", "0") == "1"
+# строк в пакете прогрева модели при старте (0 - без прогрева)
+WARMUP_ROWS = int(os.getenv("MUSHROOMS_WARMUP_ROWS", "64"))
+
+
+def compile_model(model) -> CompiledForest | None:
+    """Компиляция пайплайна в массивный движок инференса
+
+    Args:
+        model: обученный пайплайн sklearn
+
+    Returns:
+        CompiledForest | None: движок или None, если компиляция невозможна
+    """
+    try:
+        return CompiledForest(model)
+    except Exception as e:
+        logger.warning(f"Скомпилированный движок недоступен, используется sklearn: {e}")
+        return None
+
+
+def accelerate(engine: CompiledForest, fallback=None) -> StepFunctionForest | None:
+    """Ступенчатые функции по комбинациям категорий поверх движка
+
+    Args:
+        engine (CompiledForest): скомпилированный лес
+        fallback (optional): чем считать строки без таблицы. По умолчанию движком.
+
+    Returns:
+        StepFunctionForest | None: ускоритель или None, если модель не подходит
+    """
+    try:
+        return StepFunctionForest(engine, fallback=fallback)
+    except ValueError as e:
+        logger.warning(f"Ступенчатые функции недоступны: {e}")
+        return None
+
+
+def prepare_engine(model):
+    """Движок инференса для загруженного пайплайна
+
+    Строки, для которых ещё нет ступенчатой функции, считает движок
+    (MUSHROOMS_COMPILED_INFERENCE=1) или пайплайн sklearn: на больших
+    пакетах он быстрее движка. Пайплайн переводится в один поток:
+    большие пакеты распараллеливает parallel_scorer.
+
+    Args:
+        model: обученный пайплайн sklearn
+
+    Returns:
+        движок или None (считать пайплайном sklearn)
+    """
+    single_threaded(model)
+    if not (USE_COMPILED or USE_STEP_FUNCTIONS):
+        return None
+    engine = compile_model(model)
+    if engine is not None and USE_STEP_FUNCTIONS:
+        fallback = None if USE_COMPILED else (lambda columns: model.predict_proba(pd.DataFrame(columns)))
+        step_engine = accelerate(engine, fallback)
+        if step_engine is not None:
+            return step_engine
+    return engine if USE_COMPILED else None
+
+
+# текущая модель из реестра; новая активная версия подхватывается без перезапуска.
+# Загружается при старте приложения (lifespan в main.py), а без него - первым запросом
+model_handle = ModelHandle(registry,
+                           prepare=prepare_engine,
+                           accelerate=accelerate if USE_STEP_FUNCTIONS else None,
+                           load=False)
+# кэш вероятностей по подготовленным признакам, сбрасывается при смене модели
+prediction_cache = PredictionCache()
+# расчёт больших пакетов по частям в общем пуле потоков
+parallel_scorer = ParallelScorer()
+
+
+def score_proba(served: ServedModel, data):
+    """Вероятности классов через скомпилированный движок или пайплайн sklearn"""
+    if served.engine is not None:
+        return served.engine.predict_proba(data)
+    return served.model.predict_proba(pd.DataFrame(data))
+
+
+def compute_predict_proba(served: ServedModel, data):
+    """Вероятности классов; большой пакет считается по частям параллельно"""
+    return parallel_scorer(lambda part: score_proba(served, part), data)
+
+
+# одиночные запросы, пришедшие одновременно, считаются одним пакетом
+micro_batcher = MicroBatcher(compute_predict_proba)
+
+
+def model_predict_proba(served: ServedModel, data, batched: bool = False):
+    """Вероятности классов с учётом кэша предсказаний
+
+    Args:
+        served (ServedModel): снимок модели
+        data: подготовленные столбцы
+        batched (bool, optional): считать промахи кэша через micro_batcher
+                                  (для одиночных запросов)
+    """
+    compute = micro_batcher if batched else compute_predict_proba
+    return prediction_cache.lookup(served.token, data, lambda rows: compute(served, rows))
+
+
+def model_predict(served: ServedModel, data, batched: bool = False):
+    """Предсказание классов: класс с наибольшей вероятностью, как в RandomForestClassifier"""
+    proba = model_predict_proba(served, data, batched)
+    return served.classes_.take(np.argmax(proba, axis=1), axis=0)
+
+
+def warmup_columns(rows: int) -> dict:
+    """Синтетические грибы для прогрева: все категории по кругу, размеры 1-10"""
+    columns = {}
+    for column, enum in COLUMN_ENUMS.items():
+        members = list(enum)
+        columns[column] = [members[i % len(members)] for i in range(rows)]
+    for column in SIZE_COLUMNS:
+        columns[column] = [float(i % 10 + 1) for i in range(rows)]
+    return columns
+
+
+def warm_up(rows: int = WARMUP_ROWS) -> int:
+    """Прогрев модели: синтетические предсказания пакетом и по одной строке
+
+    Первые вызовы модели медленнее последующих (ленивые импорты sklearn,
+    выделение буферов, холодный страничный кэш у отображённых в память
+    массивов), поэтому их берёт на себя старт, а не первые запросы.
+    Прогрев идёт мимо кэша предсказаний и не меняет его счётчики.
+
+    Args:
+        rows (int, optional): строк в пакете
+
+    Returns:
+        int: сколько строк предсказано
+    """
+    served = model_handle.current()
+    if not served.available or rows <= 0:
+        return 0
+    data = prepared_data_inference(warmup_columns(rows))
+    score_proba(served, data)
+    score_proba(served, {column: values[:1] for column, values in data.items()})
+    return rows + 1
 
 
 @router.get(
     '/'
 )
-def predict(mushroom: MushroomModel = Depends()) -> dict:
+def predict(request: Request, mushroom: MushroomModel = Depends()) -> dict:
     """Определение(предсказывание) гриба: ядовитый или съедобный 
 
     Args:
@@ -42,28 +199,35 @@ def predict(mushroom: MushroomModel = Depends()) -> dict:
     Return: 
         dict: Булево значение(True/False), ядовитый или нет
     """ 
-    data = pd.DataFrame([{
-        "cap-shape": mushroom.cap_shape,
-        "cap-surface": mushroom.cap_surface,
-        "cap-color": mushroom.cap_color,
-        "does-bruise-or-bleed": mushroom.does_bruise_or_bleed,
-        "gill-attachment": mushroom.gill_attachment,
-        "gill-color": mushroom.gill_color,
-        "stem-color": mushroom.stem_color,
-        "has-ring": mushroom.has_ring,
-        "ring-type": mushroom.ring_type,
-        "habitat": mushroom.habitat,
-        "season": mushroom.season,
-        "cap-diameter": mushroom.cap_diameter,
-        "stem-height": mushroom.stem_height,
-        "stem-width": mushroom.stem_width,
-    }])
-    data_prep = prepared_data(data)
-    if model:
-        prediction = model.predict(data_prep)[0] 
+    timer = StageTimer(request)
+    with timer.stage("frame_build"):
+        data = {
+            "cap-shape": [mushroom.cap_shape],
+            "cap-surface": [mushroom.cap_surface],
+            "cap-color": [mushroom.cap_color],
+            "does-bruise-or-bleed": [mushroom.does_bruise_or_bleed],
+            "gill-attachment": [mushroom.gill_attachment],
+            "gill-color": [mushroom.gill_color],
+            "stem-color": [mushroom.stem_color],
+            "has-ring": [mushroom.has_ring],
+            "ring-type": [mushroom.ring_type],
+            "habitat": [mushroom.habitat],
+            "season": [mushroom.season],
+            "cap-diameter": [mushroom.cap_diameter],
+            "stem-height": [mushroom.stem_height],
+            "stem-width": [mushroom.stem_width],
+        }
+    with timer.stage("preprocessing"):
+        data_prep = prepared_data_inference(data)
+    served = model_handle.current()
+    if served.available:
+        with timer.stage("inference"):
+            prediction = model_predict(served, data_prep, batched=True)[0]
+        timer.done()
         return {
             "poisonous": bool(prediction),
         }
+    timer.done()
     return {"poisonous": None}
 
 
@@ -71,6 +235,7 @@ def predict(mushroom: MushroomModel = Depends()) -> dict:
     "/predict_proba",
 )
 def predict_proba(
+        request: Request,
         cap_shape: CapShape,
         cap_surface: CapSurface,
         cap_color: Color,
@@ -90,74 +255,90 @@ def predict_proba(
 
     Return: 
         dict: Численное значение вероятности ядовитости гриба"""
-    data = pd.DataFrame([{
-        "cap-shape": cap_shape,
-        "cap-surface": cap_surface,
-        "cap-color": cap_color,
-        "does-bruise-or-bleed": does_bruise_or_bleed,
-        "gill-attachment": gill_attachment,
-        "gill-color": gill_color,
-        "stem-color": stem_color,
-        "has-ring": has_ring,
-        "ring-type": ring_type,
-        "habitat": habitat,
-        "season": season,
-        "cap-diameter": cap_diameter,
-        "stem-height": stem_height,
-        "stem-width": stem_width,
-    }])
-    data_prepared = prepared_data(data)
-    if model:
-        poisonous_prob = model.predict_proba(data_prepared)[0][1]
+    timer = StageTimer(request)
+    with timer.stage("frame_build"):
+        data = {
+            "cap-shape": [cap_shape],
+            "cap-surface": [cap_surface],
+            "cap-color": [cap_color],
+            "does-bruise-or-bleed": [does_bruise_or_bleed],
+            "gill-attachment": [gill_attachment],
+            "gill-color": [gill_color],
+            "stem-color": [stem_color],
+            "has-ring": [has_ring],
+            "ring-type": [ring_type],
+            "habitat": [habitat],
+            "season": [season],
+            "cap-diameter": [cap_diameter],
+            "stem-height": [stem_height],
+            "stem-width": [stem_width],
+        }
+    with timer.stage("preprocessing"):
+        data_prepared = prepared_data_inference(data)
+    served = model_handle.current()
+    if served.available:
+        with timer.stage("inference"):
+            poisonous_prob = model_predict_proba(served, data_prepared, batched=True)[0][1]
+        timer.done()
         return {
             "probability_of_poisonous": float(poisonous_prob) if poisonous_prob is not None else None
         }
+    timer.done()
     return {"probability_of_poisonous": None}
 
 
 @router.post(
     "/predict_batch",
 )
-def predict_batch(batch: MushroomsBatch = Depends()) -> List[dict]:
+def predict_batch(request: Request, batch: MushroomsBatch = Depends()) -> List[dict]:
     """Определение(предсказывание) списка грибов: ядовитый или съедобный.
     
     Return: 
         List(dict): Булево значение(True/False), ядовитый или нет"""
     # Проверка что все списки одной длины
     n = len(batch.mushrooms)
+    timer = StageTimer(request)
+    timer.rows(n)
     
-    data = pd.DataFrame([{
-        "cap-shape": batch.mushrooms[i].cap_shape,
-        "cap-surface": batch.mushrooms[i].cap_surface,
-        "cap-color": batch.mushrooms[i].cap_color,
-        "does-bruise-or-bleed": batch.mushrooms[i].does_bruise_or_bleed,
-        "gill-attachment": batch.mushrooms[i].gill_attachment,
-        "gill-color": batch.mushrooms[i].gill_color,
-        "stem-color": batch.mushrooms[i].stem_color,
-        "has-ring": batch.mushrooms[i].has_ring,
-        "ring-type": batch.mushrooms[i].ring_type,
-        "habitat": batch.mushrooms[i].habitat,
-        "season": batch.mushrooms[i].season,
-        "cap-diameter": batch.mushrooms[i].cap_diameter,
-        "stem-height": batch.mushrooms[i].stem_height,
-        "stem-width": batch.mushrooms[i].stem_width,
-    } for i in range(n)])
-    data_prepared = prepared_data(data)
-    if model:
-        predictions = model.predict(data_prepared)
+    with timer.stage("frame_build"):
+        data = {
+            "cap-shape": [m.cap_shape for m in batch.mushrooms],
+            "cap-surface": [m.cap_surface for m in batch.mushrooms],
+            "cap-color": [m.cap_color for m in batch.mushrooms],
+            "does-bruise-or-bleed": [m.does_bruise_or_bleed for m in batch.mushrooms],
+            "gill-attachment": [m.gill_attachment for m in batch.mushrooms],
+            "gill-color": [m.gill_color for m in batch.mushrooms],
+            "stem-color": [m.stem_color for m in batch.mushrooms],
+            "has-ring": [m.has_ring for m in batch.mushrooms],
+            "ring-type": [m.ring_type for m in batch.mushrooms],
+            "habitat": [m.habitat for m in batch.mushrooms],
+            "season": [m.season for m in batch.mushrooms],
+            "cap-diameter": [m.cap_diameter for m in batch.mushrooms],
+            "stem-height": [m.stem_height for m in batch.mushrooms],
+            "stem-width": [m.stem_width for m in batch.mushrooms],
+        }
+    with timer.stage("preprocessing"):
+        data_prepared = prepared_data_inference(data)
+    served = model_handle.current()
+    if served.available:
+        with timer.stage("inference"):
+            predictions = model_predict(served, data_prepared)
         results = []
         for pred in predictions:
             results.append({
                 "poisonous": bool(pred),
             })
+        timer.done()
         return results
-    return n * {"poisonous": None}
+    timer.done()
+    return [{"poisonous": None} for _ in range(n)]
 
 
 @router.get(
     "/predict_proba_batch",
 )
 def predict_proba_batch(
+        request: Request,
         cap_shape: List[str] = Query(...),
         cap_surface: List[str] = Query(...),
         cap_color: List[str] = Query(...),
@@ -186,48 +367,236 @@ def predict_proba_batch(
                                          habitat, season, cap_diameter,
                                          stem_height, stem_width]):
         return {"error": "Все списки должны быть одной длины"}
+    timer = StageTimer(request)
+    timer.rows(n)
     
-    data = pd.DataFrame([{
-        "cap-shape": cap_shape[i],
-        "cap-surface": cap_surface[i],
-        "cap-color": cap_color[i],
-        "does-bruise-or-bleed": does_bruise_or_bleed[i],
-        "gill-attachment": gill_attachment[i],
-        "gill-color": gill_color[i],
-        "stem-color": stem_color[i],
-        "has-ring": has_ring[i],
-        "ring-type": ring_type[i],
-        "habitat": habitat[i],
-        "season": season[i],
-        "cap-diameter": cap_diameter[i],
-        "stem-height": stem_height[i],
-        "stem-width": stem_width[i],
-    } for i in range(n)])
-    data_prepared = prepared_data(data)
-    if model:
-        probabilities = model.predict_proba(data_prepared)[:, 1] 
+    with timer.stage("frame_build"):
+        data = {
+            "cap-shape": cap_shape,
+            "cap-surface": cap_surface,
+            "cap-color": cap_color,
+            "does-bruise-or-bleed": does_bruise_or_bleed,
+            "gill-attachment": gill_attachment,
+            "gill-color": gill_color,
+            "stem-color": stem_color,
+            "has-ring": has_ring,
+            "ring-type": ring_type,
+            "habitat": habitat,
+            "season": season,
+            "cap-diameter": cap_diameter,
+            "stem-height": stem_height,
+            "stem-width": stem_width,
+        }
+    with timer.stage("preprocessing"):
+        data_prepared = prepared_data_inference(data)
+    served = model_handle.current()
+    if served.available:
+        with timer.stage("inference"):
+            probabilities = model_predict_proba(served, data_prepared)[:, 1] 
 
         results = []
         for prob in probabilities:
             results.append({
                 "probability_of_poisonous": float(prob) if prob is not None else None
             })
+        timer.done()
         return results
-    return n * {"probability_of_poisonous": None}
+    timer.done()
+    return [{"probability_of_poisonous": None} for _ in range(n)]
+
+
+@router.post(
+    "/predict_proba_columns",
+)
+async def predict_proba_columns(request: Request) -> Response:
+    """Вероятности ядовитости для пакета, переданного по столбцам.
+
+    Тело - объект {признак: массив значений} в JSON или MessagePack
+    (Content-Type: application/msgpack). В MessagePack размеры можно
+    передать байтами little-endian float64. Строки не собираются в словари:
+    массивы сразу идут в prepared_data_inference.
+
+    Returns:
+        Response: {"probability_of_poisonous": [...]} в формате запроса
+                  (в MessagePack - байты little-endian float64)
+    """
+    timer = StageTimer(request)
+    content_type = request.headers.get("content-type", "application/json").split(";")[0].strip()
+    is_msgpack = content_type in ("application/msgpack", "application/x-msgpack")
+    if is_msgpack and msgpack is None:
+        raise HTTPException(status_code=415, detail="MessagePack не установлен на сервере")
+    if not is_msgpack and content_type != "application/json":
+        raise HTTPException(status_code=415,
+                            detail="Поддерживаются application/json и application/msgpack")
+    body = await request.body()
+    try:
+        with timer.stage("frame_build"):
+            payload = msgpack.unpackb(body) if is_msgpack else json.loads(body)
+            columns = decode_columns(payload)
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Некорректное тело запроса: {e}")
+    timer.rows(len(next(iter(columns.values()), ())))
+
+    def score():
+        with timer.stage("preprocessing"):
+            prepared = prepared_data_inference(columns)
+        with timer.stage("inference"):
+            return model_predict_proba(served, prepared)
+
+    served = model_handle.current()
+    if not served.available:
+        probabilities = None
+    else:
+        proba = await run_in_threadpool(score)
+        probabilities = np.ascontiguousarray(proba[:, 1], dtype="<f8")
+    # ответ сериализуется здесь, а не FastAPI: этап замеряется в обработчике
+    with timer.stage("serialization"):
+        if is_msgpack:
+            content = {"probability_of_poisonous":
+                       probabilities.tobytes() if probabilities is not None else None}
+            return Response(msgpack.packb(content), media_type="application/msgpack")
+        return Response(json.dumps({"probability_of_poisonous":
+                                    probabilities.tolist() if probabilities is not None else None}),
+                        media_type="application/json")
+
+
+@router.post(
+    "/file",
+)
+def predict_file(
+        request: Request,
+        filename: UploadFile = File(...),
+        output: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+        member: str | None = Query(None),
+) -> StreamingResponse:
+    """Потоковое предсказание для файла с грибами.
+
+    Принимает CSV или NDJSON (в том числе .zip, .gz, .bz2, .xz), столбцы - в виде
+    датасета (cap-shape) или полей модели (cap_shape), значения - коды датасета
+    или подписи перечислений. Файл читается чанками, результат каждого чанка
+    сразу отправляется клиенту, поэтому память не зависит от размера файла.
+    Пустые категории считаются пропусками, пустой размер - ошибка: в первом
+    чанке она возвращается кодом 400, в следующих обрывает ответ.
+
+    Args:
+        filename (UploadFile): файл с грибами
+        output (str, optional): формат ответа: ndjson или csv
+        member (str | None, optional): имя файла внутри ZIP
+
+    Returns:
+        StreamingResponse: строки вида {"id", "poisonous", "probability_of_poisonous"}
+                           (id из файла или номер строки)
+    """
+    timer = StageTimer(request)
+    served = model_handle.current()
+    if not served.available:
+        raise HTTPException(status_code=503, detail="Модель ещё не обучена")
+    # объект загрузки закрывается вместе с обработчиком, а ответ ещё
+    # отправляется, поэтому файл копируется во временный файл потоком
+    upload = tempfile.TemporaryFile()
+    chunks = None
+    try:
+        shutil.copyfileobj(filename.file, upload)
+        upload.seek(0)
+        stream = open_csv_stream(upload, filename.filename, member, INPUT_EXTENSIONS)
+        if stream is None:
+            raise ValueError("В архиве нет CSV или NDJSON")
+        # формат файла внутри ZIP определяется по его имени в архиве
+        name = stream.name if filename.filename.lower().endswith(".zip") else filename.filename
+        chunks = read_chunks(stream, input_format(name))
+        # первый чанк читается и проверяется сразу, чтобы ошибки формата вернулись кодом 400
+        first = next(chunks, None)
+        first_columns = chunk_columns(first) if first is not None else None
+    except Exception as e:
+        # читатель отпускает поток раньше, чем закрывается файл
+        if chunks is not None:
+            chunks.close()
+        upload.close()
+        raise HTTPException(status_code=400, detail=str(e))
+
+    def results():
+        try:
+            if first is None:
+                return
+            header = True
+            rows = 0
+            for chunk in itertools.chain([first], chunks):
+                with timer.stage("frame_build"):
+                    columns = first_columns if chunk is first else chunk_columns(chunk)
+                with timer.stage("preprocessing"):
+                    prepared = prepared_data_inference(columns)
+                with timer.stage("inference"):
+                    proba = model_predict_proba(served, prepared)
+                    poisonous = served.classes_.take(np.argmax(proba, axis=1), axis=0)
+                with timer.stage("serialization"):
+                    formatted = format_results(chunk, poisonous, proba[:, 1], output, header)
+                yield formatted
+                header = False
+                rows += len(chunk)
+            timer.rows(rows)
+        finally:
+            chunks.close()
+            upload.close()
+
+    return StreamingResponse(results(), media_type=OUTPUT_MEDIA_TYPES[output])
+
+
+@router.get(
+    "/cache",
+)
+def cache_stats() -> dict:
+    """Счётчики кэша предсказаний: размер, попадания, промахи, вытеснения
+
+    Returns:
+        dict: состояние кэша
+    """
+    return prediction_cache.stats()
+
+
+@router.get(
+    "/batcher",
+)
+def batcher_stats() -> dict:
+    """Метрики пакетирования одиночных запросов: размеры пакетов и задержка в очереди
+
+    Returns:
+        dict: настройки и счётчики диспетчера
+    """
+    return micro_batcher.stats()
+
+
+@router.get(
+    "/step_functions",
+)
+def step_function_stats() -> dict:
+    """Таблица ступенчатых функций: размер, скомпилированные комбинации,
+    строки, посчитанные по таблице и обходом леса
+
+    Returns:
+        dict: состояние таблицы (enabled=False, если ускоритель не используется)
+    """
+    engine = model_handle.current().engine
+    if not isinstance(engine, StepFunctionForest):
+        return {"enabled": False}
+    return {"enabled": True, **engine.stats()}
 
 
 @router.get(
     "/status",
 )
 def status() -> dict:
-    """Возвращает дату, когда модель была обучена
+    """Возвращает дату, когда модель была обучена, и активную версию
 
     Returns:
-        dict: Дата, когда модель была обучена
+        dict: Дата, когда модель была обучена, и версия модели
     """
     try:
+        served = model_handle.current()
         return {
-            "model_trained_at": artifact["trained_at"]
+            "model_trained_at": served.artifact["trained_at"],
+            "model_version": served.version,
         }
     except Exception as e:
         raise HTTPException(
@@ -0,0 +1,59 @@
+from typing import List
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import FileResponse
+from utils.profiling import FOLDED, PSTATS, TEXT, PROFILE_HEADER, profile_store
+import utils.profiling as profiling
+
+router = APIRouter(prefix="/profiles", tags=["Профилирование"])
+
+MEDIA_TYPES = {FOLDED: "text/plain", TEXT: "text/plain", PSTATS: "application/octet-stream"}
+
+
+def check_token(token: str | None = Header(None, alias=PROFILE_HEADER)):
+    """Доступ к профилям: нужен заголовок с MUSHROOMS_PROFILE_TOKEN.
+    Без заданного токена профили не отдаются никому."""
+    if not profiling.PROFILE_TOKEN or token != profiling.PROFILE_TOKEN:
+        raise HTTPException(status_code=403, detail="Нужен заголовок X-Mushrooms-Profile")
+
+
+@router.get("/", dependencies=[Depends(check_token)])
+def list_profiles() -> List[dict]:
+    """Список сохранённых профилей, новые первыми
+
+    Returns:
+        List[dict]: описание профиля: маршрут или задача, длительность, форматы
+    """
+    return profile_store.list()
+
+
+@router.get("/{profile_id}", dependencies=[Depends(check_token)])
+def profile_meta(profile_id: str) -> dict:
+    """Описание профиля
+
+    Args:
+        profile_id (str): идентификатор профиля (заголовок X-Profile-Id ответа)
+
+    Returns:
+        dict: описание профиля
+    """
+    meta = profile_store.get(profile_id)
+    if meta is None:
+        raise HTTPException(status_code=404, detail="Профиль не найден")
+    return meta
+
+
+@router.get("/{profile_id}/{fmt}", dependencies=[Depends(check_token)])
+def profile_file(profile_id: str, fmt: str) -> FileResponse:
+    """Файл профиля: folded (flamegraph.pl, speedscope), pstats (pstats, snakeviz) или txt
+
+    Args:
+        profile_id (str): идентификатор профиля
+        fmt (str): формат файла
+
+    Returns:
+        FileResponse: файл профиля
+    """
+    path = profile_store.file(profile_id, fmt) if fmt in MEDIA_TYPES else None
+    if path is None:
+        raise HTTPException(status_code=404, detail="Профиль в этом формате не найден")
+    return FileResponse(path, media_type=MEDIA_TYPES[fmt], filename=f"{profile_id}.{fmt}")
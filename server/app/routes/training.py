@@ -1,40 +1,112 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File
-from ml.mushrooms_model import MushroomsModel
-from utils.extract_csv_from_zip import extract_csv_from_zip
+from typing import List
+from fastapi import APIRouter, HTTPException, Request, UploadFile, File, Query
+from ml.search import STRATEGIES
+from ml.training_jobs import FULL, INCREMENTAL, QueueFullError, job_manager
+from utils.extract_csv_from_zip import SUPPORTED_EXTENSIONS
+from utils.profiling import TRAINING_PROFILE_MODE
 
 router = APIRouter(prefix="/fit", tags=["Training"])
 
 
 @router.post("/")
-def fit_model(filename: UploadFile = File(...)) -> dict:
-    """Обучение модели на загруженном файле с данными.
+def fit_model(
+        request: Request,
+        filename: UploadFile = File(...),
+        member: str | None = Query(None),
+        mode: str = Query(FULL, pattern=f"^({FULL}|{INCREMENTAL})$"),
+        n_estimators: int = Query(50, ge=1),
+        max_estimators: int | None = Query(None, ge=1),
+        strategy: str | None = Query(None, pattern=f"^({'|'.join(STRATEGIES)})$"),
+        budget: float | None = Query(None, ge=0),
+) -> dict:
+    """Постановка обучения модели на загруженном файле с данными в очередь.
+
+    Обучение идёт в фоновом процессе, ход выполнения доступен по /fit/jobs/{job_id}.
+    В режиме incremental текущая модель дообучается: к лесу добавляются
+    n_estimators деревьев, обученных на новых данных, без подбора гиперпараметров.
+    Если профилирование запрошено администратором (см. ProfilingMiddleware),
+    при полном обучении профилируется подбор гиперпараметров; идентификатор
+    профиля попадает в прогресс задачи (profile_id).
 
     Args:
-        filename (UploadFile, optional): Загруженный файл
+        request (Request): запрос
+        filename (UploadFile, optional): Загруженный файл (.csv, .zip, .gz, .bz2, .xz)
+        member (str | None, optional): Имя CSV внутри ZIP. По умолчанию первый CSV.
+        mode (str, optional): full - обучение с нуля, incremental - дообучение
+        n_estimators (int, optional): Сколько деревьев добавить при дообучении
+        max_estimators (int | None, optional): Размер леса, до которого при
+            дообучении удаляются самые старые деревья
+        strategy (str | None, optional): Стратегия подбора гиперпараметров:
+            grid, halving, random или capped. По умолчанию из настроек.
+        budget (float | None, optional): Бюджет подбора, с. По умолчанию из настроек.
 
     Returns:
         dict:
             Словарь вида:
             {
                 "success": bool,
+                "job_id": str,
             }
 
-            - success — True, если модель успешно обучена  
-    """    
+            - success — True, если задача обучения принята
+            - job_id — идентификатор задачи
+    """
+    file_ext = filename.filename.split(".")[-1].lower()
+    if file_ext not in SUPPORTED_EXTENSIONS:
+        raise HTTPException(status_code=400,
+                            detail="Некорректное расширение файла. Допустимо: .csv, .zip, .gz, .bz2, .xz")
     try:
-        file_ext = filename.filename.split(".")[-1].lower()
-        if file_ext == "zip":
-            file = extract_csv_from_zip(filename)
-        elif file_ext == "csv":
-            file = filename.file
+        if mode == INCREMENTAL:
+            options = {"n_estimators": n_estimators, "max_estimators": max_estimators}
         else:
-            raise HTTPException(status_code=400, 
-                                detail="Некорректное расширение файла. Допустимо только .csv")
-        mushroom = MushroomsModel(file)
-        mushroom.preprocess_data()
-        mushroom.fit_model()
-        return {"success": True}
+            options = {"strategy": strategy, "budget": budget}
+            if getattr(request.state, "profile_training", False):
+                options["profile"] = TRAINING_PROFILE_MODE
+        job = job_manager.submit(filename.file, filename.filename, member, mode, options)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    
+    return {"success": True, "job_id": job.id}
+
+
+@router.get("/jobs")
+def list_jobs() -> List[dict]:
+    """Список задач обучения
+
+    Returns:
+        List[dict]: состояние каждой задачи
+    """
+    return [job.to_dict() for job in job_manager.list()]
+
+
+@router.get("/jobs/{job_id}")
+def job_status(job_id: str) -> dict:
+    """Состояние задачи обучения: статус, прогресс (фаза, пройденные фолды), время
+
+    Args:
+        job_id (str): идентификатор задачи
+
+    Returns:
+        dict: состояние задачи
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задача обучения не найдена")
+    return job.to_dict()
+
 
+@router.delete("/jobs/{job_id}")
+def cancel_job(job_id: str) -> dict:
+    """Отмена ожидающей или идущей задачи обучения
+
+    Args:
+        job_id (str): идентификатор задачи
+
+    Returns:
+        dict: состояние задачи после отмены
+    """
+    job = job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задача обучения не найдена")
+    return job.to_dict()
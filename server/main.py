@@ -1,14 +1,52 @@
+# первым: от импорта startup отсчитывается время запуска воркера
+from utils.startup import startup
+import threading
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse
-from app.routes.predictions import router as router_pred
+from fastapi.responses import JSONResponse, RedirectResponse, Response
+from app.routes.predictions import model_handle, warm_up, router as router_pred
 from app.routes.training import router as router_train
+from app.routes.models import router as router_models
+from app.routes.profiles import router as router_profiles
+from utils.metrics import CONTENT_TYPE, MetricsMiddleware, metrics
+from utils.profiling import ProfilingMiddleware
+from utils.logger import log as logger
 
 
 TITLE_APP = "🍄 The toxicity of mushrooms Prediction API"
 VERSION_APP = "0.0.1"
 
-app = FastAPI(title=TITLE_APP, version=VERSION_APP)
+
+def prepare_model():
+    """Загрузка и прогрев модели после старта воркера
+
+    Идёт в отдельном потоке: воркер сразу принимает соединения и отвечает
+    на /health/live, а /health/ready возвращает 503, пока модель не готова.
+    Запросы на предсказание, пришедшие раньше, ждут окончания загрузки.
+    """
+    model_handle.load()
+    startup.finish_phase("model_load")
+    try:
+        rows = warm_up()
+    except Exception as e:
+        rows = 0
+        logger.error(f"❌Прогрев модели не удался: {e}")
+    startup.finish_phase("warmup")
+    startup.set_ready()
+    phases = ", ".join(f"{phase} {elapsed:.3f} с" for phase, elapsed in startup.phases.items())
+    logger.info(f"Воркер готов за {startup.ready_seconds:.3f} с ({phases}; прогрев {rows} строк)")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Старт приложения: загрузка модели в фоне"""
+    startup.finish_phase("import")
+    threading.Thread(target=prepare_model, name="startup", daemon=True).start()
+    yield
+
+
+app = FastAPI(title=TITLE_APP, version=VERSION_APP, lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -20,6 +58,10 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# профилирование по запросу администратора или с заданной долей запросов
+app.add_middleware(ProfilingMiddleware)
+# добавлен последним, поэтому внешний: замеряет запрос целиком
+app.add_middleware(MetricsMiddleware)
 
 
 @app.get(
@@ -32,6 +74,46 @@ def redirect_func():
     return RedirectResponse(url='/docs')
 
 
+@app.get(
+    "/metrics",
+    tags=["Мониторинг"]
+)
+def metrics_func():
+    """Метрики сервиса в текстовом формате Prometheus
+    """
+    return Response(metrics.render(), media_type=CONTENT_TYPE)
+
+
+@app.get(
+    "/health/live",
+    tags=["Мониторинг"]
+)
+def liveness_func() -> dict:
+    """Проверка живости: процесс запущен и обрабатывает запросы
+    """
+    return {"status": "ok"}
+
+
+@app.get(
+    "/health/ready",
+    tags=["Мониторинг"]
+)
+def readiness_func():
+    """Проверка готовности: модель загружена и прогрета (503 до этого)
+
+    Returns:
+        dict: готовность, длительность этапов запуска (import, model_load,
+              warmup), время до готовности и обслуживаемая версия модели
+    """
+    body = startup.to_dict()
+    if not startup.ready:
+        return JSONResponse(body, status_code=503)
+    served = model_handle.current()
+    return {**body, "model_available": served.available, "model_version": served.version}
+
+
 app.include_router(router_pred)
 app.include_router(router_train)
+app.include_router(router_models)
+app.include_router(router_profiles)
 
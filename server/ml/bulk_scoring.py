@@ -0,0 +1,166 @@
+import io
+import os
+from typing import BinaryIO, Iterator, Mapping
+import numpy as np
+import pandas as pd
+from ml.prepared_data import SIZE_COLUMNS
+
+# количество строк файла, обрабатываемых за один вызов модели
+SCORE_CHUNK_SIZE = int(os.getenv("MUSHROOMS_SCORE_CHUNK_SIZE", "10000"))
+# признаки, которые нужны модели
+FEATURE_COLUMNS = [
+    "cap-shape", "cap-surface", "cap-color", "does-bruise-or-bleed",
+    "gill-attachment", "gill-color", "stem-color", "has-ring", "ring-type",
+    "habitat", "season", *SIZE_COLUMNS,
+]
+# форматы входного файла (по расширению без сжатия)
+INPUT_FORMATS = {"csv": "csv", "ndjson": "ndjson", "jsonl": "ndjson"}
+INPUT_EXTENSIONS = tuple("." + ext for ext in INPUT_FORMATS)
+# форматы ответа
+OUTPUT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def input_format(filename: str) -> str:
+    """Формат данных по имени файла (data.csv, data.ndjson.gz)
+
+    Args:
+        filename (str): имя загруженного файла
+
+    Raises:
+        ValueError: если формат не поддерживается
+
+    Returns:
+        str: "csv" или "ndjson"
+    """
+    parts = filename.lower().split(".")
+    if parts[-1] in ("gz", "bz2", "xz") and len(parts) > 2:
+        parts = parts[:-1]
+    if parts[-1] not in INPUT_FORMATS:
+        raise ValueError(f"Неподдерживаемый формат файла: {filename}")
+    return INPUT_FORMATS[parts[-1]]
+
+
+def normalize_columns(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Имена столбцов в виде датасета: cap_shape и cap-shape равнозначны
+
+    Raises:
+        ValueError: если каких-то признаков нет
+    """
+    chunk = chunk.rename(columns=lambda name: str(name).strip().replace("_", "-"))
+    missing = [column for column in FEATURE_COLUMNS if column not in chunk.columns]
+    if missing:
+        raise ValueError(f"В файле нет столбцов: {', '.join(missing)}")
+    return chunk
+
+
+def read_chunks(stream: BinaryIO, fmt: str, chunksize: int = SCORE_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """Потоковое чтение файла с грибами чанками
+
+    Категориальные признаки читаются строками (коды датасета или подписи
+    перечислений), размеры - числами. Индекс чанка - номер строки в файле.
+
+    Args:
+        stream (BinaryIO): поток с CSV или NDJSON
+        fmt (str): "csv" или "ndjson"
+        chunksize (int, optional): строк в чанке
+
+    Yields:
+        pd.DataFrame: чанк с нормализованными именами столбцов
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8", newline="" if fmt == "csv" else None)
+    try:
+        if fmt == "csv":
+            reader = pd.read_csv(text, dtype=str, keep_default_na=False, chunksize=chunksize)
+        else:
+            reader = pd.read_json(text, lines=True, dtype=False, chunksize=chunksize)
+        with reader:
+            for chunk in reader:
+                yield normalize_columns(chunk)
+    finally:
+        text.detach()
+
+
+def chunk_columns(chunk: pd.DataFrame) -> dict:
+    """Столбцы чанка для prepared_data_inference
+
+    Пустые ячейки категорий (и null в NDJSON) становятся NaN, как пропуски
+    в prepared_data_inference. Размеры обязательны, как в JSON-маршрутах.
+
+    Raises:
+        ValueError: если размер пуст или не число
+    """
+    columns = {}
+    for column in FEATURE_COLUMNS:
+        if column in SIZE_COLUMNS:
+            values = pd.to_numeric(chunk[column], errors="coerce")
+            if values.isna().any():
+                row = values.index[values.isna().to_numpy()][0]
+                raise ValueError(f"Строка {row}: в столбце {column} нет числа")
+            columns[column] = values.to_numpy(np.float64)
+        else:
+            values = chunk[column].to_numpy(dtype=object)
+            values[pd.isna(values) | (values == "")] = np.nan
+            columns[column] = values
+    return columns
+
+
+def decode_columns(payload: Mapping) -> dict:
+    """Столбцы из тела запроса "по массиву на признак" (JSON или MessagePack)
+
+    Размеры можно передать списком чисел или байтами little-endian float64
+    (в MessagePack - тип bin), категории - кодами датасета или подписями.
+
+    Args:
+        payload (Mapping): признак -> массив значений
+
+    Raises:
+        ValueError: если признаков не хватает или массивы разной длины
+
+    Returns:
+        dict: столбцы для prepared_data_inference
+    """
+    if not isinstance(payload, Mapping):
+        raise ValueError("Ожидается объект вида {признак: массив значений}")
+    payload = {str(name).strip().replace("_", "-"): values for name, values in payload.items()}
+    missing = [column for column in FEATURE_COLUMNS if column not in payload]
+    if missing:
+        raise ValueError(f"Нет столбцов: {', '.join(missing)}")
+    columns = {}
+    for column in FEATURE_COLUMNS:
+        values = payload[column]
+        if column in SIZE_COLUMNS:
+            if isinstance(values, (bytes, bytearray, memoryview)):
+                columns[column] = np.frombuffer(values, dtype="<f8")
+            else:
+                columns[column] = np.asarray(values, dtype=np.float64)
+        else:
+            columns[column] = np.asarray(values, dtype=object)
+        if columns[column].ndim != 1:
+            raise ValueError(f"Столбец {column} должен быть одномерным массивом")
+    if len({len(values) for values in columns.values()}) != 1:
+        raise ValueError("Все массивы должны быть одной длины")
+    return columns
+
+
+def format_results(chunk: pd.DataFrame, poisonous: np.ndarray, probability: np.ndarray,
+                   fmt: str, header: bool) -> str:
+    """Результаты чанка в виде NDJSON или CSV
+
+    Args:
+        chunk (pd.DataFrame): исходный чанк (для id или номера строки)
+        poisonous (np.ndarray): предсказанные классы
+        probability (np.ndarray): вероятность ядовитости
+        fmt (str): "ndjson" или "csv"
+        header (bool): добавить заголовок CSV (для первого чанка)
+
+    Returns:
+        str: фрагмент ответа
+    """
+    result = pd.DataFrame({
+        "id": chunk["id"].to_numpy() if "id" in chunk.columns else chunk.index.to_numpy(),
+        "poisonous": poisonous.astype(bool),
+        "probability_of_poisonous": probability,
+    })
+    if fmt == "csv":
+        return result.to_csv(index=False, header=header)
+    return result.to_json(orient="records", lines=True, force_ascii=False)
@@ -0,0 +1,241 @@
+import json
+import math
+import os
+from typing import TYPE_CHECKING, Mapping, Sequence
+import numpy as np
+
+if TYPE_CHECKING:
+    from sklearn.pipeline import Pipeline
+
+# признак листа в массивах дерева sklearn
+TREE_LEAF = -1
+# сколько элементов (строк × деревьев) обходится за один проход
+BLOCK_SIZE = 1 << 20
+# массивы узлов, которые сохраняются в .npy и могут отображаться в память
+NODE_ARRAYS = ("roots", "feature", "threshold", "children_left", "children_right", "value")
+META_FILE = "meta.json"
+
+
+def _final_step(transformer):
+    """Последний шаг трансформера (сам трансформер, если это не Pipeline)"""
+    from sklearn.pipeline import Pipeline
+
+    if isinstance(transformer, Pipeline):
+        return transformer.steps[-1][1]
+    return transformer
+
+
+class CompiledForest:
+    """Скомпилированный в массивы NumPy пайплайн (ColumnTransformer + RandomForest).
+
+    Все деревья леса склеиваются в общие массивы узлов (признак, порог,
+    потомки, значения листьев), а кодирование категорий заменяется
+    заранее посчитанной картой "категория -> номер столбца". Пакет строк
+    скорится векторизованным обходом всех деревьев сразу, без DataFrame
+    и разреженных матриц. Результат совпадает с model.predict_proba
+    при последовательном (n_jobs=1) суммировании деревьев.
+    """
+    def __init__(self, pipeline: "Pipeline"):
+        """Компиляция обученного пайплайна
+
+        Args:
+            pipeline (Pipeline): пайплайн из MushroomsModel.preprocess_data
+
+        Raises:
+            ValueError: если пайплайн содержит неподдерживаемые шаги
+        """
+        # sklearn нужен только для компиляции: воркер, обслуживающий
+        # массивы из реестра (load), его не импортирует
+        from sklearn.compose import ColumnTransformer
+        from sklearn.ensemble import RandomForestClassifier
+        from sklearn.preprocessing import MinMaxScaler, OneHotEncoder
+
+        preprocessor = pipeline.steps[0][1]
+        forest = pipeline.steps[-1][1]
+        if len(pipeline.steps) != 2 or not isinstance(preprocessor, ColumnTransformer):
+            raise ValueError("Ожидается пайплайн вида ColumnTransformer -> классификатор")
+        if not isinstance(forest, RandomForestClassifier) or forest.n_outputs_ != 1:
+            raise ValueError("Поддерживается только RandomForestClassifier с одним выходом")
+
+        self.classes_ = forest.classes_
+        self.n_features = forest.n_features_in_
+        # числовые признаки: (входной столбец, номер признака, scale_, min_)
+        self.numeric = []
+        # категориальные признаки: (входной столбец, {категория: номер признака})
+        self.categorical = []
+        for name, transformer, columns in preprocessor.transformers_:
+            if transformer == "drop" or len(columns) == 0:
+                continue
+            start = preprocessor.output_indices_[name].start
+            step = _final_step(transformer)
+            if isinstance(step, MinMaxScaler) and not step.clip:
+                for j, column in enumerate(columns):
+                    self.numeric.append((column, start + j, step.scale_[j], step.min_[j]))
+            elif isinstance(step, OneHotEncoder) and step.drop is None:
+                offset = start
+                for column, categories in zip(columns, step.categories_):
+                    self.categorical.append(
+                        (column, {category: offset + k for k, category in enumerate(categories)}))
+                    offset += len(categories)
+            else:
+                raise ValueError(f"Неподдерживаемый трансформер '{name}': {step!r}")
+
+        # склеиваем узлы всех деревьев в общие массивы
+        trees = [estimator.tree_ for estimator in forest.estimators_]
+        sizes = [tree.node_count for tree in trees]
+        self.n_trees = len(trees)
+        self.roots = np.cumsum([0] + sizes[:-1]).astype(np.intp)
+        self.feature = np.concatenate([tree.feature for tree in trees]).astype(np.intp)
+        self.threshold = np.concatenate([tree.threshold for tree in trees])
+        left, right = [], []
+        for root, tree in zip(self.roots, trees):
+            left.append(np.where(tree.children_left == TREE_LEAF, TREE_LEAF,
+                                 tree.children_left + root))
+            right.append(np.where(tree.children_right == TREE_LEAF, TREE_LEAF,
+                                  tree.children_right + root))
+        self.children_left = np.concatenate(left).astype(np.intp)
+        self.children_right = np.concatenate(right).astype(np.intp)
+        # у листьев признак -2, подменяем на 0, чтобы индексация была безопасной
+        self.feature[self.children_left == TREE_LEAF] = 0
+        self.value = np.concatenate(
+            [tree.value[:, 0, :len(self.classes_)] for tree in trees])
+
+    def save(self, directory: str) -> None:
+        """Сохранение движка в каталог: массивы узлов в .npy, карты признаков в JSON
+
+        Args:
+            directory (str): каталог (создаётся при необходимости)
+        """
+        os.makedirs(directory, exist_ok=True)
+        for name in NODE_ARRAYS:
+            np.save(os.path.join(directory, f"{name}.npy"), np.ascontiguousarray(getattr(self, name)))
+        meta = {
+            "classes": self.classes_.tolist(),
+            "n_features": int(self.n_features),
+            "numeric": [[column, int(index), float(scale), float(shift)]
+                        for column, index, scale, shift in self.numeric],
+            "categorical": [[column, [[category, int(index)] for category, index in mapping.items()]]
+                            for column, mapping in self.categorical],
+        }
+        with open(os.path.join(directory, META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, directory: str, mmap_mode: str | None = "r") -> "CompiledForest":
+        """Загрузка движка, сохранённого save()
+
+        С mmap_mode="r" массивы узлов не копируются в память процесса, а
+        отображаются из файлов: все воркеры на хосте делят одну копию в
+        страничном кэше.
+
+        Args:
+            directory (str): каталог с движком
+            mmap_mode (str | None, optional): режим np.load. По умолчанию "r".
+
+        Returns:
+            CompiledForest: движок
+        """
+        engine = cls.__new__(cls)
+        for name in NODE_ARRAYS:
+            setattr(engine, name, np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode))
+        with open(os.path.join(directory, META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        engine.classes_ = np.array(meta["classes"])
+        engine.n_features = meta["n_features"]
+        engine.n_trees = len(engine.roots)
+        engine.numeric = [tuple(item) for item in meta["numeric"]]
+        engine.categorical = [(column, {category: index for category, index in items})
+                              for column, items in meta["categorical"]]
+        return engine
+
+    def encode(self, columns: Mapping[str, Sequence]) -> np.ndarray:
+        """Кодирование подготовленных данных в плотную матрицу признаков
+
+        Args:
+            columns (Mapping[str, Sequence]): столбцы после prepared_data
+                                              (DataFrame или словарь массивов)
+
+        Returns:
+            np.ndarray: матрица признаков float32, как её видят деревья sklearn
+        """
+        n = len(columns[self.numeric[0][0]] if self.numeric else columns[self.categorical[0][0]])
+        X = np.zeros((n, self.n_features), dtype=np.float32)
+        for column, index, scale, shift in self.numeric:
+            values = np.asarray(columns[column], dtype=np.float64)
+            X[:, index] = values * scale + shift
+        rows = np.arange(n)
+        for column, mapping in self.categorical:
+            nan_index = next((i for c, i in mapping.items()
+                              if isinstance(c, float) and math.isnan(c)), -1)
+            index = np.fromiter(
+                (nan_index if isinstance(v, float) and v != v else mapping.get(v, -1)
+                 for v in np.asarray(columns[column], dtype=object)),
+                dtype=np.intp, count=n)
+            known = index >= 0
+            # неизвестные категории игнорируются, как handle_unknown='ignore'
+            X[rows[known], index[known]] = 1.0
+        return X
+
+    def _leaves(self, X: np.ndarray) -> np.ndarray:
+        """Номера листьев для каждой пары (строка, дерево)
+
+        Args:
+            X (np.ndarray): закодированная матрица признаков
+
+        Returns:
+            np.ndarray: массив формы (n_строк, n_деревьев)
+        """
+        n = X.shape[0]
+        node = np.broadcast_to(self.roots, (n, self.n_trees)).copy()
+        row = np.broadcast_to(np.arange(n)[:, None], (n, self.n_trees))
+        node, row = node.ravel(), row.ravel()
+        active = np.flatnonzero(self.children_left[node] != TREE_LEAF)
+        while active.size:
+            current = node[active]
+            go_left = X[row[active], self.feature[current]] <= self.threshold[current]
+            node[active] = np.where(go_left, self.children_left[current],
+                                    self.children_right[current])
+            active = active[self.children_left[node[active]] != TREE_LEAF]
+        return node.reshape(n, self.n_trees)
+
+    def predict_proba(self, columns: Mapping[str, Sequence]) -> np.ndarray:
+        """Вероятности классов, как у pipeline.predict_proba
+
+        Args:
+            columns (Mapping[str, Sequence]): столбцы после prepared_data
+
+        Returns:
+            np.ndarray: массив формы (n_строк, n_классов)
+        """
+        return self.predict_proba_encoded(self.encode(columns))
+
+    def predict_proba_encoded(self, X: np.ndarray) -> np.ndarray:
+        """Вероятности классов для уже закодированной матрицы признаков
+
+        Args:
+            X (np.ndarray): матрица признаков float32 (см. encode)
+
+        Returns:
+            np.ndarray: массив формы (n_строк, n_классов)
+        """
+        proba = np.zeros((X.shape[0], len(self.classes_)))
+        step = max(1, BLOCK_SIZE // max(self.n_trees, 1))
+        for start in range(0, X.shape[0], step):
+            leaves = self._leaves(X[start:start + step])
+            block = proba[start:start + step]
+            # суммируем деревья по порядку, как RandomForestClassifier
+            for t in range(self.n_trees):
+                block += self.value[leaves[:, t]]
+        proba /= self.n_trees
+        return proba
+
+    def predict(self, columns: Mapping[str, Sequence]) -> np.ndarray:
+        """Предсказание классов, как у pipeline.predict
+
+        Args:
+            columns (Mapping[str, Sequence]): столбцы после prepared_data
+
+        Returns:
+            np.ndarray: предсказанные классы
+        """
+        return self.classes_.take(np.argmax(self.predict_proba(columns), axis=1), axis=0)
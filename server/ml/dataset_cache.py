@@ -0,0 +1,237 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from ml.search import dense_float32
+from utils.logger import log as logger
+
+BASE_DIR = Path(__file__).parent.parent
+# каталог кэша подготовленных обучающих данных
+DATASET_CACHE_DIR = os.getenv("MUSHROOMS_DATASET_CACHE_DIR", os.path.join(BASE_DIR, "cache", "datasets"))
+# предельный размер кэша на диске, МБ (0 - кэш выключен)
+DATASET_CACHE_QUOTA_MB = float(os.getenv("MUSHROOMS_DATASET_CACHE_QUOTA_MB", "1024"))
+MANIFEST_FILE = "manifest.json"
+# версия формата записи: меняется при изменении состава файлов
+CACHE_FORMAT = 1
+# размер блока при подсчёте хэша загруженного файла
+HASH_BLOCK = 1 << 20
+PARTS = ("train", "test")
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 содержимого файла (читается блоками)"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class PreparedDataset:
+    """Подготовленные обучающие данные: выборки до и после кодирования.
+
+    Признаки хранятся по столбцам: категории - кодами int16 со списком
+    категорий, размеры - float64; закодированные матрицы - плотные float32.
+    В таком виде всё сохраняется в .npy и читается через memory map.
+    """
+    def __init__(self, X_train: pd.DataFrame, X_test: pd.DataFrame, y_train: pd.Series,
+                 y_test: pd.Series, preprocessor, X_train_encoded: np.ndarray,
+                 X_test_encoded: np.ndarray):
+        """Создание набора
+
+        Args:
+            X_train, X_test (pd.DataFrame): подготовленные признаки
+            y_train, y_test (pd.Series): целевая переменная
+            preprocessor: препроцессор, обученный на X_train
+            X_train_encoded, X_test_encoded (np.ndarray): признаки после препроцессора
+        """
+        self.X_train = X_train
+        self.X_test = X_test
+        self.y_train = y_train
+        self.y_test = y_test
+        self.preprocessor = preprocessor
+        self.X_train_encoded = X_train_encoded
+        self.X_test_encoded = X_test_encoded
+
+    @classmethod
+    def build(cls, X_train: pd.DataFrame, X_test: pd.DataFrame, y_train: pd.Series,
+              y_test: pd.Series, preprocessor) -> "PreparedDataset":
+        """Обучение препроцессора на X_train и кодирование обеих выборок
+
+        Args:
+            X_train, X_test (pd.DataFrame): подготовленные признаки
+            y_train, y_test (pd.Series): целевая переменная
+            preprocessor: необученный препроцессор
+
+        Returns:
+            PreparedDataset: набор с закодированными матрицами
+        """
+        preprocessor = clone(preprocessor)
+        X_train_encoded = dense_float32(preprocessor.fit_transform(X_train, y_train))
+        X_test_encoded = dense_float32(preprocessor.transform(X_test))
+        return cls(X_train, X_test, y_train, y_test, preprocessor, X_train_encoded, X_test_encoded)
+
+
+class DatasetCache:
+    """Кэш подготовленных данных на диске с адресацией по содержимому.
+
+    Ключ - хэш загруженного файла и настроек подготовки, поэтому повторное
+    обучение на том же файле пропускает чтение CSV, prepared_data,
+    разбиение и кодирование. Каждая запись - каталог с .npy и manifest.json,
+    записанный во временный каталог и переименованный целиком. При
+    превышении квоты удаляются записи, которые дольше всего не читались.
+    """
+    def __init__(self, root: str = DATASET_CACHE_DIR, quota_mb: float = DATASET_CACHE_QUOTA_MB):
+        """Инициализация кэша
+
+        Args:
+            root (str, optional): каталог кэша
+            quota_mb (float, optional): предельный размер, МБ (0 - кэш выключен)
+        """
+        self.root = root
+        self.quota = quota_mb * (1 << 20)
+
+    @property
+    def enabled(self) -> bool:
+        """Включён ли кэш"""
+        return self.quota > 0
+
+    def key(self, path: str, member: str | None, config: dict) -> str:
+        """Ключ записи: хэш файла, имя CSV в архиве и настройки подготовки
+
+        Args:
+            path (str): загруженный файл (как есть, до распаковки)
+            member (str | None): имя CSV внутри ZIP
+            config (dict): настройки подготовки данных
+
+        Returns:
+            str: шестнадцатеричный ключ
+        """
+        description = json.dumps({"file": file_digest(path), "member": member,
+                                  "config": config, "format": CACHE_FORMAT},
+                                 sort_keys=True, default=str)
+        return hashlib.sha256(description.encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        """Каталог записи"""
+        return os.path.join(self.root, key)
+
+    def load(self, key: str) -> PreparedDataset | None:
+        """Чтение записи (массивы отображаются в память только для чтения)
+
+        Args:
+            key (str): ключ записи
+
+        Returns:
+            PreparedDataset | None: набор или None, если записи нет
+        """
+        path = self._path(key)
+        try:
+            with open(os.path.join(path, MANIFEST_FILE), encoding="utf-8") as f:
+                manifest = json.load(f)
+            frames = {}
+            for part in PARTS:
+                columns = {}
+                for column, categories in manifest["columns"].items():
+                    values = np.load(os.path.join(path, f"X_{part}-{column}.npy"), mmap_mode="r")
+                    if categories is None:
+                        columns[column] = np.asarray(values)
+                    else:
+                        columns[column] = pd.Categorical.from_codes(values, categories).astype(object)
+                index = np.load(os.path.join(path, f"index_{part}.npy"))
+                frames[part] = (
+                    pd.DataFrame(columns, index=index),
+                    pd.Series(np.load(os.path.join(path, f"y_{part}.npy")), index=index,
+                              name=manifest["target"]),
+                )
+            dataset = PreparedDataset(
+                frames["train"][0], frames["test"][0], frames["train"][1], frames["test"][1],
+                joblib.load(os.path.join(path, "preprocessor.pkl")),
+                np.load(os.path.join(path, "X_train_encoded.npy"), mmap_mode="r"),
+                np.load(os.path.join(path, "X_test_encoded.npy"), mmap_mode="r"),
+            )
+        except FileNotFoundError:
+            return None
+        # время последнего чтения - для вытеснения давно не используемых записей
+        os.utime(path)
+        logger.info(f"Подготовленные данные взяты из кэша ({key[:12]})")
+        return dataset
+
+    def save(self, key: str, dataset: PreparedDataset) -> None:
+        """Запись набора и вытеснение старых записей сверх квоты
+
+        Args:
+            key (str): ключ записи
+            dataset (PreparedDataset): подготовленные данные
+        """
+        path = self._path(key)
+        if os.path.exists(path):
+            return
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = tempfile.mkdtemp(dir=self.root, prefix=".tmp-")
+        try:
+            columns = {}
+            for column, dtype in dataset.X_train.dtypes.items():
+                if dtype == object:
+                    # пропуски хранятся кодом -1 и читаются обратно как NaN
+                    values = pd.concat([dataset.X_train[column], dataset.X_test[column]])
+                    columns[column] = sorted(values.dropna().unique().tolist())
+                else:
+                    columns[column] = None
+            for part in PARTS:
+                X = getattr(dataset, f"X_{part}")
+                for column, categories in columns.items():
+                    values = X[column].to_numpy()
+                    if categories is not None:
+                        values = pd.Categorical(values, categories).codes.astype(np.int16)
+                    np.save(os.path.join(tmp_path, f"X_{part}-{column}.npy"), values)
+                np.save(os.path.join(tmp_path, f"index_{part}.npy"), X.index.to_numpy())
+                np.save(os.path.join(tmp_path, f"y_{part}.npy"), getattr(dataset, f"y_{part}").to_numpy())
+                np.save(os.path.join(tmp_path, f"X_{part}_encoded.npy"),
+                        np.asarray(getattr(dataset, f"X_{part}_encoded")))
+            joblib.dump(dataset.preprocessor, os.path.join(tmp_path, "preprocessor.pkl"))
+            manifest = {"columns": columns, "target": dataset.y_train.name,
+                        "rows": {part: len(getattr(dataset, f"X_{part}")) for part in PARTS},
+                        "created_at": time.time(), "format": CACHE_FORMAT}
+            with open(os.path.join(tmp_path, MANIFEST_FILE), "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, path)
+        except OSError:
+            # запись уже создана другим процессом или нет места: кэш необязателен
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            return
+        self.evict()
+
+    def entries(self) -> list:
+        """Записи кэша: (время последнего чтения, размер в байтах, путь)"""
+        if not os.path.isdir(self.root):
+            return []
+        result = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.startswith(".") or not os.path.isdir(path):
+                continue
+            size = sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+            result.append((os.stat(path).st_mtime, size, path))
+        return sorted(result)
+
+    def evict(self) -> None:
+        """Удаление давно не читавшихся записей, пока кэш больше квоты"""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.quota:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            logger.info(f"Запись кэша данных удалена по квоте: {os.path.basename(path)[:12]}")
+
+
+dataset_cache = DatasetCache()
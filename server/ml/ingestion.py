@@ -0,0 +1,147 @@
+import csv
+import io
+import os
+import numpy as np
+import pandas as pd
+from ml.prepared_data import SAMPLE_SIZE, SIZE_COLUMNS
+
+# количество строк CSV, читаемых за один раз
+CHUNK_SIZE = 50_000
+# столбцы, которые не нужны модели и не читаются
+SKIP_COLUMNS = ["id"]
+# целевая переменная читается с типом по умолчанию
+TARGET_COLUMN = "class"
+
+
+def row_keys(rows: np.ndarray, random_state: int = 42) -> np.ndarray:
+    """Псевдослучайные ключи строк (splitmix64 от номера строки)
+
+    Ключ зависит только от номера строки в файле и зерна, поэтому выборка
+    "k строк с наименьшими ключами" не зависит от размера и порядка чанков.
+
+    Args:
+        rows (np.ndarray): номера строк в файле
+        random_state (int, optional): зерно. По умолчанию 42.
+
+    Returns:
+        np.ndarray: ключи uint64
+    """
+    with np.errstate(over="ignore"):
+        z = np.asarray(rows, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+        z += np.uint64(random_state) * np.uint64(0xD1B54A32D192ED03)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return z ^ (z >> np.uint64(31))
+
+
+def compact_dtypes(header: list) -> dict:
+    """Типы столбцов: category для признаков, float64 для размеров
+
+    Размеры остаются float64: из них считается площадь, и при обслуживании
+    (prepared_data_inference) она считается в float64.
+
+    Args:
+        header (list): имена столбцов CSV
+
+    Returns:
+        dict: словарь dtype для pd.read_csv
+    """
+    return {
+        column: np.float64 if column in SIZE_COLUMNS else "category"
+        for column in header
+        if column != TARGET_COLUMN and column not in SKIP_COLUMNS
+    }
+
+
+def select_sample(chunk: pd.DataFrame, sample_size: int, random_state: int) -> pd.DataFrame:
+    """Строки чанка без пропусков в размерах, претендующие на попадание в выборку
+
+    Args:
+        chunk (pd.DataFrame): чанк, индекс которого - номера строк в файле
+        sample_size (int): размер выборки
+        random_state (int): зерно
+
+    Returns:
+        pd.DataFrame: не более sample_size строк со столбцом ключей "_key"
+    """
+    chunk = chunk.dropna(subset=SIZE_COLUMNS)
+    chunk = chunk.assign(_key=row_keys(chunk.index.to_numpy(), random_state))
+    return chunk.nsmallest(sample_size, "_key")
+
+
+def finalize_sample(sample: pd.DataFrame) -> pd.DataFrame:
+    """Приведение выборки к виду, который ожидает prepared_data
+
+    Args:
+        sample (pd.DataFrame): отобранные строки со столбцом "_key"
+
+    Returns:
+        pd.DataFrame: строки в порядке файла, признаки object, размеры float64
+    """
+    sample = sample.sort_index().drop(columns="_key")
+    return sample.astype({
+        column: object if isinstance(dtype, pd.CategoricalDtype) else np.float64
+        for column, dtype in sample.dtypes.items()
+        if isinstance(dtype, pd.CategoricalDtype) or column in SIZE_COLUMNS
+    })
+
+
+def read_training_data(file,
+                       chunksize: int = CHUNK_SIZE,
+                       sample_size: int = SAMPLE_SIZE,
+                       random_state: int = 42) -> pd.DataFrame:
+    """Потоковое чтение обучающего CSV с равномерной выборкой строк
+
+    Файл читается чанками с компактными типами, строки с пропусками в
+    размерах отбрасываются сразу, а в памяти остаются только sample_size
+    строк с наименьшими ключами row_keys (детерминированный резервуар).
+    Пиковая память зависит от размера чанка и выборки, а не от файла.
+
+    Args:
+        file: путь или файловый объект (бинарный или текстовый) с CSV
+        chunksize (int, optional): строк в чанке. По умолчанию CHUNK_SIZE.
+        sample_size (int, optional): размер выборки. По умолчанию SAMPLE_SIZE.
+        random_state (int, optional): зерно. По умолчанию 42.
+
+    Raises:
+        ValueError: если в файле нет заголовка
+
+    Returns:
+        pd.DataFrame: выборка строк в порядке их следования в файле
+    """
+    if isinstance(file, (str, bytes, os.PathLike)):
+        with open(file, "rb") as f:
+            return read_training_data(f, chunksize, sample_size, random_state)
+    # бинарный поток оборачивается в текстовый, чтобы прочитать заголовок
+    wrapped = isinstance(file.read(0), bytes)
+    # utf-8-sig: BOM, который добавляет Excel, не попадает в имя первого столбца
+    stream = io.TextIOWrapper(file, encoding="utf-8-sig", newline="") if wrapped else file
+    try:
+        header = next(csv.reader([stream.readline()]), None)
+        if not header:
+            raise ValueError("Файл пуст: нет строки заголовка")
+        reader = pd.read_csv(
+            stream,
+            names=header,
+            header=None,
+            usecols=[column for column in header if column not in SKIP_COLUMNS],
+            dtype=compact_dtypes(header),
+            chunksize=chunksize,
+        )
+        sample = None
+        for chunk in reader:
+            candidates = select_sample(chunk, sample_size, random_state)
+            if sample is not None:
+                # категории чанков различаются, поэтому склеиваем как object
+                candidates = pd.concat([sample, candidates.astype({
+                    column: object for column, dtype in candidates.dtypes.items()
+                    if isinstance(dtype, pd.CategoricalDtype)})])
+                candidates = candidates.nsmallest(sample_size, "_key")
+            sample = candidates
+    finally:
+        if wrapped:
+            # исходный файл закрывает его владелец
+            stream.detach()
+    if sample is None:
+        return pd.DataFrame(columns=[c for c in header if c not in SKIP_COLUMNS])
+    return finalize_sample(sample)
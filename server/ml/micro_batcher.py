@@ -0,0 +1,162 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Mapping
+import numpy as np
+from utils.logger import log as logger
+
+# максимальный размер пакета
+BATCH_MAX_SIZE = int(os.getenv("MUSHROOMS_BATCH_MAX_SIZE", "64"))
+# сколько ждать попутчиков после первого запроса, мкс (0 - без пакетирования)
+BATCH_MAX_WAIT_US = int(os.getenv("MUSHROOMS_BATCH_MAX_WAIT_US", "0"))
+# границы гистограммы размеров пакетов
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class MicroBatcher:
+    """Объединение одновременных запросов в один векторный вызов модели.
+
+    Обработчики запросов кладут свои строки в очередь и ждут Future.
+    Поток-диспетчер берёт первый запрос, ждёт ещё не дольше max_wait_us
+    (или пока не наберётся max_size строк), считает пакет одним вызовом
+    score и раздаёт строки результата обратно. Запросы к разным снимкам
+    модели считаются отдельными пакетами.
+    """
+    def __init__(self, score: Callable, max_size: int = BATCH_MAX_SIZE,
+                 max_wait_us: int = BATCH_MAX_WAIT_US):
+        """Инициализация диспетчера
+
+        Args:
+            score (Callable): функция score(served, prepared) -> np.ndarray
+            max_size (int, optional): максимальный размер пакета (в строках)
+            max_wait_us (int, optional): окно сбора пакета, мкс
+        """
+        self.score = score
+        self.max_size = max_size
+        self.max_wait_us = max_wait_us
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.requests = 0
+        self.rows = 0
+        self.max_batch_size = 0
+        self.queue_delay_total = 0.0
+        self.queue_delay_max = 0.0
+        self.size_histogram = dict.fromkeys(BATCH_SIZE_BUCKETS + (float("inf"),), 0)
+
+    @property
+    def enabled(self) -> bool:
+        """Включено ли пакетирование"""
+        return self.max_wait_us > 0 and self.max_size > 1
+
+    def submit(self, served, prepared: Mapping[str, np.ndarray]) -> Future:
+        """Постановка строк в очередь на расчёт
+
+        Args:
+            served: снимок модели
+            prepared (Mapping[str, np.ndarray]): подготовленные столбцы
+
+        Returns:
+            Future: результат score для этих строк
+        """
+        self._ensure_started()
+        future = Future()
+        self._queue.put((served, prepared, future, time.perf_counter()))
+        return future
+
+    def __call__(self, served, prepared: Mapping[str, np.ndarray]) -> np.ndarray:
+        """Расчёт строк в составе пакета (блокирует до получения результата)"""
+        if not self.enabled:
+            return self.score(served, prepared)
+        return self.submit(served, prepared).result()
+
+    def _ensure_started(self) -> None:
+        """Ленивый запуск потока-диспетчера"""
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._loop, daemon=True,
+                                                    name="micro-batcher")
+                    self._thread.start()
+
+    def _collect(self) -> list:
+        """Сбор пакета: первый запрос ждём без ограничения, остальные - до конца окна"""
+        items = [self._queue.get()]
+        size = len(next(iter(items[0][1].values())))
+        deadline = time.perf_counter() + self.max_wait_us / 1e6
+        while size < self.max_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            items.append(item)
+            size += len(next(iter(item[1].values())))
+        return items
+
+    def _loop(self) -> None:
+        """Цикл потока-диспетчера"""
+        while True:
+            items = self._collect()
+            groups = {}
+            for item in items:
+                groups.setdefault(item[0].token, []).append(item)
+            for group in groups.values():
+                self._run(group)
+
+    def _run(self, items: list) -> None:
+        """Расчёт одного пакета и раздача результатов"""
+        started = time.perf_counter()
+        served = items[0][0]
+        sizes = [len(next(iter(prepared.values()))) for _, prepared, _, _ in items]
+        try:
+            batch = {column: np.concatenate([prepared[column] for _, prepared, _, _ in items])
+                     for column in items[0][1]}
+            result = self.score(served, batch)
+        except Exception as e:
+            logger.error(f"❌Ошибка расчёта пакета: {e}")
+            for _, _, future, _ in items:
+                future.set_exception(e)
+            return
+        self._record(sum(sizes), [started - item[3] for item in items])
+        offset = 0
+        for size, (_, _, future, _) in zip(sizes, items):
+            future.set_result(result[offset:offset + size])
+            offset += size
+
+    def _record(self, size: int, delays: list) -> None:
+        """Учёт размера пакета и времени ожидания в очереди"""
+        with self._stats_lock:
+            self.batches += 1
+            self.requests += len(delays)
+            self.rows += size
+            self.max_batch_size = max(self.max_batch_size, size)
+            self.queue_delay_total += sum(delays)
+            self.queue_delay_max = max(self.queue_delay_max, max(delays))
+            bucket = next(b for b in self.size_histogram if size <= b)
+            self.size_histogram[bucket] += 1
+
+    def stats(self) -> dict:
+        """Метрики пакетирования: размеры пакетов и задержка в очереди"""
+        with self._stats_lock:
+            requests = self.requests
+            return {
+                "enabled": self.enabled,
+                "max_size": self.max_size,
+                "max_wait_us": self.max_wait_us,
+                "batches": self.batches,
+                "requests": requests,
+                "rows": self.rows,
+                "mean_batch_size": round(self.rows / self.batches, 3) if self.batches else 0.0,
+                "max_batch_size": self.max_batch_size,
+                "mean_queue_delay_us": round(self.queue_delay_total / requests * 1e6, 1) if requests else 0.0,
+                "max_queue_delay_us": round(self.queue_delay_max * 1e6, 1),
+                "batch_size_histogram": {("+Inf" if b == float("inf") else str(b)): count
+                                         for b, count in self.size_histogram.items()},
+            }
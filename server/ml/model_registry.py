@@ -0,0 +1,385 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+import joblib
+from ml.compiled_model import CompiledForest
+from utils.logger import log as logger
+
+try:
+    import fcntl
+except ImportError:  # Windows: межпроцессная блокировка недоступна
+    fcntl = None
+
+BASE_DIR = Path(__file__).parent.parent
+# каталог с версиями моделей
+MODELS_DIR = os.getenv("MUSHROOMS_MODELS_DIR", os.path.join(BASE_DIR, "models"))
+# модель, сохранённая до появления реестра
+LEGACY_MODEL_PATH = os.path.join(BASE_DIR, "mushrooms_model.pkl")
+INDEX_FILE = "registry.json"
+# как часто обработчик запросов проверяет, не сменилась ли активная версия, с
+REFRESH_INTERVAL = float(os.getenv("MUSHROOMS_MODEL_REFRESH", "1.0"))
+# обслуживать модель из отображаемых в память массивов (общих для всех воркеров)
+USE_MMAP = os.getenv("MUSHROOMS_MODEL_MMAP", "0") == "1"
+
+
+def atomic_write(path: str, write) -> None:
+    """Атомарная запись файла: во временный файл рядом, затем rename
+
+    Args:
+        path (str): итоговый путь
+        write: функция write(file), пишущая содержимое в открытый файл
+    """
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class ModelRegistry:
+    """Реестр версий модели.
+
+    Каждая версия - отдельный файл, записанный атомарно; индекс
+    registry.json хранит список версий, активную версию и историю
+    активаций для отката. Обрыв записи не портит уже сохранённые версии.
+    """
+    def __init__(self, root: str = MODELS_DIR):
+        """Инициализация реестра
+
+        Args:
+            root (str, optional): каталог реестра. По умолчанию MODELS_DIR.
+        """
+        self.root = root
+        self.index_path = os.path.join(root, INDEX_FILE)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _locked(self):
+        """Блокировка индекса для потоков и процессов"""
+        os.makedirs(self.root, exist_ok=True)
+        with self._lock, open(os.path.join(self.root, ".lock"), "w") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def _read_index(self) -> dict:
+        """Чтение индекса (пустой индекс, если реестр ещё не создан)"""
+        if not os.path.exists(self.index_path):
+            return {"active": None, "history": [], "versions": {}}
+        with open(self.index_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_index(self, index: dict) -> None:
+        """Атомарная запись индекса"""
+        atomic_write(self.index_path,
+                     lambda f: f.write(json.dumps(index, ensure_ascii=False, indent=2).encode()))
+
+    def path(self, version: str) -> str:
+        """Путь к файлу версии"""
+        return os.path.join(self.root, f"mushrooms_model-{version}.pkl")
+
+    def save(self, artifact: dict, activate: bool = True) -> str:
+        """Сохранение новой версии модели
+
+        Args:
+            artifact (dict): артефакт с моделью и метаданными
+            activate (bool, optional): сделать версию активной. По умолчанию True.
+
+        Returns:
+            str: номер версии
+        """
+        version = datetime.now().strftime("%Y%m%dT%H%M%S") + "-" + uuid.uuid4().hex[:6]
+        artifact = {**artifact, "version": version}
+        os.makedirs(self.root, exist_ok=True)
+        atomic_write(self.path(version), lambda f: joblib.dump(artifact, f))
+        with self._locked():
+            index = self._read_index()
+            index["versions"][version] = {
+                "trained_at": artifact.get("trained_at"),
+                "file": os.path.basename(self.path(version)),
+            }
+            if activate:
+                self._activate(index, version)
+            self._write_index(index)
+        logger.info(f"💾Сохранена версия модели {version}")
+        return version
+
+    def _activate(self, index: dict, version: str) -> None:
+        """Смена активной версии в индексе с запоминанием предыдущей"""
+        if index["active"] and index["active"] != version:
+            index["history"].append(index["active"])
+        index["active"] = version
+
+    def versions(self) -> list:
+        """Список версий (от старых к новым) с признаком активной"""
+        index = self._read_index()
+        return [{"version": version, "active": version == index["active"], **info}
+                for version, info in sorted(index["versions"].items())]
+
+    def active_version(self) -> str | None:
+        """Активная версия или None, если реестр пуст"""
+        return self._read_index()["active"]
+
+    def activate(self, version: str) -> None:
+        """Активация существующей версии
+
+        Raises:
+            KeyError: если версии нет в реестре
+        """
+        with self._locked():
+            index = self._read_index()
+            if version not in index["versions"]:
+                raise KeyError(version)
+            self._activate(index, version)
+            self._write_index(index)
+
+    def rollback(self) -> str:
+        """Возврат к предыдущей активной версии
+
+        Raises:
+            LookupError: если откатываться некуда
+
+        Returns:
+            str: версия, ставшая активной
+        """
+        with self._locked():
+            index = self._read_index()
+            while index["history"]:
+                version = index["history"].pop()
+                if version in index["versions"] and version != index["active"]:
+                    index["active"] = version
+                    self._write_index(index)
+                    return version
+            raise LookupError("Нет предыдущей версии для отката")
+
+    def load(self, version: str) -> dict:
+        """Загрузка артефакта версии"""
+        return joblib.load(self.path(version))
+
+    def load_active(self, legacy_path: str = LEGACY_MODEL_PATH) -> tuple:
+        """Артефакт активной версии (или модели без реестра)
+
+        Args:
+            legacy_path (str, optional): файл модели без реестра
+
+        Raises:
+            LookupError: если модели ещё нет
+
+        Returns:
+            tuple: (версия или None, артефакт)
+        """
+        version = self.active_version()
+        if version is not None:
+            return version, self.load(version)
+        if os.path.exists(legacy_path):
+            return None, joblib.load(legacy_path)
+        raise LookupError("Нет обученной модели для дообучения")
+
+    def info(self, version: str) -> dict:
+        """Метаданные версии из индекса (без загрузки модели)"""
+        return {**self._read_index()["versions"][version], "version": version}
+
+    def arrays_path(self, version: str) -> str:
+        """Каталог с массивами скомпилированного движка версии"""
+        return os.path.join(self.root, f"mushrooms_model-{version}.arrays")
+
+    def load_mapped(self, version: str) -> CompiledForest:
+        """Движок версии с массивами, отображёнными в память только для чтения
+
+        Если массивы ещё не выгружены, модель один раз компилируется и
+        сохраняется рядом с артефактом (во временный каталог, затем rename),
+        после чего все процессы отображают одни и те же файлы.
+
+        Args:
+            version (str): номер версии
+
+        Returns:
+            CompiledForest: движок с np.memmap-массивами
+        """
+        path = self.arrays_path(version)
+        if not os.path.exists(path):
+            with self._locked():
+                if not os.path.exists(path):
+                    engine = CompiledForest(self.load(version)["model"])
+                    tmp_path = tempfile.mkdtemp(dir=self.root, prefix=".tmp-")
+                    engine.save(tmp_path)
+                    os.replace(tmp_path, path)
+        return CompiledForest.load(path, mmap_mode="r")
+
+
+class ServedModel:
+    """Снимок обслуживаемой модели: версия, артефакт и готовые к работе объекты"""
+    def __init__(self, version: str | None = None, artifact: dict | None = None, engine=None):
+        self.version = version
+        self.artifact = artifact
+        self.model = artifact.get("model") if artifact else None
+        self.engine = engine
+        # идентификатор снимка: у модели без реестра версии нет, но кэш
+        # предсказаний всё равно должен отличать одну загрузку от другой
+        self.token = version or uuid.uuid4().hex
+
+    @property
+    def available(self) -> bool:
+        """Есть ли чем считать предсказания"""
+        return self.model is not None or self.engine is not None
+
+    @property
+    def classes_(self):
+        """Метки классов модели"""
+        return self.engine.classes_ if self.engine is not None else self.model.classes_
+
+
+class ModelHandle:
+    """Ссылка на текущую модель с атомарной заменой без перезапуска.
+
+    Запрос берёт снимок current() один раз и работает с ним до конца,
+    поэтому замена модели не затрагивает уже идущие запросы. Реестр
+    проверяется и новая версия загружается в фоновом потоке; запросы в
+    это время обслуживаются старой версией.
+    """
+    def __init__(self, registry: ModelRegistry, prepare=None,
+                 legacy_path: str = LEGACY_MODEL_PATH, mmap: bool = USE_MMAP, load: bool = True,
+                 accelerate=None):
+        """Инициализация и загрузка активной версии
+
+        Args:
+            registry (ModelRegistry): реестр моделей
+            prepare (optional): функция prepare(model) -> движок инференса
+            legacy_path (str, optional): файл модели без реестра
+            mmap (bool, optional): обслуживать версии реестра движком с
+                                   отображёнными в память массивами, не
+                                   распаковывая пайплайн sklearn
+            load (bool, optional): загрузить модель сразу. Иначе модель
+                                   загружается вызовом load() (при старте
+                                   сервиса) или первым запросом
+            accelerate (optional): функция accelerate(engine) -> движок или
+                                   None, оборачивающая движок из отображённых
+                                   массивов (при mmap)
+        """
+        self.registry = registry
+        self.prepare = prepare
+        self.legacy_path = legacy_path
+        self.mmap = mmap
+        self.accelerate = accelerate
+        self._served = ServedModel()
+        self._checked_at = 0.0
+        self._loaded = False
+        self._load_lock = threading.Lock()
+        if load:
+            self.load()
+
+    @property
+    def loaded(self) -> bool:
+        """Была ли уже попытка загрузки модели"""
+        return self._loaded
+
+    def load(self) -> ServedModel:
+        """Первая загрузка модели; после неё вызов ничего не делает
+
+        Returns:
+            ServedModel: текущий снимок
+        """
+        with self._load_lock:
+            if not self._loaded:
+                self._refresh(force=True)
+        return self._served
+
+    def current(self) -> ServedModel:
+        """Снимок текущей модели (с периодической проверкой реестра)"""
+        if not self._loaded:
+            return self.load()
+        if time.monotonic() - self._checked_at >= REFRESH_INTERVAL:
+            self._refresh_in_background()
+        return self._served
+
+    def _refresh_in_background(self) -> None:
+        """Проверка реестра и загрузка новой версии в фоновом потоке
+
+        Запрос не ждёт ни чтения индекса, ни загрузки модели: до конца
+        загрузки обслуживает прежний снимок, готовый заменяет его целиком.
+        """
+        # проверку выполняет один поток, блокировку освобождает он же
+        if not self._load_lock.acquire(blocking=False):
+            return
+        # следующие запросы до конца проверки не запускают новую
+        self._checked_at = time.monotonic()
+        try:
+            threading.Thread(target=self._refresh_and_release, name="model-refresh", daemon=True).start()
+        except Exception:
+            self._load_lock.release()
+            raise
+
+    def _refresh_and_release(self) -> None:
+        try:
+            self._refresh(force=False)
+        finally:
+            self._load_lock.release()
+
+    def refresh(self, force: bool = False) -> ServedModel:
+        """Подхват новой активной версии из реестра
+
+        Args:
+            force (bool, optional): перезагрузить, даже если версия не менялась
+
+        Returns:
+            ServedModel: актуальный снимок
+        """
+        # проверку выполняет один поток, остальные не ждут его
+        if not self._load_lock.acquire(blocking=force):
+            return self._served
+        try:
+            return self._refresh(force)
+        finally:
+            self._load_lock.release()
+
+    def _refresh(self, force: bool) -> ServedModel:
+        """Проверка реестра и загрузка новой версии (под self._load_lock)"""
+        try:
+            self._checked_at = time.monotonic()
+            version = self.registry.active_version()
+            if version == self._served.version and self._loaded and not force:
+                return self._served
+            self._served = self._load(version)
+            return self._served
+        except Exception as e:
+            logger.error(f"❌Не удалось загрузить модель: {e}")
+            return self._served
+        finally:
+            self._loaded = True
+
+    def _load(self, version: str | None) -> ServedModel:
+        """Загрузка версии (или файла без реестра) в новый снимок"""
+        if version is not None and self.mmap:
+            engine = self.registry.load_mapped(version)
+            if self.accelerate is not None:
+                engine = self.accelerate(engine) or engine
+            logger.info(f"Обслуживается версия модели {version} (memory-mapped)")
+            return ServedModel(version, self.registry.info(version), engine)
+        if version is not None:
+            artifact = self.registry.load(version)
+        elif os.path.exists(self.legacy_path):
+            artifact = joblib.load(self.legacy_path)
+        else:
+            print("Файл модели ещё не существует")
+            return ServedModel()
+        engine = None
+        if self.prepare is not None and artifact.get("model") is not None:
+            engine = self.prepare(artifact["model"])
+        logger.info(f"Обслуживается версия модели {version or 'legacy'}")
+        return ServedModel(version, artifact, engine)
+
+
+registry = ModelRegistry()
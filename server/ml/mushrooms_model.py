@@ -1,98 +1,263 @@
-import os
+import copy
 import pandas as pd
+from sklearn.base import clone
 from sklearn.compose import ColumnTransformer
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import f1_score, make_scorer
-from sklearn.model_selection import GridSearchCV, KFold, train_test_split
+from sklearn.model_selection import KFold, train_test_split
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import MinMaxScaler, OneHotEncoder
-import joblib
 from datetime import datetime
-from ml.prepared_data import prepared_data
+from ml.prepared_data import CATEGORY_GROUPS, SAMPLE_SIZE, prepared_data
+from ml.dataset_cache import PreparedDataset, dataset_cache
+from ml.ingestion import read_training_data
 from ml.param_grid import param_grid
+from ml.model_registry import registry
+from ml.search import SEARCH_BUDGET, SEARCH_STRATEGY, HyperparameterSearch
+from ml.resource_governor import TrainingGovernor
 from utils.logger import log as logger
+from utils.profiling import profile_call
+
+# доля заполненных значений, ниже которой столбец удаляется
+NUM_PASS = 0.7
+# доля тестовой выборки
+TEST_SIZE = 0.25
+# версия чтения данных и make_preprocessor: меняется вместе с ними, чтобы не брать старые записи кэша данных
+PREPROCESSING_VERSION = 2
+
+
+def dataset_config() -> dict:
+    """Настройки подготовки данных, от которых зависит запись в кэше данных"""
+    return {
+        "num_pass": NUM_PASS,
+        "category_groups": CATEGORY_GROUPS,
+        "sample_size": SAMPLE_SIZE,
+        "test_size": TEST_SIZE,
+        "random_state": 42,
+        "preprocessing": PREPROCESSING_VERSION,
+    }
+
+
+def make_preprocessor(X: pd.DataFrame, scaler: MinMaxScaler | None = None) -> ColumnTransformer:
+    """Препроцессор признаков: масштабирование площади и one-hot категорий
+
+    Args:
+        X (pd.DataFrame): датафрейм независимых переменных.
+        scaler (MinMaxScaler | None, optional): масштабирование площади.
+                                                По умолчанию новый MinMaxScaler.
+
+    Returns:
+        ColumnTransformer: необученный препроцессор
+    """
+    cat = [i for i in X.select_dtypes(include='object').columns]
+    numeric_transformer = Pipeline(steps=[
+        ('scaler', scaler if scaler is not None else MinMaxScaler())
+    ])
+    categorical_transformer = Pipeline(steps=[
+        ('o_encoder', OneHotEncoder(handle_unknown='ignore'))
+    ])
+    return ColumnTransformer(
+        transformers=[
+            ('num', numeric_transformer, ["square-mushroom"]),
+            ('cat', categorical_transformer, cat),
+            ])
+
+
+def _no_progress(phase: str, **info):
+    """Заглушка для отчёта о прогрессе обучения"""
 
 
 class MushroomsModel:
     """Обучение модели классификации грибов"""    
-    def __init__(self, filename):
+    def __init__(self, filename, progress=None, strategy: str | None = None,
+                 budget: float | None = None, cache_key: str | None = None,
+                 profile: str | None = None, governor: TrainingGovernor | None = None):
         """Инициализация модели
 
         Args:
             filename: Входной файл .csv/.zip
+            progress (optional): функция progress(phase, **info) для отчёта
+                                 о ходе обучения. По умолчанию не используется.
+            strategy (str | None, optional): стратегия подбора гиперпараметров
+                (grid, halving, random, capped). По умолчанию SEARCH_STRATEGY.
+            budget (float | None, optional): бюджет подбора, с. По умолчанию SEARCH_BUDGET.
+            cache_key (str | None, optional): ключ файла в кэше подготовленных
+                данных (см. DatasetCache.key). Если запись есть, файл не читается.
+            profile (str | None, optional): профилировщик подбора гиперпараметров
+                (cprofile или sample). По умолчанию подбор не профилируется.
+            governor (TrainingGovernor | None, optional): ограничение ядер и
+                паузы обучения. По умолчанию - из переменных окружения, без пауз.
         """        
-        self.df = pd.read_csv(filename)
+        self.progress = progress or _no_progress
+        self.strategy = strategy or SEARCH_STRATEGY
+        self.budget = SEARCH_BUDGET if budget is None else budget
+        self.cache_key = cache_key if dataset_cache.enabled else None
+        self.profile = profile
+        self.governor = governor or TrainingGovernor()
+        self.dataset = dataset_cache.load(self.cache_key) if self.cache_key else None
+        self.progress("read", cached=self.dataset is not None)
+        self.df = read_training_data(filename) if self.dataset is None else None
         self.scaler = MinMaxScaler()
         self.model = RandomForestClassifier(random_state=42, n_estimators=150, min_samples_split=10)
         self.kfold = KFold(n_splits=5, shuffle=True, random_state=42)
         self.pipeline = None
+        self.version = None
+        # дополнительные поля артефакта (например, сведения о дообучении)
+        self.metadata = {}
     
     def preprocess_data(self):
         """Препроцессинг данных"""        
         try:
-            df = prepared_data(self.df)
-            # делим датасет на целевую переменную(target) и независимые переменные(признаки)
-            X = df.drop('class', axis=1)
-            y = df['class']
-            # отделяем выборку на тренировочную и тестовую
-            X_train, X_test, y_train, y_test = train_test_split(X, y, random_state=42, test_size=0.25)
+            if self.dataset is None:
+                self.dataset = self.prepare_dataset()
+            X_train, y_train = self.dataset.X_train, self.dataset.y_train
+            self.preprocessor = self.make_preprocessor(X_train)
             best_model = self.validation_model(X_train, y_train)
-            cat = [i for i in X.select_dtypes(include='object').columns]
-            numeric_transformer = Pipeline(steps=[
-                ('scaler', self.scaler)
-            ])
-            categorical_transformer = Pipeline(steps=[
-                ('o_encoder', OneHotEncoder(handle_unknown='ignore'))
-            ])
-            preprocessor = ColumnTransformer(
-                transformers=[
-                    ('num', numeric_transformer, ["square-mushroom"]),
-                    ('cat', categorical_transformer, cat),
-                    ])
-            pipeline = Pipeline(steps=[
-                ('preprocessor', preprocessor),
+
+            # идентификатор профиля подбора виден в прогрессе задачи
+            info = {"profile_id": self.metadata["profile_id"]} if "profile_id" in self.metadata else {}
+            self.progress("fit", **info)
+            self.governor.checkpoint()
+            best_model.set_params(n_jobs=self.governor.cpus)
+            # препроцессор уже обучен на X_train, лес обучается на готовой матрице
+            best_model.fit(self.dataset.X_train_encoded, y_train.to_numpy())
+            self.pipeline = Pipeline(steps=[
+                ('preprocessor', self.dataset.preprocessor),
                 ('classifier', best_model)
                 ])
-            
-            pipeline.fit(X_train, y_train)
-            self.pipeline = pipeline
         except Exception as e:
             logger.error(f"❌Возникла ошибка при препроцессинге: {e}")
 
-    def validation_model(self, X_train: pd.DataFrame, y_train: pd.DataFrame) -> GridSearchCV:
+    def prepare_dataset(self) -> PreparedDataset:
+        """Подготовка, разбиение и кодирование данных (с сохранением в кэш)
+
+        Returns:
+            PreparedDataset: обучающая и тестовая выборки до и после кодирования
+        """
+        self.progress("prepare", rows=len(self.df))
+        df = prepared_data(self.df, NUM_PASS)
+        # делим датасет на целевую переменную(target) и независимые переменные(признаки)
+        X = df.drop('class', axis=1)
+        y = df['class']
+        # отделяем выборку на тренировочную и тестовую
+        X_train, X_test, y_train, y_test = train_test_split(X, y, random_state=42, test_size=TEST_SIZE)
+        dataset = PreparedDataset.build(X_train, X_test, y_train, y_test, self.make_preprocessor(X))
+        if self.cache_key:
+            dataset_cache.save(self.cache_key, dataset)
+        return dataset
+
+    def make_preprocessor(self, X: pd.DataFrame) -> ColumnTransformer:
+        """Препроцессор признаков (см. make_preprocessor)
+
+        Args:
+            X (pd.DataFrame): датафрейм независимых переменных.
+
+        Returns:
+            ColumnTransformer: необученный препроцессор
+        """
+        return make_preprocessor(X, self.scaler)
+
+    def validation_model(self, X_train: pd.DataFrame, y_train: pd.DataFrame) -> RandomForestClassifier:
         """Валидация и подбор гиперпараметров
 
+        Кандидаты проверяются в составе пайплайна с препроцессором, стратегия
+        и бюджет задаются self.strategy и self.budget (см. ml/search.py).
+        Оценки и время обучения каждого кандидата сохраняются в артефакт.
+        При заданном self.profile подбор идёт под профилировщиком в одном
+        процессе, идентификатор профиля сохраняется в metadata["profile_id"].
+
         Args:
             X_train (pd.DataFrame): датафрейм независимых переменных.
             y_train (pd.DataFrame): датафрейм с целевой переменной.
 
         Returns:
-            GridSearchCV: модель с лучшими найденными параметрами.
+            RandomForestClassifier: необученная модель с лучшими найденными параметрами.
         """       
         f1_scorer = make_scorer(f1_score, average='binary')
-        grid_search = GridSearchCV(
-            self.model,
+        search = HyperparameterSearch(
+            Pipeline(steps=[('preprocessor', self.preprocessor), ('classifier', self.model)]),
             param_grid,
-            cv=5,
+            cv=self.kfold,
             scoring=f1_scorer,
-            n_jobs=-1
+            strategy=self.strategy,
+            budget=self.budget,
+            progress=self.progress,
+            checkpoint=self.governor.checkpoint,
+            # процессы joblib профилировщику не видны
+            n_jobs=1 if self.profile else self.governor.cpus,
         )
-        grid_search.fit(X_train, y_train)
-        logger.info(f"Выбраны гиперпараметры:{grid_search.best_params}")
-        return grid_search.best_estimator_
+        self.progress("search", strategy=self.strategy, fits_total=search.planned_fits())
+        if self.profile:
+            _, self.metadata["profile_id"] = profile_call(
+                lambda: search.fit(X_train, y_train), self.profile,
+                {"strategy": self.strategy, "rows": len(X_train)})
+        else:
+            search.fit(X_train, y_train)
+        self.metadata["search"] = search.summary()
+        logger.info(f"Выбраны гиперпараметры:{search.best_params_}")
+        return clone(self.model).set_params(**search.best_params_)
+
+    def update_model(self, base: dict, n_estimators: int = 50, max_estimators: int | None = None):
+        """Дообучение обслуживаемой модели: новые деревья на новых данных
+
+        Обученный препроцессор и гиперпараметры леса берутся из артефакта
+        как есть, лес дообучается с warm_start=True: старые деревья не
+        меняются, n_estimators новых строятся на загруженных данных.
+
+        Args:
+            base (dict): артефакт текущей модели
+            n_estimators (int, optional): сколько деревьев добавить. По умолчанию 50.
+            max_estimators (int | None, optional): размер леса, до которого
+                удаляются самые старые деревья. По умолчанию не ограничен.
+
+        Raises:
+            ValueError: если в новых данных не все классы модели
+        """
+        self.progress("prepare", rows=len(self.df))
+        df = prepared_data(self.df)
+        X = df.drop('class', axis=1)
+        y = df['class']
+        pipeline = copy.deepcopy(base["model"])
+        preprocessor, forest = pipeline[:-1], pipeline[-1]
+        if set(y.unique()) != set(forest.classes_):
+            raise ValueError("Для дообучения нужны примеры всех классов модели")
+        trees_before = len(forest.estimators_)
+        self.progress("fit", trees=trees_before + n_estimators)
+        self.governor.checkpoint()
+        forest.set_params(warm_start=True, n_estimators=trees_before + n_estimators,
+                          n_jobs=self.governor.cpus)
+        # препроцессор не переобучается: признаки кодируются как у исходной модели
+        forest.fit(preprocessor.transform(X), y)
+        forest.set_params(warm_start=False)
+        retired = 0
+        if max_estimators is not None and len(forest.estimators_) > max_estimators:
+            retired = len(forest.estimators_) - max_estimators
+            forest.estimators_ = forest.estimators_[retired:]
+            forest.set_params(n_estimators=max_estimators)
+        self.pipeline = pipeline
+        self.metadata = {
+            "mode": "incremental",
+            "base_version": base.get("version"),
+            "trees_added": n_estimators,
+            "trees_retired": retired,
+            "n_estimators": len(forest.estimators_),
+        }
+        logger.info(f"Дообучение: +{n_estimators} деревьев, удалено {retired}, "
+                    f"в лесу {len(forest.estimators_)}")
 
     def fit_model(self):
         """Обучение и сохранение модели"""        
         try:
+            self.progress("save")
             artifact = {
                 "model": self.pipeline,
-                "trained_at": datetime.now().isoformat()
-
+                "trained_at": datetime.now().isoformat(),
+                **self.metadata,
+                # фактическая параллельность и паузы обучения
+                "resources": self.governor.summary(),
             }
-            filename = "mushrooms_model.pkl"
-            if os.path.exists(filename):
-                logger.warning(f"Файл {filename} уже существует и будет перезаписан")
-            joblib.dump(artifact, filename)
-            logger.info("💾Модель успешно обучена и сохранена в корневом каталоге проекта")
+            # новая версия пишется атомарно и сразу становится активной
+            self.version = registry.save(artifact)
+            logger.info(f"💾Модель успешно обучена и сохранена как версия {self.version}")
         except Exception as e:
             logger.error(f"❌Возникла ошибка при сохранении модели в расширении .pkl: {e}")
@@ -0,0 +1,121 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Mapping
+import numpy as np
+from utils.metrics import inference_decisions, inference_parallelism, inference_workers_busy, metrics
+
+# потоков расчёта одного пакета на весь воркер (0 - по числу ядер, 1 - без распараллеливания)
+PARALLEL_WORKERS = int(os.getenv("MUSHROOMS_PARALLEL_WORKERS", "0"))
+# пакеты меньше этого числа строк считаются в потоке запроса
+PARALLEL_MIN_ROWS = int(os.getenv("MUSHROOMS_PARALLEL_MIN_ROWS", "20000"))
+# минимум строк в одной части: мельче части не окупают передачу в пул
+PARALLEL_PART_ROWS = int(os.getenv("MUSHROOMS_PARALLEL_PART_ROWS", "10000"))
+
+
+def single_threaded(model):
+    """Расчёт модели в одном потоке: n_jobs=1 у всех шагов пайплайна
+
+    Лес обучается с n_jobs=-1, и без этого каждый запрос, даже из одной
+    строки, запускал бы пул потоков joblib на все ядра, а параллельные
+    запросы - по пулу на запрос. При обслуживании параллельность задаёт
+    ParallelScorer.
+
+    Args:
+        model: обученная модель sklearn
+
+    Returns:
+        та же модель
+    """
+    params = [name for name in model.get_params() if name == "n_jobs" or name.endswith("__n_jobs")]
+    if params:
+        model.set_params(**dict.fromkeys(params, 1))
+    return model
+
+
+class ParallelScorer:
+    """Политика расчёта пакета в зависимости от его размера.
+
+    Пакет меньше min_rows считается в потоке запроса. Больший пакет
+    делится по строкам на части не мельче part_rows: первую считает поток
+    запроса, остальные - общий на воркер пул потоков (NumPy и деревья
+    sklearn отпускают GIL). Потоки пула выдаются запросам из общего
+    бюджета без ожидания: если пул занят другими запросами, пакет делится
+    на меньшее число частей (degraded) или считается в потоке запроса,
+    поэтому одновременные запросы не занимают больше workers ядер.
+    """
+    def __init__(self, workers: int = PARALLEL_WORKERS, min_rows: int = PARALLEL_MIN_ROWS,
+                 part_rows: int = PARALLEL_PART_ROWS):
+        """Инициализация политики
+
+        Args:
+            workers (int, optional): потоков на пакет вместе с потоком запроса
+                                     (0 - по числу ядер)
+            min_rows (int, optional): порог распараллеливания, строк
+            part_rows (int, optional): минимум строк в части
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.min_rows = min_rows
+        self.part_rows = max(part_rows, 1)
+        self._free = self.workers - 1
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def plan(self, rows: int) -> int:
+        """Желаемое число частей для пакета из rows строк"""
+        if self.workers <= 1 or rows < self.min_rows:
+            return 1
+        return max(1, min(self.workers, rows // self.part_rows))
+
+    def _acquire(self, wanted: int) -> int:
+        """Сколько потоков пула (из wanted) удалось занять"""
+        with self._lock:
+            granted = min(wanted, self._free)
+            self._free -= granted
+            if self._pool is None and granted:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers - 1,
+                                                thread_name_prefix="inference")
+            busy = self.workers - 1 - self._free
+        if metrics.enabled:
+            inference_workers_busy.set(busy)
+        return granted
+
+    def _release(self, count: int) -> None:
+        with self._lock:
+            self._free += count
+            busy = self.workers - 1 - self._free
+        if metrics.enabled:
+            inference_workers_busy.set(busy)
+
+    def __call__(self, score: Callable, data: Mapping[str, np.ndarray]) -> np.ndarray:
+        """Расчёт score(data) целиком или по частям
+
+        Args:
+            score (Callable): функция подготовленных столбцов -> np.ndarray строк
+            data (Mapping[str, np.ndarray]): подготовленные столбцы
+
+        Returns:
+            np.ndarray: результат в порядке строк data
+        """
+        rows = len(next(iter(data.values())))
+        wanted = self.plan(rows)
+        extra = self._acquire(wanted - 1) if wanted > 1 else 0
+        parts = extra + 1
+        mode = "inline" if wanted == 1 else "parallel" if parts == wanted else "degraded"
+        if metrics.enabled:
+            inference_decisions.inc(mode=mode)
+            inference_parallelism.observe(parts, mode=mode)
+        if parts == 1:
+            return score(data)
+        bounds = np.linspace(0, rows, parts + 1).astype(int)
+        slices = [{column: values[start:end] for column, values in data.items()}
+                  for start, end in zip(bounds[:-1], bounds[1:])]
+        futures = []
+        try:
+            futures = [self._pool.submit(score, part) for part in slices[1:]]
+            first = score(slices[0])
+            return np.concatenate([first] + [future.result() for future in futures])
+        finally:
+            # потоки возвращаются в бюджет, только когда их части досчитаны
+            wait(futures)
+            self._release(extra)
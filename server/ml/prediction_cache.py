@@ -0,0 +1,138 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Mapping
+import numpy as np
+
+# максимальное количество строк в кэше (0 - кэш выключен)
+CACHE_SIZE = int(os.getenv("MUSHROOMS_CACHE_SIZE", "10000"))
+# время жизни записи, с (0 - без ограничения)
+CACHE_TTL = float(os.getenv("MUSHROOMS_CACHE_TTL", "0"))
+# пакеты больше этого размера считаются без кэша
+CACHE_MAX_BATCH = int(os.getenv("MUSHROOMS_CACHE_MAX_BATCH", "1000"))
+
+
+def row_keys(prepared: Mapping[str, np.ndarray]) -> list:
+    """Канонические ключи строк: значения подготовленных признаков в порядке имён
+
+    После prepared_data_inference разные записи одного гриба (код, подпись,
+    элемент перечисления, размеры с той же площадью) дают один ключ.
+
+    Args:
+        prepared (Mapping[str, np.ndarray]): подготовленные столбцы
+
+    Returns:
+        list: кортеж значений для каждой строки
+    """
+    return list(zip(*(prepared[column].tolist() for column in sorted(prepared))))
+
+
+class PredictionCache:
+    """Ограниченный LRU-кэш вероятностей по строкам с опциональным TTL.
+
+    Кэш привязан к токену обслуживаемой модели: при смене модели все
+    записи сбрасываются. Счётчики попаданий, промахов и вытеснений
+    помогают подобрать размер.
+    """
+    def __init__(self, maxsize: int = CACHE_SIZE, ttl: float = CACHE_TTL,
+                 max_batch: int = CACHE_MAX_BATCH):
+        """Инициализация кэша
+
+        Args:
+            maxsize (int, optional): максимум строк в кэше
+            ttl (float, optional): время жизни записи, с (0 - без ограничения)
+            max_batch (int, optional): максимальный размер пакета для кэширования
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_batch = max_batch
+        self._data = OrderedDict()
+        self._token = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _bind(self, token) -> None:
+        """Сброс кэша, если сменилась модель (вызывается под блокировкой)"""
+        if token != self._token:
+            if self._data:
+                self.invalidations += 1
+            self._data.clear()
+            self._token = token
+
+    def lookup(self, token, prepared: Mapping[str, np.ndarray],
+               compute: Callable[[Mapping[str, np.ndarray]], np.ndarray]) -> np.ndarray:
+        """Вероятности для строк: найденные берутся из кэша, остальные считаются одним вызовом
+
+        Args:
+            token: идентификатор обслуживаемой модели
+            prepared (Mapping[str, np.ndarray]): подготовленные столбцы
+            compute (Callable): функция подсчёта вероятностей для подмножества строк
+
+        Returns:
+            np.ndarray: вероятности формы (n_строк, n_классов)
+        """
+        n = len(next(iter(prepared.values())))
+        if self.maxsize <= 0 or n > self.max_batch:
+            return compute(prepared)
+        keys = row_keys(prepared)
+        found = [None] * n
+        now = time.monotonic()
+        with self._lock:
+            self._bind(token)
+            for i, key in enumerate(keys):
+                entry = self._data.get(key)
+                if entry is not None and self.ttl and entry[1] < now:
+                    del self._data[key]
+                    self.expirations += 1
+                    entry = None
+                if entry is None:
+                    self.misses += 1
+                else:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    found[i] = entry[0]
+        missing = [i for i, value in enumerate(found) if value is None]
+        if missing:
+            index = np.array(missing)
+            computed = compute({column: values[index] for column, values in prepared.items()})
+            expires = now + self.ttl
+            with self._lock:
+                if token == self._token:
+                    for i, row in zip(missing, computed):
+                        # копия: срез держал бы в памяти весь посчитанный пакет
+                        self._data[keys[i]] = (row.copy(), expires)
+                        self._data.move_to_end(keys[i])
+                        found[i] = row
+                    while len(self._data) > self.maxsize:
+                        self._data.popitem(last=False)
+                        self.evictions += 1
+                else:
+                    for i, row in zip(missing, computed):
+                        found[i] = row
+        return np.vstack(found)
+
+    def clear(self) -> None:
+        """Очистка кэша"""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        """Счётчики кэша"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
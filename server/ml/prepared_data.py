@@ -1,6 +1,47 @@
 import numpy as np
 import math
 import pandas as pd
+from typing import Mapping, Sequence
+from app.enums.cap_shape import CapShape
+from app.enums.cap_surface import CapSurface
+from app.enums.color import Color
+from app.enums.bool import Bool
+from app.enums.gill_attachment import GillAttachment
+from app.enums.habitat import Habitat
+from app.enums.ring_type import RingType
+from app.enums.season import Season
+
+# размеры гриба, из которых считается площадь
+SIZE_COLUMNS = ['cap-diameter', 'stem-height', 'stem-width']
+# размер выборки, на которой обучается модель
+SAMPLE_SIZE = 12_000
+# категории, которые остаются как есть, и общая категория для всех остальных
+CATEGORY_GROUPS = {
+    'cap-shape': (['s', 'o', 'f', 'b', 'x', 'c', 'p'], 'oth'),
+    'habitat': (["d", "g"], 'o'),
+    'ring-type': (["f"], 'o'),
+    'stem-color': (["n", "w", "y"], 'oth'),
+    'does-bruise-or-bleed': (["t", "f"], 'oth'),
+    'has-ring': (["t", "f"], 'oth'),
+    'gill-color': (["n", "w", "y", "b", "p", "g", "e", "o"], 'oth'),
+    'gill-attachment': (["a", "e", "p", "x", "d", "s"], 'oth'),
+    'cap-color': (["n", "w", "y", "b", "p", "g", "e", "o"], 'oth'),
+    'cap-surface': (["t", "d", "h", "s", "y", "k", "g"], 'oth'),
+}
+# перечисления API, коды которых совпадают с кодами обучающего датасета
+COLUMN_ENUMS = {
+    'cap-shape': CapShape,
+    'cap-surface': CapSurface,
+    'cap-color': Color,
+    'does-bruise-or-bleed': Bool,
+    'gill-attachment': GillAttachment,
+    'gill-color': Color,
+    'stem-color': Color,
+    'has-ring': Bool,
+    'ring-type': RingType,
+    'habitat': Habitat,
+    'season': Season,
+}
 
 
 def prepared_data(df: pd.DataFrame, num_pass: float = 0.7) -> pd.DataFrame:
@@ -14,31 +55,87 @@ def prepared_data(df: pd.DataFrame, num_pass: float = 0.7) -> pd.DataFrame:
     Returns:
         pd.DataFrame: Очищенный и подготовленный DataFrame.
     """
-    df = df.dropna(subset=['cap-diameter', 'stem-height', 'stem-width'])
-    if len(df) > 12_000:
-        df = df.sample(n=12_000, random_state=42)
+    df = df.dropna(subset=SIZE_COLUMNS)
+    if len(df) > SAMPLE_SIZE:
+        df = df.sample(n=SAMPLE_SIZE, random_state=42)
     # удаляем лишние столбцы и столбцы с большим количеством пропусков
     df = df.drop(columns=["id"], errors='ignore')
     df = df[[col for col in df if df[col].count() / len(df) >= num_pass]]
     # уменьшаем количество категорий по каждому признаку, собирая все небольшие категории в одну
-    df['cap-shape'] = np.where(
-        df['cap-shape'].isin(['s', 'o', 'f', 'b', 'x', 'c', 'p']), df['cap-shape'], 'oth')
-    df['habitat'] = np.where(df['habitat'].isin(["d", "g"]), df['habitat'], 'o')
-    df['ring-type'] = np.where(df['ring-type'] != "f", "o", df['ring-type'])
-    df['stem-color'] = np.where(df['stem-color'].isin(["n", "w", "y"]), df['stem-color'], 'oth')
-    df['does-bruise-or-bleed'] = np.where(
-        df['does-bruise-or-bleed'].isin(["t", "f"]), df['does-bruise-or-bleed'], 'oth')
-    df['has-ring'] = np.where(df['has-ring'].isin(["t", "f"]), df['has-ring'], 'oth')
-    df['gill-color'] = np.where(
-        df['gill-color'].isin(["n", "w", "y", "b", "p", "g", "e", "o"]), df['gill-color'], 'oth')
-    df['gill-attachment'] = np.where(
-        df['gill-attachment'].isin(["a", "e", "p", "x", "d", "s"]), df['gill-attachment'], 'oth')
-    df['cap-color'] = np.where(
-        df['cap-color'].isin(["n", "w", "y", "b", "p", "g", "e", "o"]), df['cap-color'], 'oth')
-    df['cap-surface'] = np.where(
-        df['cap-surface'].isin(["t", "d", "h", "s", "y", "k", "g"]), df['cap-surface'], 'oth')
+    for column, (keep, other) in CATEGORY_GROUPS.items():
+        df[column] = np.where(df[column].isin(keep), df[column], other)
     # считаем площадь гриба и удаляем категории уже исп.категории
     df['square-mushroom'] = round(math.pi * pow((df['cap-diameter'] / 2), 2) + 
                                   df['stem-height'] * df['stem-width'], 2)
-    df = df.drop(columns=['cap-diameter', 'stem-height', 'stem-width'], errors='ignore')
-    return df
\ No newline at end of file
+    df = df.drop(columns=SIZE_COLUMNS, errors='ignore')
+    return df
+
+
+def _build_lookup_table(column: str) -> dict:
+    """Таблица "исходное значение -> итоговая категория" для столбца
+
+    Args:
+        column (str): имя столбца
+
+    Returns:
+        dict: ключи - коды, элементы перечисления и их подписи
+    """
+    keep, other = CATEGORY_GROUPS.get(column, (None, None))
+    table = {}
+    for member in COLUMN_ENUMS[column]:
+        code = member.name
+        category = code if keep is None or code in keep else other
+        table[code] = table[member] = table[member.value] = category
+    for code in keep or []:
+        table[code] = code
+    return table
+
+
+LOOKUP_TABLES = {column: _build_lookup_table(column) for column in COLUMN_ENUMS}
+
+
+def _lookup(column: str, values: Sequence) -> np.ndarray:
+    """Перевод исходных значений столбца в итоговые категории
+
+    Args:
+        column (str): имя столбца
+        values (Sequence): исходные значения
+
+    Returns:
+        np.ndarray: массив категорий (object)
+    """
+    table = LOOKUP_TABLES[column]
+    _, other = CATEGORY_GROUPS.get(column, (None, None))
+    # таблица применяется только к уникальным значениям, строки получают их по индексу
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+    categories = [table.get(value, value if other is None else other) for value in uniques]
+    categories.append(np.nan if other is None else other)
+    return np.array(categories, dtype=object)[codes]
+
+
+def prepared_data_inference(columns: Mapping[str, Sequence]) -> dict:
+    """Подготовка данных для предсказания без pandas-конвейера обучения
+
+    Категории переводятся заранее построенными по перечислениям таблицами
+    (принимаются коды датасета, элементы перечислений и их подписи), площадь
+    считается одним векторным проходом NumPy. Для строк в кодах датасета
+    результат совпадает с prepared_data; строки не удаляются и не
+    перемешиваются, поэтому порядок ответа совпадает с порядком запроса.
+
+    Args:
+        columns (Mapping[str, Sequence]): столбцы с исходными данными
+
+    Returns:
+        dict: подготовленные столбцы (имя -> np.ndarray)
+    """
+    prepared = {}
+    for column, values in columns.items():
+        if column == "id" or column in SIZE_COLUMNS:
+            continue
+        if column in LOOKUP_TABLES:
+            prepared[column] = _lookup(column, values)
+        else:
+            prepared[column] = np.asarray(values)
+    diameter, height, width = (np.asarray(columns[c], dtype=np.float64) for c in SIZE_COLUMNS)
+    prepared['square-mushroom'] = np.round(math.pi * (diameter / 2) ** 2 + height * width, 2)
+    return prepared
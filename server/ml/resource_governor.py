@@ -0,0 +1,203 @@
+import os
+import time
+from utils.logger import log as logger
+from utils.metrics import http_duration, http_in_flight, metrics
+
+# процессов подбора и потоков финального обучения (0 - все ядра, кроме одного)
+TRAINING_CPUS = int(os.getenv("MUSHROOMS_TRAINING_CPUS", "0"))
+# потоков BLAS/OpenMP в каждом процессе обучения
+TRAINING_BLAS_THREADS = int(os.getenv("MUSHROOMS_TRAINING_BLAS_THREADS", "1"))
+# приращение nice процесса обучения (0 - приоритет не меняется)
+TRAINING_NICE = int(os.getenv("MUSHROOMS_TRAINING_NICE", "0"))
+# пауза обучения, если предсказаний в работе не меньше этого (0 - не учитывать)
+PAUSE_IN_FLIGHT = int(os.getenv("MUSHROOMS_TRAINING_PAUSE_IN_FLIGHT", "0"))
+# пауза обучения, если средняя задержка предсказаний за окно выше этой, мс (0 - не учитывать)
+PAUSE_LATENCY_MS = float(os.getenv("MUSHROOMS_TRAINING_PAUSE_LATENCY_MS", "0"))
+# самая долгая пауза подряд, с: после неё обучение столько же идёт без пауз
+PAUSE_MAX = float(os.getenv("MUSHROOMS_TRAINING_PAUSE_MAX", "60"))
+# как часто процесс обучения проверяет, не снята ли пауза, с
+PAUSE_POLL = 0.1
+# окно замера нагрузки обслуживания, с
+PRESSURE_WINDOW = 0.5
+# маршруты обслуживания, нагрузку которых защищает регулятор
+SERVING_PREFIX = "/predict"
+# переменные окружения пулов потоков BLAS и OpenMP (наследуют процессы joblib)
+THREAD_ENV = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+              "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS")
+
+
+def training_cpus(cpus: int = TRAINING_CPUS) -> int:
+    """Сколько ядер отдаётся обучению: по умолчанию одно остаётся обслуживанию"""
+    return cpus if cpus > 0 else max(1, (os.cpu_count() or 1) - 1)
+
+
+class TrainingGovernor:
+    """Ограничение ресурсов обучения (в процессе обучения).
+
+    Задаёт число процессов подбора гиперпараметров и потоков финального
+    обучения, потоки BLAS/OpenMP и приоритет процесса, а между пакетами
+    кандидатов подбора ждёт, пока менеджер задач держит паузу (см.
+    TrainingThrottle). Итог попадает в артефакт модели (resources).
+    """
+    def __init__(self, control=None, cpus: int = TRAINING_CPUS,
+                 blas_threads: int = TRAINING_BLAS_THREADS, nice: int = TRAINING_NICE):
+        """Инициализация регулятора
+
+        Args:
+            control (optional): общий с менеджером задач словарь (прокси Manager)
+                с ключами paused, paused_seconds, pauses. По умолчанию пауз нет.
+            cpus (int, optional): ядер обучения (0 - все, кроме одного)
+            blas_threads (int, optional): потоков BLAS/OpenMP в процессе
+            nice (int, optional): приращение nice процесса обучения
+        """
+        self.control = control
+        self.cpus = training_cpus(cpus)
+        self.blas_threads = max(1, blas_threads)
+        self.nice = nice
+        self.waited = 0.0
+
+    def apply(self) -> None:
+        """Ограничения для текущего процесса и запускаемых им процессов joblib"""
+        for name in THREAD_ENV:
+            os.environ[name] = str(self.blas_threads)
+        try:
+            from threadpoolctl import threadpool_limits
+            threadpool_limits(limits=self.blas_threads)
+        except ImportError:  # без threadpoolctl действуют только переменные окружения
+            pass
+        if self.nice > 0:
+            try:
+                os.nice(self.nice)
+            except (AttributeError, OSError) as e:
+                logger.warning(f"Не удалось понизить приоритет обучения: {e}")
+        logger.info(f"Обучение: {self.cpus} ядер, {self.blas_threads} потоков BLAS, nice +{self.nice}")
+
+    def checkpoint(self) -> None:
+        """Ожидание, пока менеджер задач держит обучение на паузе"""
+        if self.control is None or not self.control.get("paused"):
+            return
+        started = time.perf_counter()
+        while self.control.get("paused"):
+            time.sleep(PAUSE_POLL)
+        self.waited += time.perf_counter() - started
+
+    def summary(self) -> dict:
+        """Фактические ограничения и паузы для сохранения в артефакте"""
+        control = dict(self.control) if self.control is not None else {}
+        return {
+            "cpus": self.cpus,
+            "blas_threads": self.blas_threads,
+            "nice": self.nice,
+            "paused_seconds": round(control.get("paused_seconds", 0.0), 3),
+            "pauses": control.get("pauses", 0),
+            "waited_seconds": round(self.waited, 3),
+        }
+
+
+class ServingPressure:
+    """Нагрузка обслуживания по метрикам этого процесса: предсказания в
+    работе и средняя задержка предсказаний с прошлого замера"""
+    def __init__(self, prefix: str = SERVING_PREFIX):
+        self.prefix = prefix
+        self._last = self._totals()
+
+    def _totals(self) -> tuple:
+        """Число и суммарная длительность завершённых запросов к prefix"""
+        count, total = 0, 0.0
+        for labels, (counts, seconds) in http_duration.series():
+            if labels["route"].startswith(self.prefix):
+                count += sum(counts)
+                total += seconds
+        return count, total
+
+    def sample(self) -> dict:
+        """Замер: in_flight - запросы в работе, latency_ms - средняя задержка
+        запросов, завершённых с прошлого замера (0, если их не было)"""
+        in_flight = sum(value for labels, value in http_in_flight.series()
+                        if labels["route"].startswith(self.prefix))
+        count, total = self._totals()
+        last_count, last_total = self._last
+        self._last = (count, total)
+        latency = (total - last_total) / (count - last_count) * 1000 if count > last_count else 0.0
+        return {"in_flight": in_flight, "latency_ms": latency}
+
+
+class TrainingThrottle:
+    """Пауза обучения при перегрузке обслуживания (в менеджере задач).
+
+    При каждом update() снимает нагрузку ServingPressure и ставит или
+    снимает паузу в общем с процессом обучения словаре control. Пауза
+    длится не дольше max_pause подряд, после чего обучение столько же
+    идёт без пауз, чтобы не остановиться совсем. Без метрик
+    (MUSHROOMS_METRICS=0) или без порогов пауз не бывает.
+    """
+    def __init__(self, control, pressure: ServingPressure | None = None,
+                 in_flight: int = PAUSE_IN_FLIGHT, latency_ms: float = PAUSE_LATENCY_MS,
+                 max_pause: float = PAUSE_MAX, window: float = PRESSURE_WINDOW):
+        """Инициализация
+
+        Args:
+            control: общий словарь paused, paused_seconds, pauses
+            pressure (ServingPressure | None, optional): источник нагрузки
+            in_flight (int, optional): порог предсказаний в работе (0 - нет)
+            latency_ms (float, optional): порог средней задержки, мс (0 - нет)
+            max_pause (float, optional): самая долгая пауза подряд, с
+            window (float, optional): не чаще одного замера за window, с
+        """
+        self.control = control
+        self.in_flight = in_flight
+        self.latency_ms = latency_ms
+        self.max_pause = max_pause
+        self.window = window
+        self.enabled = metrics.enabled and bool(in_flight or latency_ms)
+        self.pressure = pressure or (ServingPressure() if self.enabled else None)
+        self._paused_at = None
+        self._resume_until = 0.0
+        self._sampled_at = None
+        control.update({"paused": False, "paused_seconds": 0.0, "pauses": 0})
+
+    @property
+    def paused(self) -> bool:
+        return self._paused_at is not None
+
+    def overloaded(self, sample: dict) -> bool:
+        """Превышен ли хотя бы один порог"""
+        return bool(self.in_flight and sample["in_flight"] >= self.in_flight or
+                    self.latency_ms and sample["latency_ms"] > self.latency_ms)
+
+    def update(self, now: float | None = None) -> bool:
+        """Замер нагрузки и смена состояния паузы
+
+        Returns:
+            bool: стоит ли обучение на паузе
+        """
+        if not self.enabled:
+            return False
+        now = time.monotonic() if now is None else now
+        if self._sampled_at is not None and now - self._sampled_at < self.window:
+            return self.paused
+        self._sampled_at = now
+        overloaded = self.overloaded(self.pressure.sample())
+        if self.paused:
+            if not overloaded or now - self._paused_at >= self.max_pause:
+                self.resume(now)
+                if overloaded:
+                    self._resume_until = now + self.max_pause
+        elif overloaded and now >= self._resume_until:
+            self._paused_at = now
+            self.control.update({"paused": True, "pauses": self.control["pauses"] + 1})
+        return self.paused
+
+    def resume(self, now: float | None = None) -> None:
+        """Снятие паузы с учётом её длительности"""
+        if not self.paused:
+            return
+        now = time.monotonic() if now is None else now
+        self.control.update({"paused": False,
+                             "paused_seconds": self.control["paused_seconds"] + now - self._paused_at})
+        self._paused_at = None
+
+    def to_dict(self) -> dict:
+        """Состояние для ответа API"""
+        return {"paused": self.paused, "paused_seconds": round(self.control["paused_seconds"], 3),
+                "pauses": self.control["pauses"]}
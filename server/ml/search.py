@@ -0,0 +1,302 @@
+import math
+import os
+import time
+from typing import TYPE_CHECKING
+import numpy as np
+from utils.logger import log as logger
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# стратегия подбора гиперпараметров: grid, halving, random или capped
+SEARCH_STRATEGY = os.getenv("MUSHROOMS_SEARCH_STRATEGY", "grid")
+# сколько кандидатов проверяют random и capped
+SEARCH_CANDIDATES = int(os.getenv("MUSHROOMS_SEARCH_CANDIDATES", "5"))
+# ресурс successive halving: n_samples (строки) или n_estimators (деревья)
+SEARCH_RESOURCE = os.getenv("MUSHROOMS_SEARCH_RESOURCE", "n_samples")
+# во сколько раз сокращается число кандидатов на каждом раунде halving
+SEARCH_FACTOR = int(os.getenv("MUSHROOMS_SEARCH_FACTOR", "3"))
+# бюджет подбора, с (0 - без ограничения)
+SEARCH_BUDGET = float(os.getenv("MUSHROOMS_SEARCH_BUDGET", "0"))
+# тип бюджета: wall (время по часам) или cpu (сумма процессорного времени обучений)
+SEARCH_BUDGET_TYPE = os.getenv("MUSHROOMS_SEARCH_BUDGET_TYPE", "wall")
+# сколько строк как минимум получает кандидат на первом раунде halving по строкам
+MIN_SAMPLES = 500
+# кодировать данные фолда один раз для всех кандидатов (1) или в каждом обучении (0)
+SEARCH_CACHE = os.getenv("MUSHROOMS_SEARCH_CACHE", "1") == "1"
+
+STRATEGIES = ("grid", "halving", "random", "capped")
+# sklearn и joblib импортируются в функциях: маршрут /fit берёт из модуля
+# только настройки, а сам подбор идёт в процессе обучения
+
+
+def _fit_and_score(estimator, params: dict, X_train, y_train, X_test, y_test, scorer) -> tuple:
+    """Обучение кандидата на одном фолде (выполняется в процессе joblib)
+
+    Args:
+        estimator: пайплайн (данные фолда - исходные признаки) или
+                   классификатор (данные фолда уже закодированы)
+        params (dict): параметры кандидата
+        X_train, y_train: обучающая часть фолда
+        X_test, y_test: проверочная часть фолда
+        scorer: скорер scoring(estimator, X, y)
+
+    Returns:
+        tuple: (оценка, время обучения, процессорное время обучения и оценки)
+    """
+    from sklearn.base import clone
+
+    cpu = time.process_time()
+    started = time.perf_counter()
+    estimator = clone(estimator).set_params(**params)
+    estimator.fit(X_train, y_train)
+    fit_time = time.perf_counter() - started
+    score = scorer(estimator, X_test, y_test)
+    return float(score), fit_time, time.process_time() - cpu
+
+
+def dense_float32(X) -> np.ndarray:
+    """Плотная матрица float32 (лес всё равно приводит данные к float32)
+
+    One-hot кодирование даёт разреженную матрицу, а на разреженных данных
+    лес обучается в несколько раз медленнее, чем на той же плотной матрице.
+    """
+    if hasattr(X, "toarray"):
+        X = X.toarray()
+    return np.ascontiguousarray(X, dtype=np.float32)
+
+
+class HyperparameterSearch:
+    """Подбор гиперпараметров с выбором стратегии и бюджетом времени.
+
+    Кандидаты проверяются кросс-валидацией пачками (все фолды пачки
+    обучаются параллельно), бюджет проверяется между пачками: подбор
+    останавливается, как только бюджет исчерпан, и выбирает лучшего из
+    уже проверенных кандидатов. Для каждого кандидата запоминаются
+    оценки и время обучения.
+
+    Препроцессор не зависит от параметров кандидата, поэтому при
+    cache_preprocessing он обучается и кодирует данные один раз на фолд
+    (и размер подвыборки halving), а кандидаты обучают только классификатор
+    на готовых плотных матрицах float32. Результат тот же, что у обучения
+    пайплайна целиком.
+    """
+    def __init__(self, estimator, param_grid: dict, cv, scoring, strategy: str = SEARCH_STRATEGY,
+                 budget: float = SEARCH_BUDGET, budget_type: str = SEARCH_BUDGET_TYPE,
+                 n_candidates: int = SEARCH_CANDIDATES, resource: str = SEARCH_RESOURCE,
+                 factor: int = SEARCH_FACTOR, n_jobs: int = -1, random_state: int = 42,
+                 cache_preprocessing: bool = SEARCH_CACHE, progress=None, checkpoint=None):
+        """Инициализация подбора
+
+        Args:
+            estimator: пайплайн (препроцессор + классификатор 'classifier')
+            param_grid (dict): сетка параметров классификатора (без префикса)
+            cv: разбиение кросс-валидации (KFold)
+            scoring: скорер scoring(estimator, X, y)
+            strategy (str, optional): grid, halving, random или capped
+            budget (float, optional): бюджет, с (0 - без ограничения)
+            budget_type (str, optional): wall или cpu
+            n_candidates (int, optional): кандидатов для random и capped
+            resource (str, optional): ресурс halving: n_samples или n_estimators
+            factor (int, optional): коэффициент отсева halving
+            n_jobs (int, optional): процессов joblib
+            random_state (int, optional): зерно для random и подвыборок halving
+            cache_preprocessing (bool, optional): кодировать данные фолда один раз
+            progress (optional): функция progress(phase, **info)
+            checkpoint (optional): функция без аргументов, вызываемая перед
+                каждым пакетом кандидатов (может ждать, пока обучение на паузе)
+        """
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Неизвестная стратегия подбора: {strategy}")
+        if budget_type not in ("wall", "cpu"):
+            raise ValueError(f"Неизвестный тип бюджета: {budget_type}")
+        if resource not in ("n_samples", "n_estimators"):
+            raise ValueError(f"Неизвестный ресурс halving: {resource}")
+        self.estimator = estimator
+        self.param_grid = param_grid
+        self.cv = cv
+        self.scoring = scoring
+        self.strategy = strategy
+        self.budget = budget
+        self.budget_type = budget_type
+        self.n_candidates = n_candidates
+        self.resource = resource
+        self.factor = max(2, factor)
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+        self.cache_preprocessing = cache_preprocessing
+        self.progress = progress or (lambda phase, **info: None)
+        self.checkpoint = checkpoint or (lambda: None)
+        self.results = []
+        self.best_params_ = None
+        self.best_score_ = None
+        self.stopped_by_budget = False
+        self.preprocess_time = 0.0
+        # время на паузе не расходует бюджет подбора
+        self.paused_time = 0.0
+        self._folds_cache = {}
+
+    def candidates(self) -> list:
+        """Кандидаты выбранной стратегии"""
+        from sklearn.model_selection import ParameterGrid, ParameterSampler
+
+        if self.strategy == "random":
+            return list(ParameterSampler(self.param_grid, self.n_candidates,
+                                         random_state=self.random_state))
+        grid = list(ParameterGrid(self.param_grid))
+        if self.strategy == "capped":
+            return grid[:self.n_candidates]
+        return grid
+
+    def rounds(self, n_candidates: int) -> int:
+        """Число раундов halving: пока не останется не больше factor кандидатов"""
+        if self.strategy != "halving" or n_candidates <= 1:
+            return 1
+        return math.ceil(math.log(n_candidates, self.factor)) + 1
+
+    def planned_fits(self) -> int:
+        """Сколько обучений потребуется без учёта бюджета"""
+        n = len(self.candidates())
+        fits = 0
+        for _ in range(self.rounds(n)):
+            fits += n * self.cv.get_n_splits()
+            n = max(1, math.ceil(n / self.factor))
+        return fits
+
+    def _spent(self) -> float:
+        """Израсходованный бюджет"""
+        if self.budget_type == "cpu":
+            return sum(result["cpu_time"] for result in self.results)
+        return time.perf_counter() - self._started - self.paused_time
+
+    def _exhausted(self) -> bool:
+        """Исчерпан ли бюджет"""
+        return self.budget > 0 and self._spent() >= self.budget
+
+    def _resource_params(self, round_index: int, n_rounds: int, n_train: int) -> tuple:
+        """Размер ресурса раунда: (число строк обучения или None, параметры классификатора)"""
+        if self.strategy != "halving":
+            return None, {}
+        scale = self.factor ** (n_rounds - 1 - round_index)
+        if self.resource == "n_samples":
+            return max(min(MIN_SAMPLES, n_train), n_train // scale), {}
+        max_trees = max(self.param_grid.get("n_estimators", [100]))
+        return None, {"n_estimators": max(1, max_trees // scale)}
+
+    def _fold_data(self, X: "pd.DataFrame", y: "pd.Series", fold: int,
+                   train: np.ndarray, test: np.ndarray) -> tuple:
+        """Данные фолда: исходные признаки или матрицы, закодированные один раз
+
+        Returns:
+            tuple: (X_train, y_train, X_test, y_test)
+        """
+        if not self.cache_preprocessing:
+            return X.iloc[train], y.iloc[train], X.iloc[test], y.iloc[test]
+        key = (fold, len(train))
+        if key not in self._folds_cache:
+            from sklearn.base import clone
+
+            started = time.perf_counter()
+            preprocessor = clone(self.estimator.named_steps["preprocessor"])
+            X_train = dense_float32(preprocessor.fit_transform(X.iloc[train], y.iloc[train]))
+            X_test = dense_float32(preprocessor.transform(X.iloc[test]))
+            self._folds_cache[key] = (X_train, y.iloc[train].to_numpy(), X_test, y.iloc[test].to_numpy())
+            self.preprocess_time += time.perf_counter() - started
+        return self._folds_cache[key]
+
+    def fit(self, X: "pd.DataFrame", y: "pd.Series") -> "HyperparameterSearch":
+        """Подбор гиперпараметров
+
+        Args:
+            X (pd.DataFrame): признаки
+            y (pd.Series): целевая переменная
+
+        Returns:
+            HyperparameterSearch: self с best_params_ и results
+        """
+        from joblib import Parallel, delayed
+
+        self._started = time.perf_counter()
+        folds = list(self.cv.split(X, y))
+        rng = np.random.default_rng(self.random_state)
+        # подвыборки halving по строкам вложены друг в друга
+        orders = [rng.permutation(train) for train, _ in folds]
+        workers = self.n_jobs if self.n_jobs > 0 else os.cpu_count() or 1
+        batch_size = max(1, workers // len(folds))
+        if self.cache_preprocessing:
+            estimator, prefix = self.estimator.named_steps["classifier"], ""
+        else:
+            estimator, prefix = self.estimator, "classifier__"
+        candidates = self.candidates()
+        n_rounds = self.rounds(len(candidates))
+        # результаты последнего раунда, где обучился хотя бы один кандидат:
+        # оценки разных раундов получены на разном ресурсе и несравнимы
+        last_results = []
+        for round_index in range(n_rounds):
+            n_samples, overrides = self._resource_params(round_index, n_rounds, min(map(len, orders)))
+            round_results = []
+            for start in range(0, len(candidates), batch_size):
+                paused = time.perf_counter()
+                self.checkpoint()
+                self.paused_time += time.perf_counter() - paused
+                if self.results and self._exhausted():
+                    self.stopped_by_budget = True
+                    break
+                batch = candidates[start:start + batch_size]
+                data = [self._fold_data(X, y, fold, order[:n_samples], test)
+                        for fold, (order, (_, test)) in enumerate(zip(orders, folds))]
+                scores = Parallel(n_jobs=self.n_jobs)(
+                    delayed(_fit_and_score)(
+                        estimator,
+                        {f"{prefix}{key}": value for key, value in {**params, **overrides}.items()},
+                        *fold_data, self.scoring)
+                    for params in batch
+                    for fold_data in data
+                )
+                for i, params in enumerate(batch):
+                    fold_scores = scores[i * len(folds):(i + 1) * len(folds)]
+                    result = {
+                        "params": params,
+                        "round": round_index,
+                        "resource": {"n_samples": n_samples or min(map(len, orders)), **overrides},
+                        "mean_score": float(np.mean([s[0] for s in fold_scores])),
+                        "std_score": float(np.std([s[0] for s in fold_scores])),
+                        "fit_time": float(sum(s[1] for s in fold_scores)),
+                        "cpu_time": float(sum(s[2] for s in fold_scores)),
+                    }
+                    for score, _, _ in fold_scores:
+                        self.progress("fold", candidate=params, score=score)
+                    logger.info(f"Кандидат {params}: {result['mean_score']:.4f} "
+                                f"(обучение {result['fit_time']:.1f} с)")
+                    self.results.append(result)
+                    round_results.append(result)
+            if round_results:
+                last_results = round_results
+            if self.stopped_by_budget or not round_results:
+                break
+            ranked = sorted(round_results, key=lambda r: r["mean_score"], reverse=True)
+            candidates = [r["params"] for r in ranked[:max(1, math.ceil(len(ranked) / self.factor))]]
+        self._folds_cache.clear()
+        best = max(last_results, key=lambda r: r["mean_score"])
+        self.best_params_ = best["params"]
+        self.best_score_ = best["mean_score"]
+        if self.stopped_by_budget:
+            logger.warning(f"Бюджет подбора исчерпан после {len(self.results)} кандидатов")
+        return self
+
+    def summary(self) -> dict:
+        """Итоги подбора для сохранения в артефакте"""
+        return {
+            "strategy": self.strategy,
+            "budget": self.budget,
+            "budget_type": self.budget_type,
+            "stopped_by_budget": self.stopped_by_budget,
+            "elapsed": round(time.perf_counter() - self._started, 3),
+            "paused_time": round(self.paused_time, 3),
+            "cpu_time": round(sum(result["cpu_time"] for result in self.results), 3),
+            "preprocessing_cached": self.cache_preprocessing,
+            "preprocess_time": round(self.preprocess_time, 3),
+            "best_params": self.best_params_,
+            "best_score": self.best_score_,
+            "candidates": self.results,
+        }
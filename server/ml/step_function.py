@@ -0,0 +1,274 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Mapping, Sequence
+import numpy as np
+import pandas as pd
+from ml.compiled_model import TREE_LEAF, CompiledForest
+
+# сколько категориальных комбинаций хранит таблица ступенчатых функций
+STEP_TABLE_SIZE = int(os.getenv("MUSHROOMS_STEP_TABLE_SIZE", "4096"))
+# с какой встречи комбинация компилируется: одиночные комбинации дешевле посчитать обходом леса
+STEP_MIN_HITS = int(os.getenv("MUSHROOMS_STEP_MIN_HITS", "2"))
+# время на компиляцию новых комбинаций за один вызов, мс (ограничивает задержку запроса)
+STEP_BUILD_BUDGET_MS = float(os.getenv("MUSHROOMS_STEP_BUILD_BUDGET_MS", "50"))
+# до какого размера пакета категории переводятся словарём, а не pd.factorize
+SMALL_BATCH = 32
+
+
+def _float32_at_most(values: np.ndarray) -> np.ndarray:
+    """Наибольшие числа float32, не превышающие values"""
+    result = values.astype(np.float32)
+    above = result.astype(np.float64) > values
+    result[above] = np.nextafter(result[above], np.float32(-np.inf))
+    return result
+
+
+def _float32_above(value: float) -> np.float32:
+    """Наименьшее число float32, большее value"""
+    result = np.float32(value)
+    return result if float(result) > value else np.nextafter(result, np.float32(np.inf))
+
+
+class StepFunctionForest:
+    """Лес как набор ступенчатых функций одного числового признака.
+
+    После prepared_data у модели один числовой признак (square-mushroom),
+    остальные - категории. При фиксированных категориях каждое дерево
+    сравнивает с порогами только его, поэтому вероятность - ступенчатая
+    функция: между соседними порогами ответ леса постоянен. Для комбинации
+    категорий обходятся только достижимые узлы деревьев: листья каждого
+    дерева делят ось признака на интервалы, и на каждом интервале между
+    соседними порогами вероятность считается один раз.
+    Повторный запрос с той же комбинацией - двоичный поиск по порогам,
+    его стоимость не зависит от размера леса.
+
+    Признак сравнивается в float32, как в деревьях sklearn, а значение на
+    интервале считается для представителя-float32 из этого интервала,
+    поэтому результат в точности совпадает с CompiledForest.predict_proba
+    (и pipeline.predict_proba). Комбинации компилируются с STEP_MIN_HITS-й
+    встречи (не дольше STEP_BUILD_BUDGET_MS за вызов) и хранятся в
+    LRU-таблице на STEP_TABLE_SIZE комбинаций; остальные строки считает
+    fallback.
+    """
+    def __init__(self, engine: CompiledForest, max_size: int = STEP_TABLE_SIZE,
+                 min_hits: int = STEP_MIN_HITS, build_budget_ms: float = STEP_BUILD_BUDGET_MS,
+                 fallback=None):
+        """Подготовка ускорителя
+
+        Args:
+            engine (CompiledForest): скомпилированный лес
+            max_size (int, optional): размер таблицы комбинаций
+            min_hits (int, optional): с какой встречи комбинация компилируется
+            build_budget_ms (float, optional): время на компиляцию за вызов, мс
+            fallback (optional): функция fallback(columns) -> вероятности для
+                строк без таблицы. По умолчанию engine.predict_proba.
+
+        Raises:
+            ValueError: если у модели не ровно один числовой признак
+        """
+        if len(engine.numeric) != 1:
+            raise ValueError("Ступенчатые функции строятся только для модели с одним числовым признаком")
+        self.engine = engine
+        self.classes_ = engine.classes_
+        self.column, self.index, self.scale, self.shift = engine.numeric[0]
+        self.fallback = fallback or engine.predict_proba
+        # категориальные столбцы: (имя, {категория: локальный номер}, номер пропуска,
+        # номера признаков); номер len(признаков) - неизвестная категория
+        self.columns = []
+        for column, mapping in engine.categorical:
+            categories = list(mapping)
+            local = {c: i for i, c in enumerate(categories)}
+            nan_code = next((i for c, i in local.items() if isinstance(c, float) and c != c), len(categories))
+            self.columns.append((column, local, nan_code,
+                                 np.array([mapping[c] for c in categories], dtype=np.intp)))
+        # ключ комбинации - число в смешанной системе счисления
+        sizes = [len(features) + 1 for *_, features in self.columns]
+        if np.prod(sizes, dtype=float) >= 2 ** 62:
+            raise ValueError("Слишком много комбинаций категорий для ключа int64")
+        self.strides = np.cumprod([1] + sizes[:-1]).astype(np.int64)
+        self.max_size = max_size
+        self.min_hits = min_hits
+        self.build_budget = build_budget_ms / 1000
+        self._tables = OrderedDict()
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.builds = 0
+        self.direct = 0
+
+    def _codes(self, columns: Mapping[str, Sequence], n: int) -> np.ndarray:
+        """Локальные номера категорий строк, форма (n, n_столбцов)"""
+        result = []
+        for column, local, nan_code, features in self.columns:
+            values = columns[column]
+            unknown = len(features)
+            if len(values) <= SMALL_BATCH:
+                result.append([local.get(v, unknown) if v == v else nan_code for v in values])
+                continue
+            codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+            mapped = np.array([local.get(u, unknown) for u in uniques] + [nan_code], dtype=np.int64)
+            # у пропусков factorize даёт -1: это последний элемент mapped
+            result.append(mapped[codes])
+        return np.array(result, dtype=np.int64).T if result else np.zeros((n, 0), dtype=np.int64)
+
+    def _scaled(self, columns: Mapping[str, Sequence]) -> np.ndarray:
+        """Числовой признак, как его видят деревья (см. CompiledForest.encode)"""
+        values = np.asarray(columns[self.column], dtype=np.float64)
+        return (values * self.scale + self.shift).astype(np.float32).astype(np.float64)
+
+    def build(self, codes: np.ndarray) -> tuple:
+        """Ступенчатая функция для комбинации категорий
+
+        Args:
+            codes (np.ndarray): локальные номера категорий (см. _codes)
+
+        Returns:
+            tuple: (пороги, вероятности на интервалах): строка i - интервал
+                   (порог[i-1], порог[i]], последняя - правее всех порогов
+        """
+        engine = self.engine
+        x = np.zeros(engine.n_features, dtype=np.float32)
+        for (*_, features), code in zip(self.columns, codes):
+            if code < len(features):
+                x[features[code]] = 1.0
+        # обход достижимых узлов всех деревьев сразу: дерево, узел и интервал (lo, hi] признака
+        node = np.asarray(engine.roots, dtype=np.intp)
+        tree = np.arange(node.size)
+        lo = np.full(node.size, -np.inf)
+        hi = np.full(node.size, np.inf)
+        leaves = []
+        while node.size:
+            leaf = engine.children_left[node] == TREE_LEAF
+            leaves.append((tree[leaf], lo[leaf], node[leaf]))
+            node, tree, lo, hi = node[~leaf], tree[~leaf], lo[~leaf], hi[~leaf]
+            feature = engine.feature[node]
+            threshold = engine.threshold[node]
+            numeric = feature == self.index
+            categorical_left = x[feature] <= threshold
+            left = np.where(numeric, lo < threshold, categorical_left)
+            right = np.where(numeric, hi > threshold, ~categorical_left)
+            node = np.concatenate([engine.children_left[node[left]], engine.children_right[node[right]]])
+            tree = np.concatenate([tree[left], tree[right]])
+            lo, hi = (np.concatenate([lo[left], np.where(numeric, np.maximum(lo, threshold), lo)[right]]),
+                      np.concatenate([np.where(numeric, np.minimum(hi, threshold), hi)[left], hi[right]]))
+        tree, lo, node = (np.concatenate(parts) for parts in zip(*leaves))
+        # листья дерева делят ось признака на интервалы: границы - пороги
+        order = np.lexsort((lo, tree))
+        tree, lo, node = tree[order], lo[order], node[order]
+        breaks = np.unique(lo[lo > -np.inf])
+        # представитель интервала - наибольший float32 не правее порога; если он
+        # левее предыдущего порога, в интервале нет ни одного значения float32
+        points = _float32_at_most(breaks)
+        keep = np.ones(breaks.size, dtype=bool)
+        keep[1:] = points[1:].astype(np.float64) > breaks[:-1]
+        last = _float32_above(breaks[-1]) if breaks.size else np.float32(0)
+        points = np.append(points[keep], last).astype(np.float64)
+        breaks = breaks[keep]
+        # лист каждого дерева для каждого интервала; деревья суммируются по
+        # порядку, как в CompiledForest.predict_proba_encoded
+        starts = np.searchsorted(tree, np.arange(engine.n_trees + 1))
+        proba = np.zeros((points.size, len(self.classes_)))
+        for t in range(engine.n_trees):
+            segment = slice(starts[t], starts[t + 1])
+            position = np.searchsorted(lo[segment], points, side="left") - 1
+            proba += engine.value[node[segment][position]]
+        proba /= engine.n_trees
+        # соседние интервалы с одинаковым ответом сливаются
+        changed = np.any(proba[1:] != proba[:-1], axis=1)
+        return breaks[changed], proba[np.r_[0, np.flatnonzero(changed) + 1]]
+
+    def _tables_for(self, keys: np.ndarray, counts: np.ndarray, codes: np.ndarray) -> list:
+        """Таблицы для комбинаций пакета (None - строки считает fallback)
+
+        Args:
+            keys (np.ndarray): ключи комбинаций
+            counts (np.ndarray): сколько строк пакета с каждой комбинацией
+            codes (np.ndarray): локальные номера категорий каждой комбинации
+
+        Returns:
+            list: (пороги, вероятности) или None для каждой комбинации
+        """
+        tables = [None] * keys.size
+        pending = []
+        with self._lock:
+            for i, (key, count) in enumerate(zip(keys.tolist(), counts.tolist())):
+                table = self._tables.get(key)
+                if table is not None:
+                    self._tables.move_to_end(key)
+                    tables[i] = table
+                    continue
+                seen = self._seen.pop(key, 0) + count
+                if seen >= self.min_hits:
+                    pending.append((seen, i))
+                else:
+                    self._remember(key, seen)
+        # частые комбинации компилируются первыми, пока не исчерпан бюджет времени
+        pending.sort(reverse=True)
+        started = time.perf_counter()
+        built = []
+        for seen, i in pending:
+            if time.perf_counter() - started >= self.build_budget:
+                with self._lock:
+                    self._remember(keys[i].item(), seen)
+                continue
+            tables[i] = self.build(codes[i])
+            built.append(i)
+        if built:
+            with self._lock:
+                for i in built:
+                    self._tables[keys[i].item()] = tables[i]
+                    if len(self._tables) > self.max_size:
+                        self._tables.popitem(last=False)
+                self.builds += len(built)
+        return tables
+
+    def _remember(self, key: int, seen: int):
+        """Счётчик встреч ещё не скомпилированной комбинации (под self._lock)"""
+        self._seen[key] = seen
+        if len(self._seen) > 4 * self.max_size:
+            self._seen.popitem(last=False)
+
+    def predict_proba(self, columns: Mapping[str, Sequence]) -> np.ndarray:
+        """Вероятности классов, как у CompiledForest.predict_proba
+
+        Args:
+            columns (Mapping[str, Sequence]): столбцы после prepared_data
+
+        Returns:
+            np.ndarray: массив формы (n_строк, n_классов)
+        """
+        n = len(columns[self.column])
+        if n == 0:
+            return self.fallback(columns)
+        codes = self._codes(columns, n)
+        keys, first, inverse, counts = np.unique(codes @ self.strides, return_index=True,
+                                                 return_inverse=True, return_counts=True)
+        tables = self._tables_for(keys, counts, codes[first])
+        proba = np.empty((n, len(self.classes_)))
+        direct = ~np.array([table is not None for table in tables])[inverse]
+        rows = np.flatnonzero(direct)
+        if rows.size:
+            proba[rows] = self.fallback({column: np.asarray(data)[rows] for column, data in columns.items()})
+        if rows.size < n:
+            values = self._scaled(columns)
+            groups = np.split(np.argsort(inverse, kind="stable"), np.cumsum(counts)[:-1])
+            for group, table in zip(groups, tables):
+                if table is not None:
+                    breaks, intervals = table
+                    proba[group] = intervals[np.searchsorted(breaks, values[group])]
+        with self._lock:
+            self.hits += n - rows.size
+            self.direct += rows.size
+        return proba
+
+    def predict(self, columns: Mapping[str, Sequence]) -> np.ndarray:
+        """Предсказание классов, как у CompiledForest.predict"""
+        return self.classes_.take(np.argmax(self.predict_proba(columns), axis=1), axis=0)
+
+    def stats(self) -> dict:
+        """Размер таблицы и число строк, посчитанных по таблице и обходом леса"""
+        with self._lock:
+            return {"size": len(self._tables), "max_size": self.max_size,
+                    "builds": self.builds, "hits": self.hits, "direct": self.direct}
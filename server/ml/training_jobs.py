@@ -0,0 +1,359 @@
+import multiprocessing
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO
+from ml.resource_governor import TrainingGovernor, TrainingThrottle
+from utils.logger import log as logger
+from utils.metrics import training_duration, training_phase
+
+# сколько обучений может идти одновременно (каждое - в отдельном процессе)
+MAX_WORKERS = int(os.getenv("MUSHROOMS_TRAINING_WORKERS", "1"))
+# сколько задач может ждать своей очереди
+MAX_QUEUE = int(os.getenv("MUSHROOMS_TRAINING_QUEUE", "4"))
+# сколько завершённых задач хранится для опроса статуса
+MAX_FINISHED = 100
+# как часто поток-наблюдатель проверяет процесс обучения, с
+POLL_INTERVAL = 0.2
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATUSES = (SUCCEEDED, FAILED, CANCELLED)
+
+# режимы обучения: с нуля с подбором гиперпараметров или дообучение текущей модели
+FULL = "full"
+INCREMENTAL = "incremental"
+MODES = (FULL, INCREMENTAL)
+
+
+class QueueFullError(Exception):
+    """Очередь задач обучения заполнена"""
+
+
+class ProgressReporter:
+    """Передача прогресса обучения из дочерних процессов в очередь менеджера.
+
+    Очередь событий - прокси Manager, поэтому объект можно передавать
+    в другие процессы.
+    """
+    def __init__(self, events):
+        self.events = events
+
+    def __call__(self, phase: str, **info):
+        self.events.put((phase, info))
+
+
+def run_training(path: str, filename: str, member: str | None, progress,
+                 mode: str = FULL, options: dict | None = None,
+                 governor: TrainingGovernor | None = None) -> str:
+    """Обучение и сохранение модели (выполняется в отдельном процессе)
+
+    Args:
+        path (str): путь к сохранённой копии загруженного файла
+        filename (str): исходное имя файла (по нему выбирается распаковщик)
+        member (str | None): имя CSV внутри ZIP
+        progress: функция progress(phase, **info)
+        mode (str, optional): FULL или INCREMENTAL. По умолчанию FULL.
+        options (dict | None, optional): параметры обучения: стратегия и бюджет
+                                         подбора (strategy, budget) или параметры
+                                         дообучения (n_estimators, max_estimators)
+        governor (TrainingGovernor | None, optional): ограничение ресурсов обучения
+
+    Raises:
+        ValueError: если в архиве нет CSV
+        LookupError: если для дообучения нет текущей модели
+        RuntimeError: если модель не удалось обучить или сохранить
+
+    Returns:
+        str: версия сохранённой модели
+    """
+    from ml.dataset_cache import dataset_cache
+    from ml.mushrooms_model import MushroomsModel, dataset_config
+    from ml.model_registry import registry
+    from utils.extract_csv_from_zip import open_csv_stream
+
+    base = registry.load_active()[1] if mode == INCREMENTAL else None
+    settings = {} if mode == INCREMENTAL else dict(options or {})
+    settings["governor"] = governor
+    if mode != INCREMENTAL and dataset_cache.enabled:
+        settings["cache_key"] = dataset_cache.key(path, member, dataset_config())
+    with open(path, "rb") as f:
+        stream = open_csv_stream(f, filename, member)
+        if stream is None:
+            raise ValueError("В архиве нет подходящего CSV-файла")
+        mushroom = MushroomsModel(stream, progress=progress, **settings)
+    if mode == INCREMENTAL:
+        mushroom.update_model(base, **(options or {}))
+    else:
+        mushroom.preprocess_data()
+    if mushroom.pipeline is None:
+        raise RuntimeError("Модель не обучена, подробности в логе сервера")
+    mushroom.fit_model()
+    if mushroom.version is None:
+        raise RuntimeError("Модель не сохранена, подробности в логе сервера")
+    return mushroom.version
+
+
+def _training_process(path: str, filename: str, member: str | None, events,
+                      mode: str = FULL, options: dict | None = None, control=None) -> None:
+    """Точка входа процесса обучения: результат отправляется в очередь событий"""
+    try:
+        # ограничения ставятся до импорта sklearn и запуска процессов joblib
+        governor = TrainingGovernor(control)
+        governor.apply()
+        version = run_training(path, filename, member, ProgressReporter(events), mode, options, governor)
+        events.put(("done", {"version": version}))
+    except Exception as e:
+        events.put(("error", {"error": str(e)}))
+
+
+class TrainingJob:
+    """Задача обучения и её текущее состояние"""
+    def __init__(self, path: str, filename: str, member: str | None = None,
+                 mode: str = FULL, options: dict | None = None):
+        """Создание задачи
+
+        Args:
+            path (str): путь к копии загруженного файла
+            filename (str): исходное имя файла
+            member (str | None, optional): имя CSV внутри ZIP
+            mode (str, optional): FULL или INCREMENTAL
+            options (dict | None, optional): параметры обучения
+        """
+        self.id = uuid.uuid4().hex
+        self.path = path
+        self.filename = filename
+        self.member = member
+        self.mode = mode
+        self.options = options or {}
+        self.status = QUEUED
+        self.progress = {"phase": QUEUED}
+        self.error = None
+        self.version = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.process = None
+        # пауза обучения при перегрузке обслуживания (пока задача идёт)
+        self.throttle = None
+        # длительность фаз обучения, с: фаза startup - запуск процесса до чтения файла
+        self.phase_seconds = {}
+        self._phase = None
+        self._phase_started = None
+
+    def start_phase(self, phase: str | None, now: float | None = None):
+        """Завершение текущей фазы (с записью в метрики) и начало следующей"""
+        now = time.time() if now is None else now
+        if self._phase is not None:
+            elapsed = now - self._phase_started
+            self.phase_seconds[self._phase] = round(self.phase_seconds.get(self._phase, 0.0) + elapsed, 3)
+            training_phase.observe(elapsed, phase=self._phase)
+        self._phase = phase
+        self._phase_started = now
+
+    def on_event(self, phase: str, info: dict):
+        """Обновление прогресса по событию из процесса обучения"""
+        if phase == "fold":
+            self.progress["fits_done"] = self.progress.get("fits_done", 0) + 1
+            self.progress["candidate"] = info.get("candidate")
+            self.progress["last_score"] = info.get("score")
+        else:
+            self.start_phase(phase)
+            self.progress["phase"] = phase
+            self.progress.update(info)
+
+    def to_dict(self) -> dict:
+        """Представление задачи для ответа API"""
+        end = self.finished_at or time.time()
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "filename": self.filename,
+            "mode": self.mode,
+            "progress": dict(self.progress),
+            "elapsed": round(end - self.started_at, 3) if self.started_at else 0.0,
+            "error": self.error,
+            "model_version": self.version,
+            "phase_seconds": dict(self.phase_seconds),
+            "throttle": self.throttle.to_dict() if self.throttle is not None else None,
+        }
+
+
+class TrainingJobManager:
+    """Фоновые задачи обучения в отдельных процессах с ограниченной очередью.
+
+    Обучение не занимает воркер веб-сервера: каждая задача выполняется в
+    отдельном процессе (spawn), одновременно идут не более max_workers
+    задач, и ещё не более max_queue ждут своей очереди.
+    """
+    def __init__(self, max_workers: int = MAX_WORKERS, max_queue: int = MAX_QUEUE):
+        """Инициализация менеджера
+
+        Args:
+            max_workers (int, optional): одновременно идущих обучений
+            max_queue (int, optional): задач в ожидании
+        """
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._context = multiprocessing.get_context("spawn")
+        self._manager = None
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix="training")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, file: BinaryIO, filename: str, member: str | None = None,
+               mode: str = FULL, options: dict | None = None) -> TrainingJob:
+        """Постановка обучения в очередь
+
+        Загруженный файл копируется на диск потоком, так как объект загрузки
+        закрывается вместе с запросом. Копирование идёт до блокировки, чтобы
+        большая загрузка не задерживала отмену и смену статусов задач.
+
+        Args:
+            file (BinaryIO): загруженный файл
+            filename (str): имя файла
+            member (str | None, optional): имя CSV внутри ZIP
+            mode (str, optional): FULL или INCREMENTAL
+            options (dict | None, optional): параметры обучения (см. run_training)
+
+        Raises:
+            QueueFullError: если очередь заполнена
+
+        Returns:
+            TrainingJob: созданная задача
+        """
+        suffix = "." + filename.split(".")[-1]
+        with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as copy:
+            shutil.copyfileobj(file, copy)
+        job = TrainingJob(copy.name, filename, member, mode, options)
+        with self._lock:
+            waiting = sum(job.status == QUEUED for job in self._jobs.values())
+            if waiting >= self.max_queue:
+                os.remove(job.path)
+                raise QueueFullError("Очередь обучения заполнена, повторите позже")
+            self._jobs[job.id] = job
+            self._forget_finished()
+        self._executor.submit(self._run, job)
+        logger.info(f"Задача обучения {job.id} поставлена в очередь")
+        return job
+
+    def get(self, job_id: str) -> TrainingJob | None:
+        """Задача по идентификатору"""
+        return self._jobs.get(job_id)
+
+    def list(self) -> list:
+        """Все известные задачи в порядке постановки"""
+        return list(self._jobs.values())
+
+    def cancel(self, job_id: str) -> TrainingJob | None:
+        """Отмена ожидающей или идущей задачи
+
+        Args:
+            job_id (str): идентификатор задачи
+
+        Returns:
+            TrainingJob | None: задача или None, если она не найдена
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in FINISHED_STATUSES:
+                return job
+            previous = job.status
+            job.status = CANCELLED
+            if previous == RUNNING and job.process is not None:
+                job.process.terminate()
+            if previous == QUEUED:
+                job.finished_at = time.time()
+        logger.info(f"Задача обучения {job_id} отменена")
+        return job
+
+    def _shared(self):
+        """Менеджер общих с процессами обучения объектов (запускается при первой задаче)"""
+        with self._lock:
+            if self._manager is None:
+                self._manager = self._context.Manager()
+            return self._manager
+
+    def _events(self):
+        """Очередь событий, доступная из процессов кросс-валидации"""
+        return self._shared().Queue()
+
+    def _run(self, job: TrainingJob):
+        """Запуск процесса обучения и наблюдение за ним (в потоке пула)"""
+        try:
+            if job.status == CANCELLED:
+                return
+            events = self._events()
+            job.throttle = TrainingThrottle(self._shared().dict())
+            process = self._context.Process(
+                target=_training_process,
+                args=(job.path, job.filename, job.member, events, job.mode, job.options,
+                      job.throttle.control),
+                daemon=False,
+            )
+            with self._lock:
+                if job.status == CANCELLED:
+                    return
+                job.process = process
+                job.status = RUNNING
+                job.started_at = time.time()
+                job.start_phase("startup", job.started_at)
+                job.progress["phase"] = RUNNING
+                process.start()
+            result = None
+            while result is None:
+                job.throttle.update()
+                try:
+                    phase, info = events.get(timeout=POLL_INTERVAL)
+                except queue.Empty:
+                    if not process.is_alive():
+                        break
+                    continue
+                if phase in ("done", "error"):
+                    result = (phase, info)
+                else:
+                    job.on_event(phase, info)
+            job.throttle.resume()
+            process.join()
+            with self._lock:
+                if job.status == CANCELLED:
+                    pass
+                elif result and result[0] == "done":
+                    job.status = SUCCEEDED
+                    job.version = result[1]["version"]
+                else:
+                    job.status = FAILED
+                    job.error = result[1]["error"] if result else \
+                        f"Процесс обучения завершился с кодом {process.exitcode}"
+        except Exception as e:
+            job.status = FAILED
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            job.process = None
+            if job.started_at is not None:
+                job.start_phase(None, job.finished_at)
+                training_duration.observe(job.finished_at - job.started_at, mode=job.mode, status=job.status)
+            if os.path.exists(job.path):
+                os.remove(job.path)
+            logger.info(f"Задача обучения {job.id}: {job.status}")
+
+    def _forget_finished(self):
+        """Удаление самых старых завершённых задач сверх MAX_FINISHED"""
+        finished = [job_id for job_id, job in self._jobs.items()
+                    if job.status in FINISHED_STATUSES]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED)]:
+            del self._jobs[job_id]
+
+
+job_manager = TrainingJobManager()
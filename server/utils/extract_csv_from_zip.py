@@ -1,21 +1,79 @@
+import bz2
+import gzip
+import lzma
 import zipfile
-import io
+from typing import BinaryIO
 
 from fastapi import UploadFile
 
+# потоковые распаковщики для сжатых CSV (file.csv.gz, file.csv.bz2, file.csv.xz)
+COMPRESSED_OPENERS = {
+    "gz": gzip.open,
+    "bz2": bz2.open,
+    "xz": lzma.open,
+}
+# расширения, которые принимает /fit
+SUPPORTED_EXTENSIONS = ["csv", "zip", *COMPRESSED_OPENERS]
 
-def extract_csv_from_zip(upload_file: UploadFile) -> io.BytesIO | None:
-    """Извлечение CSV из ZIP и возврат его содержимого
+
+def open_zip_member(file: BinaryIO, member: str | None = None,
+                    extensions: tuple = (".csv",)) -> BinaryIO | None:
+    """Потоковое открытие CSV внутри ZIP без чтения архива в память
+
+    Args:
+        file (BinaryIO): ZIP-файл с произвольным доступом (например, файл загрузки)
+        member (str | None, optional): имя CSV в архиве. По умолчанию первый CSV.
+        extensions (tuple, optional): допустимые расширения файлов в архиве
+
+    Returns:
+        BinaryIO | None: распаковывающий поток (имя файла в архиве - в .name)
+                         или None, если CSV не найден
+    """
+    z = zipfile.ZipFile(file)
+    names = [name for name in z.namelist() if name.lower().endswith(extensions)]
+    if member is not None:
+        names = [name for name in names if name == member]
+    if not names:
+        return None
+    # архив не закрываем: поток держит ссылку на него, а сам файл закроет владелец
+    return z.open(names[0])
+
+
+def open_csv_stream(file: BinaryIO, filename: str, member: str | None = None,
+                    extensions: tuple = (".csv",)) -> BinaryIO | None:
+    """Поток CSV из файла с учётом сжатия по расширению имени
+
+    Args:
+        file (BinaryIO): исходный файл
+        filename (str): имя файла (по расширению выбирается распаковщик)
+        member (str | None, optional): имя CSV внутри ZIP
+        extensions (tuple, optional): допустимые расширения несжатого файла
+                                      и файлов внутри ZIP
+
+    Raises:
+        ValueError: если расширение не поддерживается
+
+    Returns:
+        BinaryIO | None: поток с CSV или None, если в ZIP нет нужного CSV
+    """
+    file_ext = filename.split(".")[-1].lower()
+    if file_ext == "zip":
+        return open_zip_member(file, member, extensions)
+    if file_ext in COMPRESSED_OPENERS:
+        return COMPRESSED_OPENERS[file_ext](file, "rb")
+    if "." + file_ext in extensions:
+        return file
+    raise ValueError(f"Неподдерживаемое расширение файла: .{file_ext}")
+
+
+def extract_csv_from_zip(upload_file: UploadFile, member: str | None = None) -> BinaryIO | None:
+    """Извлечение CSV из ZIP и возврат потока с его содержимым
 
     Args:
         upload_file (UploadFile): ZIP-файл
+        member (str | None, optional): имя CSV в архиве. По умолчанию первый CSV.
 
     Returns:
-        io.BytesIO | None: Байтовый файл или None
-    """    
-    zip_bytes = upload_file.file.read()
-    with zipfile.ZipFile(io.BytesIO(zip_bytes)) as z:
-        for name in z.namelist():
-            if name.lower().endswith(".csv"):
-                return io.BytesIO(z.read(name))
-    return None
\ No newline at end of file
+        BinaryIO | None: поток CSV или None
+    """
+    return open_zip_member(upload_file.file, member)
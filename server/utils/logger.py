@@ -4,7 +4,8 @@ import os
 
 FORMAT = "{time:DD.MM.YYYY  HH:mm:ss} | {level} |  {module}:{function}:{line} - {message}"
 ROTATION = "5 MB"
-FILENAME = os.path.abspath("file.log")
+# файл журнала (по умолчанию file.log в рабочем каталоге)
+FILENAME = os.path.abspath(os.getenv("MUSHROOMS_LOG_FILE", "file.log"))
 
 
 def create_logger() -> "loguru.Logger":
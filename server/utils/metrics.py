@@ -0,0 +1,312 @@
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from starlette.routing import Match
+
+# сбор метрик можно выключить (MUSHROOMS_METRICS=0): /metrics останется пустым
+METRICS_ENABLED = os.getenv("MUSHROOMS_METRICS", "1") == "1"
+# границы корзин гистограмм: задержка запроса и этапов, с
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# строк в пакетном запросе
+ROWS_BUCKETS = (1, 10, 50, 100, 500, 1000, 5000, 10000, 50000, 100000, 1000000)
+# частей, на которые разбит расчёт пакета предсказаний
+PARALLELISM_BUCKETS = (1, 2, 3, 4, 6, 8, 12, 16, 32, 64)
+# длительность обучения и его фаз, с
+TRAINING_BUCKETS = (1, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200)
+# метка запросов, не попавших ни в один маршрут (чтобы не плодить метки по 404)
+UNMATCHED_ROUTE = "unmatched"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    """Экранирование значения метки для текстового формата Prometheus"""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    """Метки в виде {name="value",...}"""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value: float) -> str:
+    """Число в текстовом формате Prometheus"""
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """Метрика с метками: значения хранятся по кортежу значений меток"""
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        """Создание метрики
+
+        Args:
+            name (str): имя метрики
+            documentation (str): описание (строка HELP)
+            labels (tuple, optional): имена меток
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        """Кортеж значений меток в порядке self.labels"""
+        return tuple(labels[name] for name in self.labels)
+
+    def samples(self) -> list:
+        """Строки значений метрики в текстовом формате"""
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_number(value)}"
+                for key, value in items]
+
+    def series(self) -> list:
+        """Ряды метрики: пары (метки, значение)"""
+        with self._lock:
+            return [(dict(zip(self.labels, key)), value) for key, value in self._values.items()]
+
+    def render(self) -> str:
+        """Метрика целиком: HELP, TYPE и значения"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        return "\n".join(lines + self.samples())
+
+    def clear(self):
+        """Сброс всех значений"""
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(Metric):
+    """Монотонно растущий счётчик"""
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(Metric):
+    """Значение, которое может расти и уменьшаться"""
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+
+class Histogram(Metric):
+    """Гистограмма с накопительными корзинами, суммой и числом наблюдений"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def count(self, **labels) -> int:
+        """Число наблюдений"""
+        counts, _ = self._values.get(self._key(labels), ([0], 0.0))
+        return sum(counts)
+
+    def sum(self, **labels) -> float:
+        """Сумма наблюдений"""
+        return self._values.get(self._key(labels), ([0], 0.0))[1]
+
+    def samples(self) -> list:
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_number(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Набор метрик сервиса и их вывод в текстовом формате Prometheus"""
+    def __init__(self, enabled: bool = METRICS_ENABLED):
+        self.enabled = enabled
+        self._metrics = []
+
+    def add(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Все метрики (пустая строка, если сбор выключен)"""
+        if not self.enabled:
+            return ""
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+    def clear(self):
+        for metric in self._metrics:
+            metric.clear()
+
+
+metrics = MetricsRegistry()
+
+http_requests = metrics.add(Counter(
+    "mushrooms_http_requests_total", "Число HTTP-запросов", ("method", "route", "status")))
+http_in_flight = metrics.add(Gauge(
+    "mushrooms_http_requests_in_flight", "Запросы, обрабатываемые сейчас", ("route",)))
+http_duration = metrics.add(Histogram(
+    "mushrooms_http_request_duration_seconds", "Длительность HTTP-запроса до конца ответа",
+    ("method", "route")))
+prediction_stage = metrics.add(Histogram(
+    "mushrooms_prediction_stage_seconds",
+    "Этапы предсказания: validation, frame_build, preprocessing, inference, serialization",
+    ("route", "stage")))
+prediction_rows = metrics.add(Histogram(
+    "mushrooms_prediction_rows", "Строк в пакетном запросе на предсказание", ("route",),
+    buckets=ROWS_BUCKETS))
+training_duration = metrics.add(Histogram(
+    "mushrooms_training_duration_seconds", "Длительность задачи обучения", ("mode", "status"),
+    buckets=TRAINING_BUCKETS))
+training_phase = metrics.add(Histogram(
+    "mushrooms_training_phase_seconds", "Длительность фаз обучения (read, prepare, search, fit, save)",
+    ("phase",), buckets=TRAINING_BUCKETS))
+inference_decisions = metrics.add(Counter(
+    "mushrooms_inference_decisions_total",
+    "Решения о параллельном расчёте пакета: inline (мало строк), parallel, degraded (пул занят)",
+    ("mode",)))
+inference_parallelism = metrics.add(Histogram(
+    "mushrooms_inference_parallelism", "Частей, на которые разбит расчёт пакета предсказаний",
+    ("mode",), buckets=PARALLELISM_BUCKETS))
+inference_workers_busy = metrics.add(Gauge(
+    "mushrooms_inference_workers_busy", "Занятые потоки общего пула инференса"))
+startup_seconds = metrics.add(Gauge(
+    "mushrooms_startup_seconds", "Запуск воркера: import, model_load, warmup и ready (от начала импорта)",
+    ("phase",)))
+
+
+class StageTimer:
+    """Замер этапов обработки запроса на предсказание.
+
+    Этап validation - от прихода запроса в MetricsMiddleware до входа в
+    обработчик (разбор параметров и проверка Pydantic), serialization -
+    от выхода из обработчика (done) до начала ответа (замеряет middleware).
+    """
+    def __init__(self, request):
+        """Начало замера в обработчике
+
+        Args:
+            request (Request): запрос FastAPI
+        """
+        self.request = request
+        route = request.scope.get("route")
+        self.route = getattr(route, "path", UNMATCHED_ROUTE)
+        started = getattr(request.state, "metrics_started", None)
+        if metrics.enabled and started is not None:
+            prediction_stage.observe(time.perf_counter() - started, route=self.route, stage="validation")
+
+    @contextmanager
+    def stage(self, name: str):
+        """Замер этапа name"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            if metrics.enabled:
+                prediction_stage.observe(time.perf_counter() - started, route=self.route, stage=name)
+
+    def rows(self, count: int):
+        """Число строк пакетного запроса"""
+        if metrics.enabled:
+            prediction_rows.observe(count, route=self.route)
+
+    def done(self):
+        """Выход из обработчика: дальше FastAPI сериализует ответ"""
+        self.request.state.metrics_handler_done = time.perf_counter()
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: счётчики, запросы в работе и длительность по маршрутам.
+
+    Метка route - шаблон пути маршрута (/models/{version}), а не сам путь,
+    чтобы число рядов метрик не росло с числом разных URL.
+    """
+    def __init__(self, app):
+        self.app = app
+        self._routes = {}
+
+    def _route(self, scope) -> str:
+        """Шаблон пути маршрута, которому соответствует запрос"""
+        key = (scope["method"], scope["path"])
+        route = self._routes.get(key)
+        if route is None:
+            route = UNMATCHED_ROUTE
+            for candidate in getattr(scope.get("app"), "routes", ()):
+                match, _ = candidate.matches(scope)
+                if match == Match.FULL:
+                    route = candidate.path
+                    break
+            # кэш ограничен: пути с параметрами не должны копиться бесконечно
+            if len(self._routes) < 1024:
+                self._routes[key] = route
+        return route
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not metrics.enabled:
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        state = scope.setdefault("state", {})
+        state["metrics_started"] = started
+        route = self._route(scope)
+        method = scope["method"]
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                handler_done = state.get("metrics_handler_done")
+                if handler_done is not None:
+                    prediction_stage.observe(time.perf_counter() - handler_done,
+                                             route=route, stage="serialization")
+            await send(message)
+
+        http_in_flight.inc(route=route)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_in_flight.dec(route=route)
+            http_requests.inc(method=method, route=route, status=str(status))
+            http_duration.observe(time.perf_counter() - started, method=method, route=route)
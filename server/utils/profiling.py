@@ -0,0 +1,346 @@
+import cProfile
+import io
+import json
+import marshal
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from urllib.parse import parse_qs
+from starlette.concurrency import run_in_threadpool
+from utils.logger import log as logger
+
+BASE_DIR = Path(__file__).parent.parent
+# каталог сохранённых профилей
+PROFILE_DIR = os.getenv("MUSHROOMS_PROFILE_DIR", os.path.join(BASE_DIR, "profiles"))
+# секрет администратора: профилирование по заголовку или параметру запроса
+# включается только при совпадении значения (пустой - выключено)
+PROFILE_TOKEN = os.getenv("MUSHROOMS_PROFILE_TOKEN", "")
+# доля запросов, профилируемых без заголовка (0 - только по запросу администратора)
+PROFILE_SAMPLE_RATE = float(os.getenv("MUSHROOMS_PROFILE_SAMPLE_RATE", "0"))
+# период опроса стеков сэмплирующим профилировщиком, мс
+PROFILE_INTERVAL_MS = float(os.getenv("MUSHROOMS_PROFILE_INTERVAL_MS", "5"))
+# профилировщик подбора гиперпараметров при обучении: cprofile или sample
+TRAINING_PROFILE_MODE = os.getenv("MUSHROOMS_PROFILE_TRAINING_MODE", "cprofile")
+# сколько последних профилей хранится
+PROFILE_KEEP = int(os.getenv("MUSHROOMS_PROFILE_KEEP", "100"))
+PROFILE_HEADER = "x-mushrooms-profile"
+PROFILE_QUERY = "profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+# маршруты, запросы к которым можно профилировать
+PROFILED_PREFIXES = ("/predict", "/fit")
+MODES = ("cprofile", "sample")
+# файлы профиля: folded - стеки для flamegraph.pl/speedscope, pstats - для pstats/snakeviz
+FOLDED = "folded"
+PSTATS = "pstats"
+TEXT = "txt"
+META_FILE = "meta.json"
+
+
+def new_profile_id() -> str:
+    """Идентификатор профиля: время и случайный суффикс (сортируется по времени)"""
+    return f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+
+def _frame_name(code) -> str:
+    """Имя функции в стеке: модуль:функция"""
+    return f"{Path(code.co_filename).stem}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+def nested_codes(function) -> set:
+    """Объекты кода функции и всех вложенных в неё функций (генераторов, lambda)"""
+    function = getattr(function, "__wrapped__", function)
+    code = getattr(function, "__code__", None)
+    codes, stack = set(), [code] if code is not None else []
+    while stack:
+        code = stack.pop()
+        codes.add(code)
+        stack.extend(const for const in code.co_consts if hasattr(const, "co_code"))
+    return codes
+
+
+class StackSampler:
+    """Сэмплирующий профилировщик: периодический снимок стеков потоков.
+
+    Опрашивает sys._current_frames() из отдельного потока, поэтому видит
+    и обработчики, которые FastAPI выполняет в пуле потоков. В профиль
+    попадают только стеки с кодом, который вернула select (и кадром,
+    который принимает accept). Результат - свёрнутые стеки "a;b;c N",
+    которые понимают flamegraph.pl и speedscope.
+    """
+    def __init__(self, select=None, interval_ms: float = PROFILE_INTERVAL_MS, accept=None):
+        """Создание профилировщика
+
+        Args:
+            select (optional): функция без аргументов, возвращающая множество
+                объектов кода: в профиль попадают стеки, где есть один из них.
+                По умолчанию - все стеки.
+            interval_ms (float, optional): период опроса, мс
+            accept (optional): функция accept(frame) -> bool, дополнительная
+                проверка кадра с выбранным кодом (например, чей это запрос)
+        """
+        self.select = select
+        self.accept = accept
+        self.interval = interval_ms / 1000
+        self.stacks = Counter()
+        self.samples = 0
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        own = threading.get_ident()
+        codes = self.select() if self.select is not None else None
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own:
+                continue
+            names, matched = [], codes is None
+            while frame is not None:
+                matched = matched or (frame.f_code in codes and
+                                      (self.accept is None or self.accept(frame)))
+                names.append(_frame_name(frame.f_code))
+                frame = frame.f_back
+            if matched:
+                self.stacks[";".join(reversed(names))] += 1
+        self.samples += 1
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self._sample()
+
+    def start(self) -> "StackSampler":
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> "StackSampler":
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self
+
+    def folded(self) -> str:
+        """Свёрнутые стеки, самые частые первыми"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def pstats_text(profile: cProfile.Profile, limit: int = 60) -> str:
+    """Сводка cProfile: функции по суммарному времени"""
+    output = io.StringIO()
+    pstats.Stats(profile, stream=output).sort_stats("cumulative").print_stats(limit)
+    return output.getvalue()
+
+
+class ProfileStore:
+    """Хранилище профилей на диске: каталог на профиль с meta.json и файлами.
+
+    Профили пишут и веб-воркеры, и процессы обучения, поэтому состояние
+    хранится только на диске. Старые профили сверх keep удаляются.
+    """
+    def __init__(self, root: str = PROFILE_DIR, keep: int = PROFILE_KEEP):
+        self.root = root
+        self.keep = keep
+
+    def save(self, kind: str, meta: dict, files: dict, profile_id: str | None = None) -> str:
+        """Сохранение профиля
+
+        Args:
+            kind (str): что профилировалось (request, training)
+            meta (dict): описание (маршрут, длительность, профилировщик и т.п.)
+            files (dict): формат (FOLDED, PSTATS, TEXT) -> содержимое (str или bytes)
+            profile_id (str | None, optional): заранее выданный идентификатор
+
+        Returns:
+            str: идентификатор профиля
+        """
+        profile_id = profile_id or new_profile_id()
+        path = os.path.join(self.root, profile_id)
+        os.makedirs(path, exist_ok=True)
+        for fmt, content in files.items():
+            mode = "wb" if isinstance(content, bytes) else "w"
+            with open(os.path.join(path, f"profile.{fmt}"), mode) as f:
+                f.write(content)
+        meta = {"id": profile_id, "kind": kind, "created_at": time.time(),
+                "formats": sorted(files), **meta}
+        with open(os.path.join(path, META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        self._forget_old()
+        logger.info(f"Сохранён профиль {profile_id} ({kind})")
+        return profile_id
+
+    def list(self) -> list:
+        """Описания профилей, новые первыми"""
+        if not os.path.isdir(self.root):
+            return []
+        result = [self.get(name) for name in sorted(os.listdir(self.root), reverse=True)]
+        return [meta for meta in result if meta is not None]
+
+    def get(self, profile_id: str) -> dict | None:
+        """Описание профиля или None"""
+        try:
+            with open(os.path.join(self.root, os.path.basename(profile_id), META_FILE), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def file(self, profile_id: str, fmt: str) -> str | None:
+        """Путь к файлу профиля в формате fmt или None"""
+        path = os.path.join(self.root, os.path.basename(profile_id), f"profile.{os.path.basename(fmt)}")
+        return path if os.path.exists(path) else None
+
+    def _forget_old(self):
+        """Удаление самых старых профилей сверх keep
+
+        Каталог чистят все воркеры, поэтому профиль может исчезнуть
+        между listdir и удалением - это не ошибка.
+        """
+        names = sorted(name for name in os.listdir(self.root) if not name.startswith("."))
+        for name in names[:max(0, len(names) - self.keep)]:
+            path = os.path.join(self.root, name)
+            try:
+                for entry in os.listdir(path):
+                    try:
+                        os.remove(os.path.join(path, entry))
+                    except FileNotFoundError:
+                        pass
+                os.rmdir(path)
+            except FileNotFoundError:
+                pass
+
+
+profile_store = ProfileStore()
+
+
+def profile_call(function, mode: str = TRAINING_PROFILE_MODE, meta: dict | None = None,
+                 kind: str = "training"):
+    """Вызов function() под профилировщиком с сохранением профиля
+
+    Args:
+        function: функция без аргументов
+        mode (str, optional): cprofile (детерминированный) или sample
+        meta (dict | None, optional): описание для meta.json
+        kind (str, optional): что профилируется
+
+    Returns:
+        tuple: (результат function, идентификатор профиля)
+    """
+    if mode not in MODES:
+        raise ValueError(f"Неизвестный профилировщик {mode}, доступны: {', '.join(MODES)}")
+    started = time.perf_counter()
+    if mode == "cprofile":
+        profile = cProfile.Profile()
+        try:
+            result = profile.runcall(function)
+        finally:
+            profile.create_stats()
+        # тот же формат, что пишет Profile.dump_stats
+        files = {PSTATS: marshal.dumps(profile.stats), TEXT: pstats_text(profile)}
+    else:
+        codes = nested_codes(function)
+        sampler = StackSampler(lambda: codes).start()
+        try:
+            result = function()
+        finally:
+            sampler.stop()
+        files = {FOLDED: sampler.folded()}
+    profile_id = profile_store.save(kind, {"profiler": mode, "duration": time.perf_counter() - started,
+                                           **(meta or {})}, files)
+    return result, profile_id
+
+
+def _requested(scope) -> bool:
+    """Запрошено ли профилирование администратором (заголовок или параметр)"""
+    if not PROFILE_TOKEN:
+        return False
+    for name, value in scope.get("headers", ()):
+        if name == PROFILE_HEADER.encode() and value.decode("latin-1") == PROFILE_TOKEN:
+            return True
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    return PROFILE_TOKEN in query.get(PROFILE_QUERY, ())
+
+
+class ProfilingMiddleware:
+    """ASGI-middleware: профилирование запросов к /predict* и /fit.
+
+    Запрос профилируется, если заголовок X-Mushrooms-Profile или параметр
+    ?profile= совпадает с MUSHROOMS_PROFILE_TOKEN, либо случайно с долей
+    MUSHROOMS_PROFILE_SAMPLE_RATE. Профиль снимает StackSampler: после
+    разбора маршрута в него попадают стеки с кодом обработчика (и вложенных
+    функций, например генератора потокового ответа). Идентификатор профиля
+    возвращается в заголовке X-Profile-Id. Без профилирования middleware
+    только сравнивает строки.
+
+    В профиль попадают стеки потока, выполняющего обработчик этого запроса:
+    кадр обработчика должен держать request с тем же scope. Вложенные функции
+    без request (генератор потокового ответа) не различают одновременные
+    запросы к тому же маршруту. Расчёт в общих потоках micro_batcher и
+    parallel_scorer в профиль запроса не попадает: эти потоки считают
+    строки сразу нескольких запросов.
+
+    Для /fit по запросу администратора ставится request.state.profile_training:
+    обработчик передаёт флаг задаче, и в процессе обучения профилируется
+    подбор гиперпараметров (см. MushroomsModel.validation_model).
+    Остановка профилировщика и запись профиля идут в пуле потоков, не
+    занимая цикл событий.
+    """
+    def __init__(self, app, sample_rate: float = PROFILE_SAMPLE_RATE, store: ProfileStore = profile_store):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.store = store
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(PROFILED_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+        requested = _requested(scope)
+        if not requested and not (self.sample_rate and random.random() < self.sample_rate):
+            await self.app(scope, receive, send)
+            return
+        scope.setdefault("state", {})["profile_training"] = requested
+        profile_id = new_profile_id()
+        codes = set()
+
+        def route_codes() -> set:
+            # маршрут известен только после разбора запроса роутером
+            if not codes and scope.get("endpoint") is not None:
+                codes.update(nested_codes(scope["endpoint"]))
+            return codes
+
+        status = None
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = {**message, "headers": list(message.get("headers", [])) +
+                           [(PROFILE_ID_HEADER.lower().encode(), profile_id.encode())]}
+            await send(message)
+
+        def own_request(frame) -> bool:
+            # кадры обработчиков других запросов держат request с другим scope
+            request = frame.f_locals.get("request")
+            return request is None or getattr(request, "scope", None) is scope
+
+        started = time.perf_counter()
+        sampler = StackSampler(route_codes, accept=own_request).start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            await run_in_threadpool(self._finish, sampler, {
+                "route": getattr(scope.get("route"), "path", scope["path"]),
+                "method": scope["method"],
+                "status": status,
+                "duration": time.perf_counter() - started,
+                "profiler": "sample",
+                "interval_ms": PROFILE_INTERVAL_MS,
+            }, profile_id)
+
+    def _finish(self, sampler: StackSampler, meta: dict, profile_id: str):
+        """Остановка профилировщика и сохранение профиля (в пуле потоков)"""
+        sampler.stop()
+        meta["samples"] = sampler.samples
+        self.store.save("request", meta, {FOLDED: sampler.folded()}, profile_id)
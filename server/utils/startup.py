@@ -0,0 +1,57 @@
+import time
+
+# момент импорта модуля: main.py импортирует его первым
+STARTED = time.perf_counter()
+
+
+def _record(phase: str, seconds: float):
+    """Длительность этапа в метрике mushrooms_startup_seconds"""
+    # метрики импортируются здесь, чтобы отсчёт начинался до импорта starlette
+    from utils.metrics import startup_seconds
+
+    startup_seconds.set(seconds, phase=phase)
+
+
+class StartupState:
+    """Ход запуска воркера: длительность этапов и готовность к запросам.
+
+    Этапы идут подряд от импорта этого модуля: import (импорт приложения
+    до запуска lifespan), model_load, warmup. ready_seconds - время от
+    начала импорта до готовности.
+    """
+    def __init__(self, started: float = STARTED):
+        self.started = started
+        self.phases = {}
+        self.ready = False
+        self.ready_seconds = None
+        self._last = started
+
+    def finish_phase(self, phase: str) -> float:
+        """Завершение этапа phase
+
+        Returns:
+            float: длительность этапа, с
+        """
+        now = time.perf_counter()
+        elapsed = now - self._last
+        self._last = now
+        self.phases[phase] = elapsed
+        _record(phase, elapsed)
+        return elapsed
+
+    def set_ready(self):
+        """Воркер готов принимать запросы"""
+        self.ready_seconds = time.perf_counter() - self.started
+        self.ready = True
+        _record("ready", self.ready_seconds)
+
+    def to_dict(self) -> dict:
+        """Представление для /health/ready"""
+        return {
+            "ready": self.ready,
+            "phase_seconds": {phase: round(elapsed, 4) for phase, elapsed in self.phases.items()},
+            "ready_seconds": None if self.ready_seconds is None else round(self.ready_seconds, 4),
+        }
+
+
+startup = StartupState()
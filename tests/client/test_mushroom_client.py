@@ -0,0 +1,130 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+import httpx
+import pytest
+import requests
+import utils.logger
+
+# клиент запускается из корня репозитория: его логгер - тот же модуль, что у сервиса
+sys.modules.setdefault("server.utils.logger", utils.logger)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "client"))
+from mushroom_client import AsyncMushroomClient, MushroomClient, merge_chunks  # noqa: E402
+
+
+class StubResponse:
+    def __init__(self, status_code: int = 200, payload=None):
+        self.status_code = status_code
+        self.payload = payload
+        self.text = json.dumps(payload)
+        self.headers = {"content-type": "application/json"}
+        self.content = self.text.encode()
+
+    def json(self):
+        return self.payload
+
+
+class StubSession:
+    """Сессия requests: ответы по очереди или функцией handler(method, url, kwargs)"""
+    def __init__(self, handler):
+        self.handler = handler
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def request(self, method, url, timeout=None, **kwargs):
+        with self._lock:
+            self.calls.append((method, url))
+        result = self.handler(method, url, kwargs)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def close(self):
+        pass
+
+
+def sequence(*results):
+    results = list(results)
+    return lambda method, url, kwargs: results.pop(0)
+
+
+def echo_batch(method, url, kwargs):
+    """predict_batch: по строке ответа на гриб, части отвечают в разное время"""
+    rows = kwargs["json"]
+    time.sleep(0.02 if rows[0]["n"] % 2 == 0 else 0)
+    if any(row.get("bad") for row in rows):
+        return StubResponse(500, "boom")
+    return StubResponse(200, [{"n": row["n"]} for row in rows])
+
+
+def test_request_retries_temporary_errors():
+    session = StubSession(sequence(StubResponse(503), requests.ConnectionError("reset"),
+                                   StubResponse(200, {"poisonous": True})))
+    client = MushroomClient("http://test", session=session, retries=3, backoff=0)
+    assert client.predict({"cap_shape": "x"}) == {"poisonous": True}
+    assert len(session.calls) == 3
+
+
+def test_request_gives_up_after_retries():
+    session = StubSession(sequence(StubResponse(503), StubResponse(503)))
+    client = MushroomClient("http://test", session=session, retries=1, backoff=0)
+    assert "error" in client.predict({})
+    assert len(session.calls) == 2
+    session = StubSession(lambda method, url, kwargs: requests.Timeout("slow"))
+    client = MushroomClient("http://test", session=session, retries=2, backoff=0)
+    with pytest.raises(requests.Timeout):
+        client.status()
+    assert len(session.calls) == 3
+    # не повторяемый ответ возвращается сразу
+    session = StubSession(sequence(StubResponse(422, "bad")))
+    assert "error" in MushroomClient("http://test", session=session, backoff=0).predict({})
+    assert len(session.calls) == 1
+
+
+def test_parallel_chunks_keep_order_and_report_errors():
+    client = MushroomClient("http://test", session=StubSession(echo_batch), backoff=0)
+    data = [{"n": i} for i in range(23)]
+    result = client.predict_batch_parallel(data, chunk_size=3, max_workers=4)
+    assert result == [{"n": i} for i in range(23)]
+    data[10]["bad"] = True
+    result = client.predict_batch_parallel(data, chunk_size=3, max_workers=4)
+    assert result["chunk"] == 3 and "error" in result
+    assert merge_chunks([[1], {"error": "a"}, {"error": "b"}]) == {"error": "a", "chunk": 1}
+    assert merge_chunks([]) == []
+
+
+def test_async_client_retries_limits_concurrency_and_orders_chunks():
+    state = {"active": 0, "max_active": 0, "failed": False}
+
+    async def handler(request):
+        if request.url.path == "/predict/":
+            if not state["failed"]:
+                state["failed"] = True
+                return httpx.Response(503)
+            return httpx.Response(200, json={"poisonous": False})
+        columns = json.loads(request.content)
+        state["active"] += 1
+        state["max_active"] = max(state["max_active"], state["active"])
+        await asyncio.sleep(0.01 * (len(columns["n"]) % 3))
+        state["active"] -= 1
+        return httpx.Response(200, json={"probability_of_poisonous": [n / 100 for n in columns["n"]]})
+
+    async def run():
+        transport = httpx.MockTransport(handler)
+        async with AsyncMushroomClient(concurrency=2, backoff=0, client=httpx.AsyncClient(
+                base_url="http://test", transport=transport)) as client:
+            single = await client.predict({"cap_shape": "x"})
+            data = [{"n": i} for i in range(20)]
+            rows = await client.predict_proba_chunked(data, chunk_size=3)
+        return single, rows
+
+    # столбцы уходят в JSON, чтобы заглушка могла их прочитать
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr("mushroom_client.msgpack", None)
+        single, rows = asyncio.run(run())
+    assert single == {"poisonous": False}
+    assert rows == [{"probability_of_poisonous": i / 100} for i in range(20)]
+    assert state["max_active"] <= 2
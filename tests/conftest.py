@@ -1,5 +1,65 @@
 import sys
 import os
+import tempfile
+import pytest
 
 tests_root = os.path.abspath(os.path.dirname(__file__))
 sys.path.insert(0, tests_root)
+
+# версии моделей, обученные в тестах, не попадают в реестр сервиса
+os.environ.setdefault("MUSHROOMS_MODELS_DIR", tempfile.mkdtemp(prefix="mushrooms-models-"))
+# подбор гиперпараметров в тестах укорочен: первые раунды halving по деревьям и бюджет 1 с
+os.environ.setdefault("MUSHROOMS_SEARCH_STRATEGY", "halving")
+os.environ.setdefault("MUSHROOMS_SEARCH_RESOURCE", "n_estimators")
+os.environ.setdefault("MUSHROOMS_SEARCH_BUDGET", "1")
+# кэш подготовленных данных тестов не смешивается с кэшем сервиса
+os.environ.setdefault("MUSHROOMS_DATASET_CACHE_DIR", tempfile.mkdtemp(prefix="mushrooms-datasets-"))
+# профили запросов и обучения тестов пишутся во временный каталог
+os.environ.setdefault("MUSHROOMS_PROFILE_DIR", tempfile.mkdtemp(prefix="mushrooms-profiles-"))
+# журнал тестов не пишется в file.log репозитория
+os.environ.setdefault("MUSHROOMS_LOG_FILE", os.path.join(tempfile.mkdtemp(prefix="mushrooms-logs-"), "file.log"))
+
+
+@pytest.fixture(scope="session")
+def fitted():
+    """Обученный пайплайн (препроцессор сервиса и лес из 25 деревьев) и его признаки"""
+    # модули сервиса импортируются после настройки переменных окружения выше
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.pipeline import Pipeline
+    from ml.mushrooms_model import make_preprocessor
+    from ml.prepared_data import prepared_data
+    from test_data import make_training_frame
+
+    df = prepared_data(make_training_frame())
+    X = df.drop("class", axis=1)
+    y = df["class"]
+    pipeline = Pipeline(steps=[
+        ("preprocessor", make_preprocessor(X)),
+        ("classifier", RandomForestClassifier(n_estimators=25, random_state=42)),
+    ])
+    pipeline.fit(X, y)
+    return pipeline, X
+
+
+@pytest.fixture(scope="session")
+def registered_version(fitted):
+    """Версия с пайплайном fitted во временном реестре тестов"""
+    from datetime import datetime
+    from ml.model_registry import registry
+
+    return registry.save({"model": fitted[0], "trained_at": datetime.now().isoformat()}, activate=False)
+
+
+@pytest.fixture
+def served_model(registered_version):
+    """Обслуживаемая модель маршрутов - версия registered_version
+
+    Версия активируется перед каждым тестом: тесты обучения могли сделать
+    активной свою версию.
+    """
+    from app.routes.predictions import model_handle
+    from ml.model_registry import registry
+
+    if registry.active_version() != registered_version:
+        registry.activate(registered_version)
+    return model_handle.refresh(force=True)
@@ -1,11 +1,21 @@
+import io
+import json
+import zipfile
 from unittest.mock import patch
+import numpy as np
+import pandas as pd
+import pytest
 from urllib.parse import urlencode
 from fastapi.testclient import TestClient
 from main import app  
-from test_data import test_data, incomplete_data
+from ml.model_registry import ServedModel
+from test_data import test_data, incomplete_data, make_training_frame
 
 client = TestClient(app)
 
+# маршруты считают на маленьком пайплайне из conftest, а не на файле модели сервиса
+pytestmark = pytest.mark.usefixtures("served_model")
+
 
 def test_predict():
     response = client.get("/predict/", params=test_data[0])
@@ -77,6 +87,87 @@ def test_status():
 
 
 def test_status_fail():
-    with patch("app.routes.predictions.artifact", {}):
+    with patch("app.routes.predictions.model_handle.current", return_value=ServedModel()):
         response = client.get("/status")
-        assert response.status_code == 404
\ No newline at end of file
+        assert response.status_code == 404
+
+def test_predict_file_csv_and_ndjson():
+    df = make_training_frame(n=2500, seed=3).drop(columns=["class"])
+    df.columns = [c.replace("-", "_") for c in df.columns]
+    csv_response = client.post("/predict/file?output=csv",
+                               files={"filename": ("data.csv", df.to_csv(index=False).encode())})
+    assert csv_response.status_code == 200
+    result = pd.read_csv(io.StringIO(csv_response.text))
+    assert list(result.columns) == ["id", "poisonous", "probability_of_poisonous"]
+    assert list(result["id"]) == list(df["id"])
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as z:
+        z.writestr("data.ndjson", df.to_json(orient="records", lines=True))
+    ndjson_response = client.post("/predict/file",
+                                  files={"filename": ("data.zip", buffer.getvalue())})
+    assert ndjson_response.status_code == 200
+    rows = [json.loads(line) for line in ndjson_response.text.splitlines()]
+    assert [row["probability_of_poisonous"] for row in rows] == \
+        pytest.approx(list(result["probability_of_poisonous"]))
+
+
+def test_predict_file_blank_cells_match_batch():
+    df = make_training_frame(n=40, seed=5).drop(columns=["class"])
+    df.loc[::3, "season"] = None
+    df.loc[::4, "cap-shape"] = None
+    df.columns = [c.replace("-", "_") for c in df.columns]
+    response = client.post("/predict/file?output=csv",
+                           files={"filename": ("data.csv", df.to_csv(index=False).encode())})
+    assert response.status_code == 200
+    result = pd.read_csv(io.StringIO(response.text))
+
+    fields = ["cap_shape", "cap_surface", "cap_color", "does_bruise_or_bleed", "gill_attachment",
+              "gill_color", "stem_color", "has_ring", "ring_type", "habitat", "season",
+              "cap_diameter", "stem_height", "stem_width"]
+    params = [(field, "" if pd.isna(value) else value)
+              for field in fields for value in df[field]]
+    batch = client.get("/predict/predict_proba_batch?" + urlencode(params)).json()
+    assert list(result["probability_of_poisonous"]) == \
+        pytest.approx([row["probability_of_poisonous"] for row in batch])
+
+    df.loc[7, "stem_width"] = None
+    response = client.post("/predict/file",
+                           files={"filename": ("data.csv", df.to_csv(index=False).encode())})
+    assert response.status_code == 400
+    assert "stem-width" in response.json()["detail"]
+
+
+def test_predict_file_bad_input():
+    response = client.post("/predict/file", files={"filename": ("data.txt", b"1,2")})
+    assert response.status_code == 400
+    response = client.post("/predict/file", files={"filename": ("data.csv", b"cap-shape\nx\n")})
+    assert response.status_code == 400
+
+
+def test_predict_proba_columns():
+    columns = {key: [row[key] for row in test_data] for key in test_data[0]}
+    response = client.post("/predict/predict_proba_columns", json=columns)
+    assert response.status_code == 200
+    probabilities = response.json()["probability_of_poisonous"]
+    assert len(probabilities) == len(test_data)
+
+    msgpack = pytest.importorskip("msgpack")
+    for key in ("cap_diameter", "stem_height", "stem_width"):
+        columns[key] = np.asarray(columns[key], dtype="<f8").tobytes()
+    response = client.post("/predict/predict_proba_columns", content=msgpack.packb(columns),
+                           headers={"Content-Type": "application/msgpack"})
+    assert response.status_code == 200
+    result = np.frombuffer(msgpack.unpackb(response.content)["probability_of_poisonous"], "<f8")
+    np.testing.assert_allclose(result, probabilities)
+
+
+def test_predict_proba_columns_bad_input():
+    columns = {key: [row[key] for row in test_data] for key in test_data[0]}
+    columns["cap_diameter"] = columns["cap_diameter"][:1]
+    assert client.post("/predict/predict_proba_columns", json=columns).status_code == 400
+    del columns["season"]
+    assert client.post("/predict/predict_proba_columns", json=columns).status_code == 400
+    response = client.post("/predict/predict_proba_columns", content=b"x",
+                           headers={"Content-Type": "text/plain"})
+    assert response.status_code == 415
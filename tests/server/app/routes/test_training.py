@@ -1,11 +1,26 @@
+import io
 import pytest
 import os
-from main import app  
+import tempfile
+import time
+from unittest.mock import patch
+from main import app
+from ml.model_registry import registry
+from ml.training_jobs import QueueFullError, TrainingJobManager
 from fastapi.testclient import TestClient
 
 client = TestClient(app)
 
 
+def wait_for_job(job_id: str, timeout: float = 600) -> dict:
+    deadline = time.time() + timeout
+    while True:
+        job = client.get(f"/fit/jobs/{job_id}").json()
+        if job["status"] in ("succeeded", "failed", "cancelled") or time.time() > deadline:
+            return job
+        time.sleep(0.5)
+
+
 @pytest.mark.parametrize(
         "fname",
         [
@@ -21,10 +36,90 @@ def test_fit_model(fname):
             response = client.post(url="http://127.0.0.1:8000/fit/", files=files)
         assert response.status_code == 200
         assert isinstance(response.json()["success"], bool)
-        os.remove("mushrooms_model.pkl")
+        job = wait_for_job(response.json()["job_id"])
+        assert job["status"] == "succeeded", job["error"]
+        assert job["model_version"] is not None
+        assert job["elapsed"] > 0
+        if os.path.exists("mushrooms_model.pkl"):
+            os.remove("mushrooms_model.pkl")
     else:
         response = client.post(
             url="http://127.0.0.1:8000/fit/",
             files={}
         )
         assert response.status_code == 422
+
+
+def test_fit_model_bad_extension():
+    response = client.post("/fit/", files={"filename": ("data.txt", b"1,2,3")})
+    assert response.status_code == 400
+
+
+def test_job_not_found():
+    assert client.get("/fit/jobs/unknown").status_code == 404
+    assert client.delete("/fit/jobs/unknown").status_code == 404
+
+
+def test_submit_copies_upload_outside_lock(monkeypatch, tmp_path):
+    manager = TrainingJobManager(max_queue=0)
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+
+    locked = []
+
+    class Upload(io.BytesIO):
+        def read(self, *args):
+            # пока копируется загрузка, менеджер доступен другим запросам
+            locked.append(manager._lock.locked())
+            return super().read(*args)
+
+    with pytest.raises(QueueFullError):
+        manager.submit(Upload(b"id,class\n"), "data.csv")
+    assert locked and not any(locked)
+    # копия отклонённой загрузки удалена
+    assert os.listdir(tmp_path) == []
+    assert manager.list() == []
+
+
+def test_cancel_job():
+    # обучения идут по одному: пока идёт первое, второе ждёт в очереди
+    with open(os.path.abspath("data/train_mushrooms.zip"), "rb") as f:
+        running = client.post("/fit/", files={"filename": f}).json()["job_id"]
+    queued = client.post("/fit/", files={"filename": ("data.csv", b"id,class\n")}).json()["job_id"]
+    assert client.get(f"/fit/jobs/{queued}").json()["status"] == "queued"
+    assert client.delete(f"/fit/jobs/{queued}").json()["status"] == "cancelled"
+    assert client.delete(f"/fit/jobs/{running}").json()["status"] == "cancelled"
+    assert wait_for_job(running)["status"] == "cancelled"
+    assert wait_for_job(queued)["status"] == "cancelled"
+    assert {queued, running} <= {j["job_id"] for j in client.get("/fit/jobs").json()}
+
+
+def test_fit_model_incremental():
+    with open(os.path.abspath("data/train_mushrooms.zip"), "rb") as f:
+        response = client.post("/fit/?mode=incremental&n_estimators=5&max_estimators=200",
+                               files={"filename": f})
+    assert response.status_code == 200
+    job = wait_for_job(response.json()["job_id"])
+    assert job["status"] == "succeeded", job["error"]
+    assert job["mode"] == "incremental"
+    assert job["model_version"] is not None
+    assert {"startup", "read", "prepare", "fit", "save"} <= set(job["phase_seconds"])
+    assert job["throttle"] == {"paused": False, "paused_seconds": 0.0, "pauses": 0}
+    resources = registry.load(job["model_version"])["resources"]
+    assert resources["cpus"] >= 1 and resources["paused_seconds"] == 0.0
+    metrics = client.get("/metrics").text
+    assert 'mushrooms_training_duration_seconds_count{mode="incremental",status="succeeded"}' in metrics
+    assert 'mushrooms_training_phase_seconds_count{phase="fit"}' in metrics
+    response = client.post("/fit/?mode=unknown", files={"filename": ("data.csv", b"id\n")})
+    assert response.status_code == 422
+
+
+def test_fit_model_profiled_search():
+    with patch("utils.profiling.PROFILE_TOKEN", "secret"), open(os.path.abspath("data/train_mushrooms.zip"), "rb") as f:
+        response = client.post("/fit/?strategy=capped&budget=1", files={"filename": f},
+                               headers={"X-Mushrooms-Profile": "secret"})
+        assert response.status_code == 200
+        job = wait_for_job(response.json()["job_id"])
+        assert job["status"] == "succeeded", job["error"]
+        profile_id = job["progress"]["profile_id"]
+        meta = client.get(f"/profiles/{profile_id}", headers={"X-Mushrooms-Profile": "secret"}).json()
+        assert meta["kind"] == "training" and meta["strategy"] == "capped"
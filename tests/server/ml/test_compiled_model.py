@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from sklearn.pipeline import Pipeline
+from ml.compiled_model import CompiledForest
+from ml.model_registry import ModelHandle, ModelRegistry
+
+
+@pytest.mark.parametrize("n", [1, 7, 500])
+def test_compiled_matches_pipeline(fitted, n):
+    pipeline, X = fitted
+    compiled = CompiledForest(pipeline)
+    batch = X.iloc[:n]
+    assert np.array_equal(compiled.predict_proba(batch), pipeline.predict_proba(batch))
+    assert np.array_equal(compiled.predict(batch), pipeline.predict(batch))
+
+
+def test_compiled_accepts_columns_and_unknown_categories(fitted):
+    pipeline, X = fitted
+    compiled = CompiledForest(pipeline)
+    batch = X.iloc[:20].copy()
+    batch["season"] = "unknown"
+    columns = {column: batch[column].to_numpy() for column in batch}
+    assert np.array_equal(compiled.predict_proba(columns), pipeline.predict_proba(batch))
+
+
+def test_compiled_rejects_unsupported_pipeline(fitted):
+    pipeline, _ = fitted
+    with pytest.raises(ValueError):
+        CompiledForest(Pipeline(steps=[("classifier", pipeline.steps[-1][1])]))
+
+
+def test_saved_engine_is_memory_mapped(fitted, tmp_path):
+    pipeline, X = fitted
+    CompiledForest(pipeline).save(str(tmp_path))
+    engine = CompiledForest.load(str(tmp_path))
+    assert isinstance(engine.threshold, np.memmap)
+    assert np.array_equal(engine.predict_proba(X.iloc[:50]), pipeline.predict_proba(X.iloc[:50]))
+
+
+def test_handle_serves_mapped_registry_version(fitted, tmp_path):
+    pipeline, X = fitted
+    registry = ModelRegistry(str(tmp_path))
+    version = registry.save({"model": pipeline, "trained_at": "t"})
+    served = ModelHandle(registry, legacy_path="", mmap=True).current()
+    assert served.version == version and served.model is None and served.available
+    assert served.artifact["trained_at"] == "t"
+    assert np.array_equal(served.engine.predict(X.iloc[:50]), pipeline.predict(X.iloc[:50]))
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+from ml.dataset_cache import DatasetCache
+from ml.mushrooms_model import MushroomsModel, dataset_config
+from ml.search import dense_float32
+from test_data import make_training_frame
+
+
+def write_csv(path, seed=0):
+    make_training_frame(n=1500, seed=seed).to_csv(path, index=False)
+    return str(path)
+
+
+def test_round_trip_skips_ingestion(tmp_path, monkeypatch):
+    cache = DatasetCache(str(tmp_path / "cache"), quota_mb=100)
+    monkeypatch.setattr("ml.mushrooms_model.dataset_cache", cache)
+    path = write_csv(tmp_path / "train.csv")
+    key = cache.key(path, None, dataset_config())
+    assert cache.load(key) is None
+
+    first = MushroomsModel(path, cache_key=key)
+    dataset = first.prepare_dataset()
+    second = MushroomsModel("missing.csv", cache_key=key)
+    assert second.df is None
+    cached = second.dataset
+    pd.testing.assert_frame_equal(cached.X_train, dataset.X_train)
+    pd.testing.assert_series_equal(cached.y_test, dataset.y_test)
+    np.testing.assert_array_equal(cached.X_train_encoded, dataset.X_train_encoded)
+    assert isinstance(cached.X_train_encoded, np.memmap)
+    np.testing.assert_array_equal(dense_float32(cached.preprocessor.transform(cached.X_test)),
+                                  dataset.X_test_encoded)
+
+
+def test_key_depends_on_content_and_config(tmp_path):
+    cache = DatasetCache(str(tmp_path / "cache"))
+    first = write_csv(tmp_path / "a.csv", seed=0)
+    same = write_csv(tmp_path / "b.csv", seed=0)
+    other = write_csv(tmp_path / "c.csv", seed=1)
+    config = dataset_config()
+    assert cache.key(first, None, config) == cache.key(same, None, config)
+    assert cache.key(first, None, config) != cache.key(other, None, config)
+    assert cache.key(first, None, config) != cache.key(first, None, {**config, "num_pass": 0.5})
+
+
+def test_eviction_by_quota(tmp_path):
+    cache = DatasetCache(str(tmp_path / "cache"), quota_mb=100)
+    path = write_csv(tmp_path / "train.csv")
+    dataset = MushroomsModel(path).prepare_dataset()
+    cache.save("old", dataset)
+    size = cache.entries()[0][1]
+    cache.load("old")
+    cache.quota = size * 1.5
+    cache.save("new", dataset)
+    assert [entry[2].rsplit("/", 1)[-1] for entry in cache.entries()] == ["new"]
@@ -0,0 +1,57 @@
+import io
+import numpy as np
+import pandas as pd
+import pytest
+from ml.ingestion import read_training_data
+from ml.prepared_data import prepared_data, prepared_data_inference
+from test_data import make_training_frame
+
+
+def _csv(df: pd.DataFrame) -> io.BytesIO:
+    return io.BytesIO(df.to_csv(index=False).encode())
+
+
+def test_small_file_keeps_all_rows_without_nan():
+    df = make_training_frame(n=500)
+    df.loc[[3, 10, 42], "stem-height"] = np.nan
+    result = read_training_data(_csv(df), chunksize=64)
+    expected = df.dropna(subset=["stem-height"]).drop(columns=["id"])
+    assert list(result.index) == list(expected.index)
+    assert list(result.columns) == list(expected.columns)
+    for column in ["cap-diameter", "stem-height", "stem-width"]:
+        np.testing.assert_array_equal(result[column], expected[column])
+    assert (result["season"] == expected["season"]).all()
+    assert result["cap-shape"].dtype == object
+
+
+def test_sample_is_bounded_and_independent_of_chunking():
+    df = make_training_frame(n=3000)
+    first = read_training_data(_csv(df), chunksize=100, sample_size=250)
+    second = read_training_data(_csv(df), chunksize=1777, sample_size=250)
+    assert len(first) == 250
+    assert first.equals(second)
+    assert first.index.is_monotonic_increasing
+
+
+def test_text_stream_and_seed():
+    df = make_training_frame(n=1000)
+    text = io.StringIO(df.to_csv(index=False))
+    result = read_training_data(text, sample_size=100, random_state=7)
+    other = read_training_data(_csv(df), sample_size=100)
+    assert len(result) == 100
+    assert not result.index.equals(other.index)
+
+
+def test_area_matches_serving():
+    df = make_training_frame(n=500)
+    trained = prepared_data(read_training_data(_csv(df)))
+    served = prepared_data_inference({column: df[column].to_numpy() for column in df})
+    np.testing.assert_array_equal(trained["square-mushroom"], served["square-mushroom"][trained.index])
+
+
+def test_bom_and_empty_file():
+    df = make_training_frame(n=50)
+    result = read_training_data(io.BytesIO(df.to_csv(index=False).encode("utf-8-sig")))
+    assert list(result.columns) == list(df.drop(columns=["id"]).columns)
+    with pytest.raises(ValueError):
+        read_training_data(io.BytesIO(b""))
@@ -0,0 +1,58 @@
+import threading
+import numpy as np
+from ml.micro_batcher import MicroBatcher
+from ml.model_registry import ServedModel
+
+
+class Scorer:
+    def __init__(self):
+        self.calls = []
+        self.ready = threading.Event()
+
+    def __call__(self, served, prepared):
+        self.ready.wait(5)
+        values = prepared["x"]
+        self.calls.append(len(values))
+        return np.column_stack([values, values * 10])
+
+
+def test_concurrent_requests_are_coalesced():
+    scorer = Scorer()
+    batcher = MicroBatcher(scorer, max_size=64, max_wait_us=200_000)
+    served = ServedModel("v1")
+    results = {}
+
+    def request(i):
+        results[i] = batcher(served, {"x": np.array([float(i)])})
+
+    threads = [threading.Thread(target=request, args=(i,)) for i in range(16)]
+    for thread in threads:
+        thread.start()
+    scorer.ready.set()
+    for thread in threads:
+        thread.join()
+    for i in range(16):
+        np.testing.assert_array_equal(results[i], [[i, i * 10]])
+    assert sum(scorer.calls) == 16
+    assert len(scorer.calls) < 16
+    stats = batcher.stats()
+    assert stats["requests"] == 16
+    assert stats["max_batch_size"] > 1
+
+
+def test_disabled_batcher_scores_directly():
+    scorer = Scorer()
+    scorer.ready.set()
+    batcher = MicroBatcher(scorer, max_size=64, max_wait_us=0)
+    result = batcher(ServedModel("v1"), {"x": np.array([1.0, 2.0])})
+    assert result.shape == (2, 2)
+    assert batcher.stats()["batches"] == 0
+
+
+def test_errors_are_returned_to_callers():
+    def failing(served, prepared):
+        raise ValueError("boom")
+
+    batcher = MicroBatcher(failing, max_size=4, max_wait_us=1000)
+    future = batcher.submit(ServedModel("v1"), {"x": np.array([1.0])})
+    assert isinstance(future.exception(timeout=5), ValueError)
@@ -0,0 +1,86 @@
+import os
+import threading
+import time
+import pytest
+from unittest.mock import patch
+from ml.model_registry import ModelHandle, ModelRegistry
+
+
+def test_save_activate_and_rollback(tmp_path):
+    registry = ModelRegistry(str(tmp_path))
+    assert registry.active_version() is None
+    first = registry.save({"model": "first", "trained_at": "t1"})
+    second = registry.save({"model": "second", "trained_at": "t2"})
+    assert registry.active_version() == second
+    assert registry.load(second) == {"model": "second", "trained_at": "t2", "version": second}
+    assert [v["version"] for v in registry.versions()] == sorted([first, second])
+
+    assert registry.rollback() == first
+    assert registry.active_version() == first
+    registry.activate(second)
+    assert registry.active_version() == second
+    with pytest.raises(KeyError):
+        registry.activate("missing")
+    # во время записи временные файлы не остаются в каталоге
+    assert not [name for name in os.listdir(tmp_path) if name.startswith(".tmp-")]
+
+
+def test_rollback_without_history(tmp_path):
+    registry = ModelRegistry(str(tmp_path))
+    registry.save({"model": "only", "trained_at": "t"})
+    with pytest.raises(LookupError):
+        registry.rollback()
+
+
+def test_handle_swaps_to_new_active_version(tmp_path):
+    registry = ModelRegistry(str(tmp_path))
+    first = registry.save({"model": "first", "trained_at": "t1"})
+    handle = ModelHandle(registry, prepare=lambda model: model.upper(),
+                         legacy_path=str(tmp_path / "missing.pkl"), mmap=False)
+    served = handle.current()
+    assert (served.version, served.model, served.engine) == (first, "first", "FIRST")
+
+    second = registry.save({"model": "second", "trained_at": "t2"})
+    assert handle.refresh().version == second
+    # снимок, взятый до замены, не меняется
+    assert served.model == "first"
+
+
+def test_handle_without_models(tmp_path):
+    handle = ModelHandle(ModelRegistry(str(tmp_path)), legacy_path=str(tmp_path / "missing.pkl"))
+    assert handle.current().model is None
+
+
+def test_handle_deferred_load(tmp_path):
+    registry = ModelRegistry(str(tmp_path))
+    version = registry.save({"model": "first", "trained_at": "t1"})
+    handle = ModelHandle(registry, legacy_path=str(tmp_path / "missing.pkl"), mmap=False, load=False)
+    assert not handle.loaded
+    assert handle.current().version == version
+    assert handle.loaded
+    registry.save({"model": "second", "trained_at": "t2"})
+    # повторный load не перезагружает модель
+    assert handle.load().version == version
+
+
+def test_handle_loads_new_version_in_background(tmp_path):
+    registry = ModelRegistry(str(tmp_path))
+    first = registry.save({"model": "first", "trained_at": "t1"})
+    release = threading.Event()
+
+    def prepare(model):
+        if model == "second":
+            release.wait(5)
+        return model
+
+    handle = ModelHandle(registry, prepare=prepare, legacy_path=str(tmp_path / "missing.pkl"), mmap=False)
+    second = registry.save({"model": "second", "trained_at": "t2"})
+    with patch("ml.model_registry.REFRESH_INTERVAL", 0):
+        # пока новая версия загружается, запросы получают прежний снимок
+        assert handle.current().version == first
+        assert handle.current().version == first
+        release.set()
+        deadline = time.monotonic() + 5
+        while handle.current().version != second and time.monotonic() < deadline:
+            time.sleep(0.01)
+    assert handle.current().version == second
@@ -0,0 +1,44 @@
+import io
+import numpy as np
+import pytest
+from ml.mushrooms_model import MushroomsModel
+from ml.prepared_data import prepared_data
+from test_data import make_training_frame
+
+
+@pytest.fixture(scope="module")
+def base(fitted):
+    return {"model": fitted[0], "version": "base"}
+
+
+def new_data(seed: int):
+    return io.StringIO(make_training_frame(n=1500, seed=seed).to_csv(index=False))
+
+
+def test_update_model_appends_trees(base):
+    old_forest = base["model"][-1]
+    mushroom = MushroomsModel(new_data(7))
+    mushroom.update_model(base, n_estimators=6)
+    forest = mushroom.pipeline[-1]
+    assert len(forest.estimators_) == 31
+    assert forest.min_samples_split == old_forest.min_samples_split
+    # старые деревья и препроцессор не меняются, исходный артефакт не трогается
+    assert len(old_forest.estimators_) == 25
+    for old, new in zip(old_forest.estimators_, forest.estimators_):
+        np.testing.assert_array_equal(old.tree_.threshold, new.tree_.threshold)
+    X = prepared_data(make_training_frame(n=100, seed=9)).drop("class", axis=1)
+    np.testing.assert_array_equal(mushroom.pipeline[0].transform(X).toarray(),
+                                  base["model"][0].transform(X).toarray())
+    assert mushroom.metadata["base_version"] == "base"
+
+
+def test_update_model_retires_oldest_trees(base):
+    mushroom = MushroomsModel(new_data(8))
+    mushroom.update_model(base, n_estimators=6, max_estimators=10)
+    forest = mushroom.pipeline[-1]
+    assert len(forest.estimators_) == forest.n_estimators == 10
+    assert mushroom.metadata["trees_retired"] == 21
+    np.testing.assert_array_equal(forest.estimators_[0].tree_.threshold,
+                                  base["model"][-1].estimators_[21].tree_.threshold)
+    X = prepared_data(make_training_frame(n=100, seed=9)).drop("class", axis=1)
+    assert mushroom.pipeline.predict_proba(X).shape == (100, 2)
@@ -0,0 +1,68 @@
+import threading
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import MinMaxScaler
+from ml.parallel_inference import ParallelScorer, single_threaded
+from utils.metrics import inference_decisions, metrics
+
+
+def _score(calls):
+    def score(data):
+        calls.append(len(data["a"]))
+        return np.column_stack([data["a"], data["a"] * 2])
+    return score
+
+
+def test_small_batch_runs_inline():
+    metrics.clear()
+    calls = []
+    scorer = ParallelScorer(workers=4, min_rows=100, part_rows=10)
+    result = scorer(_score(calls), {"a": np.arange(50.0)})
+    assert calls == [50]
+    assert result.shape == (50, 2)
+    assert inference_decisions.value(mode="inline") == 1
+
+
+def test_large_batch_is_split_in_order():
+    metrics.clear()
+    calls = []
+    scorer = ParallelScorer(workers=3, min_rows=100, part_rows=10)
+    data = {"a": np.arange(1000.0)}
+    result = scorer(_score(calls), data)
+    assert sorted(calls) == [333, 333, 334]
+    np.testing.assert_array_equal(result[:, 0], data["a"])
+    assert inference_decisions.value(mode="parallel") == 1
+    # части не мельче part_rows
+    calls.clear()
+    scorer(_score(calls), {"a": np.arange(120.0)})
+    assert len(calls) == 3 and scorer.plan(120) == 3 and scorer.plan(25) == 1
+
+
+def test_busy_pool_degrades_to_fewer_parts():
+    metrics.clear()
+    scorer = ParallelScorer(workers=3, min_rows=100, part_rows=10)
+    started, release = threading.Event(), threading.Event()
+
+    def slow(data):
+        started.set()
+        release.wait(5)
+        return np.zeros((len(data["a"]), 2))
+
+    first = threading.Thread(target=scorer, args=(slow, {"a": np.arange(200.0)}))
+    first.start()
+    started.wait(5)
+    calls = []
+    scorer(_score(calls), {"a": np.arange(200.0)})
+    release.set()
+    first.join()
+    assert calls == [200]
+    assert inference_decisions.value(mode="degraded") == 1
+    assert scorer._free == 2
+
+
+def test_single_threaded_pipeline():
+    model = Pipeline([("scaler", MinMaxScaler()), ("classifier", RandomForestClassifier(n_jobs=-1))])
+    assert single_threaded(model) is model
+    assert model.get_params()["classifier__n_jobs"] == 1
+    assert single_threaded(MinMaxScaler()).get_params() == MinMaxScaler().get_params()
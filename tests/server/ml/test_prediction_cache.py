@@ -0,0 +1,80 @@
+import numpy as np
+from app.enums.cap_shape import CapShape
+from ml.prediction_cache import PredictionCache
+from ml.prepared_data import prepared_data_inference
+
+
+def columns(cap_shape, diameter=2.0):
+    return {
+        "cap-shape": [cap_shape],
+        "cap-diameter": [diameter],
+        "stem-height": [1.0],
+        "stem-width": [2.0],
+    }
+
+
+class Counter:
+    def __init__(self):
+        self.rows = 0
+
+    def __call__(self, prepared):
+        n = len(prepared["cap-shape"])
+        self.rows += n
+        return np.column_stack([np.full(n, 0.25), np.full(n, 0.75)])
+
+
+def test_equivalent_inputs_share_entry():
+    cache = PredictionCache(maxsize=10)
+    compute = Counter()
+    for value in ("x", CapShape.x, "Выпуклая"):
+        proba = cache.lookup("v1", prepared_data_inference(columns(value)), compute)
+        assert proba.shape == (1, 2)
+    assert compute.rows == 1
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 1
+
+
+def test_batch_computes_only_misses():
+    cache = PredictionCache(maxsize=10)
+    compute = Counter()
+    cache.lookup("v1", prepared_data_inference(columns("x")), compute)
+    batch = prepared_data_inference({
+        "cap-shape": ["x", "b", "x"],
+        "cap-diameter": [2.0, 2.0, 2.0],
+        "stem-height": [1.0, 1.0, 1.0],
+        "stem-width": [2.0, 2.0, 2.0],
+    })
+    proba = cache.lookup("v1", batch, compute)
+    assert proba.shape == (3, 2)
+    assert compute.rows == 2
+
+
+def test_lru_eviction_and_model_change():
+    cache = PredictionCache(maxsize=2)
+    compute = Counter()
+    for diameter in (1.0, 2.0, 3.0):
+        cache.lookup("v1", prepared_data_inference(columns("x", diameter)), compute)
+    stats = cache.stats()
+    assert stats["size"] == 2
+    assert stats["evictions"] == 1
+    cache.lookup("v2", prepared_data_inference(columns("x", 3.0)), compute)
+    stats = cache.stats()
+    assert stats["invalidations"] == 1
+    assert stats["size"] == 1
+    assert compute.rows == 4
+
+
+def test_ttl_expiration():
+    cache = PredictionCache(maxsize=10, ttl=1e-9)
+    compute = Counter()
+    cache.lookup("v1", prepared_data_inference(columns("x")), compute)
+    cache.lookup("v1", prepared_data_inference(columns("x")), compute)
+    assert compute.rows == 2
+    assert cache.stats()["expirations"] == 1
+
+
+def test_cached_rows_do_not_keep_batch_alive():
+    cache = PredictionCache(maxsize=10)
+    cache.lookup("v1", prepared_data_inference(columns("x")), Counter())
+    (row, _), = cache._data.values()
+    assert row.base is None
@@ -0,0 +1,33 @@
+import numpy as np
+from app.enums.cap_shape import CapShape
+from app.enums.habitat import Habitat
+from app.enums.season import Season
+from ml.prepared_data import prepared_data, prepared_data_inference
+from test_data import make_training_frame
+
+
+def test_inference_matches_prepared_data():
+    df = make_training_frame(n=3000, seed=1).drop(columns=["gill-spacing"])
+    expected = prepared_data(df)
+    result = prepared_data_inference({column: df[column].to_numpy() for column in df})
+    assert list(result) == list(expected.columns)
+    for column in expected:
+        np.testing.assert_array_equal(result[column], expected[column].to_numpy())
+        assert result[column].dtype == expected[column].dtype
+
+
+def test_inference_maps_enum_members_and_labels_to_codes():
+    columns = {
+        "cap-shape": [CapShape.x, "Коническая", "d"],
+        "habitat": [Habitat.d, "🌱 Трава", Habitat.o],
+        "season": [Season.a, "☀️Лето", "w"],
+        "cap-diameter": [1.0, 2.0, 3.0],
+        "stem-height": [1.0, 1.0, 1.0],
+        "stem-width": [2.0, 2.0, 2.0],
+    }
+    result = prepared_data_inference(columns)
+    assert list(result["cap-shape"]) == ["x", "c", "oth"]
+    assert list(result["habitat"]) == ["d", "g", "o"]
+    assert list(result["season"]) == ["a", "s", "w"]
+    np.testing.assert_array_equal(
+        result["square-mushroom"], np.round(np.pi * (np.array([1.0, 2.0, 3.0]) / 2) ** 2 + 2.0, 2))
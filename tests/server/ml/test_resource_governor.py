@@ -0,0 +1,60 @@
+import threading
+import time
+from ml.resource_governor import ServingPressure, TrainingGovernor, TrainingThrottle, training_cpus
+from utils.metrics import http_duration, http_in_flight, metrics
+
+
+class FakePressure:
+    def __init__(self):
+        self.in_flight = 0
+
+    def sample(self) -> dict:
+        return {"in_flight": self.in_flight, "latency_ms": 0.0}
+
+
+def test_throttle_pauses_and_caps_pause_length():
+    control, pressure = {}, FakePressure()
+    throttle = TrainingThrottle(control, pressure, in_flight=3, max_pause=10, window=0)
+    assert not throttle.update(now=0)
+    pressure.in_flight = 3
+    assert throttle.update(now=1) and control["paused"] and control["pauses"] == 1
+    pressure.in_flight = 0
+    assert not throttle.update(now=3)
+    assert control["paused_seconds"] == 2
+    # пауза не длиннее max_pause, после неё столько же без пауз
+    pressure.in_flight = 5
+    assert throttle.update(now=4)
+    assert not throttle.update(now=14)
+    assert not throttle.update(now=20)
+    assert throttle.update(now=24)
+    throttle.resume(now=25)
+    assert throttle.to_dict() == {"paused": False, "paused_seconds": 13, "pauses": 3}
+    assert not TrainingThrottle({}, pressure).update()
+
+
+def test_serving_pressure_from_metrics():
+    metrics.clear()
+    pressure = ServingPressure()
+    http_in_flight.inc(route="/predict/")
+    http_in_flight.inc(route="/fit/")
+    http_duration.observe(0.2, method="GET", route="/predict/")
+    http_duration.observe(0.4, method="POST", route="/predict/predict_proba_batch")
+    http_duration.observe(9, method="GET", route="/metrics")
+    sample = pressure.sample()
+    assert sample["in_flight"] == 1
+    assert abs(sample["latency_ms"] - 300) < 1e-6
+    assert pressure.sample()["latency_ms"] == 0.0
+    metrics.clear()
+
+
+def test_governor_waits_while_paused():
+    control = {"paused": True, "paused_seconds": 0.0, "pauses": 1}
+    governor = TrainingGovernor(control, cpus=2)
+    threading.Timer(0.3, control.update, args=({"paused": False, "paused_seconds": 0.3},)).start()
+    started = time.perf_counter()
+    governor.checkpoint()
+    assert time.perf_counter() - started >= 0.25
+    summary = governor.summary()
+    assert summary["cpus"] == 2 and summary["pauses"] == 1
+    assert summary["waited_seconds"] >= 0.25
+    assert training_cpus(3) == 3 and training_cpus(0) >= 1
@@ -0,0 +1,102 @@
+import pytest
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import f1_score, make_scorer
+from sklearn.model_selection import KFold
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import MinMaxScaler, OneHotEncoder
+from ml.prepared_data import prepared_data
+from ml.search import HyperparameterSearch
+from test_data import make_training_frame
+
+PARAM_GRID = {
+    "n_estimators": [9],
+    "max_depth": [None, 4, 8],
+    "min_samples_split": [2, 10, 30],
+}
+
+
+@pytest.fixture(scope="module")
+def data():
+    df = prepared_data(make_training_frame(n=1500))
+    return df.drop("class", axis=1), df["class"]
+
+
+def make_search(X, **kwargs):
+    kwargs.setdefault("budget", 0)
+    cat = [i for i in X.select_dtypes(include="object").columns]
+    preprocessor = ColumnTransformer(transformers=[
+        ("num", Pipeline(steps=[("scaler", MinMaxScaler())]), ["square-mushroom"]),
+        ("cat", Pipeline(steps=[("o_encoder", OneHotEncoder(handle_unknown="ignore"))]), cat),
+    ])
+    pipeline = Pipeline(steps=[("preprocessor", preprocessor),
+                               ("classifier", RandomForestClassifier(random_state=42))])
+    return HyperparameterSearch(pipeline, PARAM_GRID, KFold(n_splits=3, shuffle=True, random_state=42),
+                                make_scorer(f1_score), n_jobs=1, **kwargs)
+
+
+@pytest.mark.parametrize("strategy, evaluated", [("grid", 9), ("capped", 4), ("random", 4)])
+def test_strategies(data, strategy, evaluated):
+    events = []
+    search = make_search(data[0], strategy=strategy, n_candidates=4,
+                         progress=lambda phase, **info: events.append(phase))
+    search.fit(*data)
+    assert len(search.results) == evaluated
+    assert len(events) == evaluated * 3 == search.planned_fits()
+    best = max(search.results, key=lambda r: r["mean_score"])
+    assert search.best_params_ == best["params"]
+    assert all(r["fit_time"] > 0 for r in search.results)
+
+
+@pytest.mark.parametrize("resource", ["n_samples", "n_estimators"])
+def test_halving(data, resource):
+    search = make_search(data[0], strategy="halving", resource=resource, factor=3)
+    search.fit(*data)
+    rounds = [r["round"] for r in search.results]
+    assert rounds == [0] * 9 + [1] * 3 + [2]
+    assert search.best_params_ == search.results[-1]["params"]
+    if resource == "n_samples":
+        assert search.results[0]["resource"]["n_samples"] < search.results[-1]["resource"]["n_samples"]
+    else:
+        assert search.results[0]["resource"]["n_estimators"] == 1
+        assert search.results[-1]["resource"]["n_estimators"] == 9
+
+
+def test_budget_stops_search(data):
+    search = make_search(data[0], strategy="grid", budget=1e-6, budget_type="cpu")
+    search.fit(*data)
+    summary = search.summary()
+    assert summary["stopped_by_budget"]
+    assert 0 < len(summary["candidates"]) < 9
+    assert summary["best_params"] is not None
+
+
+def test_budget_stop_between_rounds_keeps_last_round(data):
+    search = make_search(data[0], strategy="halving", resource="n_estimators", factor=3,
+                         budget=1e9, budget_type="cpu")
+
+    def checkpoint():
+        # бюджет кончается перед последним раундом
+        if len(search.results) == 12:
+            search.budget = 1e-9
+    search.checkpoint = checkpoint
+    search.fit(*data)
+    assert search.stopped_by_budget
+    assert [r["round"] for r in search.results] == [0] * 9 + [1] * 3
+    best = max(search.results[9:], key=lambda r: r["mean_score"])
+    assert search.best_params_ == best["params"]
+
+
+def test_unknown_strategy(data):
+    with pytest.raises(ValueError):
+        make_search(data[0], strategy="bayes")
+
+
+def test_cached_preprocessing_matches_pipeline(data):
+    cached = make_search(data[0], strategy="halving", resource="n_samples").fit(*data)
+    plain = make_search(data[0], strategy="halving", resource="n_samples",
+                        cache_preprocessing=False).fit(*data)
+    assert [r["mean_score"] for r in cached.results] == [r["mean_score"] for r in plain.results]
+    assert cached.best_params_ == plain.best_params_
+    assert cached.summary()["preprocess_time"] > 0
+    assert plain.summary()["preprocess_time"] == 0
@@ -0,0 +1,68 @@
+import numpy as np
+from ml.compiled_model import CompiledForest
+from ml.model_registry import ModelHandle, ModelRegistry
+from ml.step_function import StepFunctionForest
+
+
+def repeat_profiles(X, profiles: int, n: int, seed: int = 0):
+    """n строк с profiles комбинациями категорий из X и случайной площадью"""
+    rng = np.random.default_rng(seed)
+    batch = X.iloc[rng.integers(0, profiles, n)].reset_index(drop=True)
+    batch["square-mushroom"] = np.round(rng.uniform(0, X["square-mushroom"].max() * 1.2, n), 2)
+    return batch
+
+
+def test_step_function_matches_pipeline(fitted):
+    pipeline, X = fitted
+    step = StepFunctionForest(CompiledForest(pipeline), min_hits=1, build_budget_ms=1e6)
+    batch = repeat_profiles(X, 5, 2000)
+    assert np.array_equal(step.predict_proba(batch), pipeline.predict_proba(batch))
+    # значения точно на порогах и соседние с ними float32
+    breaks, _ = step.build(step._codes(batch.iloc[:1], 1)[0])
+    scaled = np.concatenate([breaks, np.nextafter(breaks.astype(np.float32), np.float32(np.inf))])
+    edge = batch.iloc[np.zeros(scaled.size, dtype=int)].reset_index(drop=True)
+    edge["square-mushroom"] = (scaled.astype(np.float64) - step.shift) / step.scale
+    assert np.array_equal(step.predict_proba(edge), pipeline.predict_proba(edge))
+    assert step.stats()["direct"] == 0
+    assert np.array_equal(step.predict(batch), pipeline.predict(batch))
+
+
+def test_step_function_unknown_categories(fitted):
+    pipeline, X = fitted
+    step = StepFunctionForest(CompiledForest(pipeline), min_hits=1)
+    batch = repeat_profiles(X, 3, 50)
+    batch["season"] = "unknown"
+    columns = {column: batch[column].to_numpy() for column in batch}
+    assert np.array_equal(step.predict_proba(columns), pipeline.predict_proba(batch))
+
+
+def test_step_function_table_policy(fitted):
+    pipeline, X = fitted
+    engine = CompiledForest(pipeline)
+    calls = []
+
+    def fallback(columns):
+        calls.append(len(columns["square-mushroom"]))
+        return engine.predict_proba(columns)
+
+    step = StepFunctionForest(engine, max_size=1, min_hits=2, fallback=fallback)
+    first, second = X.iloc[[0]], X.iloc[[1]]
+    step.predict_proba(first)
+    assert calls == [1] and step.stats()["builds"] == 0
+    step.predict_proba(first)
+    assert step.stats()["builds"] == 1 and step.stats()["hits"] == 1
+    # таблица на одну комбинацию: вторая вытесняет первую
+    step.predict_proba(second)
+    step.predict_proba(second)
+    step.predict_proba(first)
+    assert step.stats()["size"] == 1 and calls == [1, 1, 1]
+
+
+def test_handle_accelerates_mapped_engine(fitted, tmp_path):
+    pipeline, X = fitted
+    registry = ModelRegistry(str(tmp_path))
+    registry.save({"model": pipeline, "trained_at": "t"})
+    served = ModelHandle(registry, legacy_path="", mmap=True, accelerate=StepFunctionForest).current()
+    assert isinstance(served.engine, StepFunctionForest)
+    batch = repeat_profiles(X, 2, 100)
+    assert np.array_equal(served.engine.predict_proba(batch), pipeline.predict_proba(batch))
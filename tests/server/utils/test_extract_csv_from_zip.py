@@ -0,0 +1,48 @@
+import bz2
+import gzip
+import io
+import lzma
+import zipfile
+import pytest
+from fastapi import UploadFile
+from ml.ingestion import read_training_data
+from utils.extract_csv_from_zip import extract_csv_from_zip, open_csv_stream
+from test_data import make_training_frame
+
+CSV = make_training_frame(n=200).to_csv(index=False).encode()
+OTHER_CSV = make_training_frame(n=50, seed=3).to_csv(index=False).encode()
+
+
+def _zip(members: dict) -> io.BytesIO:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as z:
+        for name, content in members.items():
+            z.writestr(name, content)
+    buffer.seek(0)
+    return buffer
+
+
+def test_zip_member_is_streamed():
+    upload = UploadFile(file=_zip({"readme.txt": b"-", "train.csv": CSV}), filename="data.zip")
+    stream = extract_csv_from_zip(upload)
+    assert not isinstance(stream, io.BytesIO)
+    assert stream.read() == CSV
+
+
+def test_zip_member_selection():
+    archive = _zip({"a.csv": CSV, "b.csv": OTHER_CSV})
+    assert open_csv_stream(archive, "data.zip", "b.csv").read() == OTHER_CSV
+    assert open_csv_stream(archive, "data.zip", "missing.csv") is None
+    assert open_csv_stream(archive, "data.zip").read() == CSV
+
+
+@pytest.mark.parametrize("ext, compress", [("gz", gzip.compress), ("bz2", bz2.compress),
+                                           ("xz", lzma.compress)])
+def test_compressed_csv(ext, compress):
+    stream = open_csv_stream(io.BytesIO(compress(CSV)), f"train.csv.{ext}")
+    assert len(read_training_data(stream)) == 200
+
+
+def test_unsupported_extension():
+    with pytest.raises(ValueError):
+        open_csv_stream(io.BytesIO(CSV), "train.parquet")
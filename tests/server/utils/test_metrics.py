@@ -0,0 +1,53 @@
+from unittest.mock import patch
+from urllib.parse import urlencode
+from fastapi.testclient import TestClient
+from main import app
+from ml.model_registry import ServedModel
+from utils.metrics import Counter, Histogram, MetricsRegistry, metrics
+from test_data import test_data
+
+client = TestClient(app)
+
+
+def test_render_text_format():
+    registry = MetricsRegistry(enabled=True)
+    requests = registry.add(Counter("requests_total", "Запросы", ("route",)))
+    latency = registry.add(Histogram("latency_seconds", "Задержка", ("route",), buckets=(0.1, 1)))
+    requests.inc(route="/a")
+    requests.inc(2, route="/a")
+    latency.observe(0.05, route="/a")
+    latency.observe(0.5, route="/a")
+    latency.observe(5, route="/a")
+    text = registry.render()
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{route="/a"} 3' in text
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{route="/a",le="1"} 2' in text
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in text
+    assert 'latency_seconds_count{route="/a"} 3' in text
+    assert latency.sum(route="/a") == 5.55
+    assert MetricsRegistry(enabled=False).render() == ""
+
+
+def test_metrics_endpoint_records_routes_and_stages():
+    metrics.clear()
+    with patch("app.routes.predictions.model_handle.current", return_value=ServedModel()):
+        assert client.get("/predict/", params=test_data[0]).status_code == 200
+        columns = {key: [row[key] for row in test_data] for key in test_data[0]}
+        assert client.post("/predict/predict_proba_columns", json=columns).status_code == 200
+        query = urlencode([(key, value) for row in test_data for key, value in row.items()])
+        assert client.get(f"/predict/predict_proba_batch?{query}").status_code == 200
+    client.get("/no/such/path")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+    assert 'mushrooms_http_requests_total{method="GET",route="/predict/",status="200"} 1' in text
+    assert 'route="unmatched",status="404"' in text
+    assert 'mushrooms_http_requests_in_flight{route="/predict/"} 0' in text
+    for stage in ("validation", "frame_build", "preprocessing", "serialization"):
+        assert f'mushrooms_prediction_stage_seconds_count{{route="/predict/",stage="{stage}"}} 1' in text
+    assert 'mushrooms_prediction_rows_count{route="/predict/predict_proba_columns"} 1' in text
+    assert ('mushrooms_prediction_stage_seconds_count'
+            '{route="/predict/predict_proba_batch",stage="frame_build"} 1') in text
+    assert f'mushrooms_prediction_rows_sum{{route="/predict/predict_proba_columns"}} {len(test_data)}' in text
@@ -0,0 +1,95 @@
+import os
+import pstats
+import threading
+import time
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from main import app
+from ml.model_registry import ServedModel
+from utils.profiling import FOLDED, PSTATS, ProfileStore, StackSampler, nested_codes, profile_call, profile_store
+from test_data import test_data
+
+client = TestClient(app)
+
+
+def busy_loop(seconds: float) -> int:
+    total, deadline = 0, time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        total += 1
+    return total
+
+
+def test_sampler_keeps_only_selected_stacks():
+    codes = nested_codes(busy_loop)
+    sampler = StackSampler(lambda: codes, interval_ms=1).start()
+    busy_loop(0.1)
+    sampler.stop()
+    assert sampler.samples > 0
+    lines = sampler.folded().splitlines()
+    assert lines and all("test_profiling:busy_loop" in line for line in lines)
+
+
+def test_sampler_accept_filters_frames():
+    codes = nested_codes(busy_loop)
+    other = threading.Thread(target=busy_loop, args=(0.2,))
+    sampler = StackSampler(lambda: codes, interval_ms=1,
+                           accept=lambda frame: frame.f_locals.get("seconds") == 0.1).start()
+    other.start()
+    busy_loop(0.1)
+    other.join()
+    sampler.stop()
+    lines = sampler.folded().splitlines()
+    assert lines and all("_bootstrap" not in line for line in lines)
+
+
+def test_forget_old_tolerates_removed_profiles(tmp_path):
+    store = ProfileStore(str(tmp_path), keep=1)
+    for profile_id in ("a", "b", "c"):
+        os.makedirs(tmp_path / profile_id)
+        (tmp_path / profile_id / "meta.json").write_text("{}")
+    real_listdir = os.listdir
+
+    def listdir(path):
+        # профиль удалил другой воркер между listdir и удалением
+        if os.path.basename(path) == "a":
+            raise FileNotFoundError(path)
+        return real_listdir(path)
+
+    with patch("utils.profiling.os.listdir", side_effect=listdir):
+        store._forget_old()
+    assert sorted(real_listdir(tmp_path)) == ["a", "c"]
+
+
+def test_profile_call_modes():
+    result, profile_id = profile_call(lambda: busy_loop(0.05), "cprofile", {"case": "test"}, kind="test")
+    assert result > 0
+    meta = profile_store.get(profile_id)
+    assert meta["kind"] == "test" and meta["profiler"] == "cprofile" and meta["case"] == "test"
+    stats = pstats.Stats(profile_store.file(profile_id, PSTATS))
+    assert any(name == "busy_loop" for _, _, name in stats.stats)
+
+    _, profile_id = profile_call(lambda: busy_loop(0.05), "sample")
+    assert "busy_loop" in open(profile_store.file(profile_id, FOLDED)).read()
+
+
+def test_request_profiled_only_with_token():
+    with patch("utils.profiling.PROFILE_TOKEN", "secret"), \
+            patch("app.routes.predictions.model_handle.current", return_value=ServedModel()):
+        response = client.get("/predict/", params=test_data[0])
+        assert response.status_code == 200
+        assert "x-profile-id" not in response.headers
+
+        response = client.get("/predict/", params=test_data[0], headers={"X-Mushrooms-Profile": "secret"})
+        assert response.status_code == 200
+        profile_id = response.headers["x-profile-id"]
+
+        assert client.get(f"/profiles/{profile_id}").status_code == 403
+        meta = client.get(f"/profiles/{profile_id}", headers={"X-Mushrooms-Profile": "secret"}).json()
+        assert meta["route"] == "/predict/" and meta["status"] == 200
+        folded = client.get(f"/profiles/{profile_id}/{FOLDED}", headers={"X-Mushrooms-Profile": "secret"})
+        assert folded.status_code == 200
+        listed = client.get("/profiles/", headers={"X-Mushrooms-Profile": "secret"}).json()
+        assert profile_id in [item["id"] for item in listed]
+
+    assert client.get("/profiles/").status_code == 403
+    assert client.get(f"/profiles/{profile_id}", headers={"X-Mushrooms-Profile": ""}).status_code == 403
@@ -0,0 +1,39 @@
+import time
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+from app.routes.predictions import warm_up, warmup_columns
+from utils.startup import StartupState
+
+
+def test_startup_phases():
+    state = StartupState(time.perf_counter())
+    state.finish_phase("import")
+    state.finish_phase("model_load")
+    assert not state.to_dict()["ready"]
+    state.set_ready()
+    result = state.to_dict()
+    assert result["ready"] and list(result["phase_seconds"]) == ["import", "model_load"]
+    assert result["ready_seconds"] >= sum(result["phase_seconds"].values()) - 1e-3
+
+
+@pytest.mark.usefixtures("served_model")
+def test_warm_up():
+    columns = warmup_columns(30)
+    assert all(len(values) == 30 for values in columns.values())
+    assert warm_up(4) == 5
+    assert warm_up(0) == 0
+
+
+def test_health_endpoints():
+    with TestClient(app) as client:
+        assert client.get("/health/live").json() == {"status": "ok"}
+        deadline = time.time() + 60
+        response = client.get("/health/ready")
+        while response.status_code == 503 and time.time() < deadline:
+            time.sleep(0.05)
+            response = client.get("/health/ready")
+        assert response.status_code == 200
+        body = response.json()
+        assert body["ready"] and {"import", "model_load", "warmup"} <= set(body["phase_seconds"])
+        assert 'mushrooms_startup_seconds{phase="ready"}' in client.get("/metrics").text
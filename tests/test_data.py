@@ -64,4 +64,42 @@ test_data = [{
 incomplete_data = {
     "cap_shape": "Нисходящая"
     # остальное поле отсутствует
-}
\ No newline at end of file
+}
+
+def make_training_frame(n: int = 2000, seed: int = 0):
+    """Синтетический датафрейм в формате обучающего CSV
+
+    Args:
+        n (int, optional): количество строк. По умолчанию 2000.
+        seed (int, optional): зерно генератора. По умолчанию 0.
+
+    Returns:
+        pd.DataFrame: данные с исходными кодами категорий
+    """
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    categories = {
+        "cap-shape": ["x", "f", "s", "b", "o", "c", "p", "d"],
+        "cap-surface": ["t", "d", "h", "s", "y", "k", "g", "w", None],
+        "cap-color": ["n", "w", "y", "p", "g", "e", "b", "o", "r"],
+        "does-bruise-or-bleed": ["t", "f"],
+        "gill-attachment": ["a", "e", "p", "x", "d", "s", None],
+        "gill-spacing": ["c", "d", None, None, None],
+        "gill-color": ["n", "w", "y", "b", "p", "g", "e", "o", "k"],
+        "stem-color": ["n", "w", "y", "e", "k"],
+        "has-ring": ["t", "f"],
+        "ring-type": ["f", "z", "e", "p", None],
+        "habitat": ["d", "g", "l", "m", "p"],
+        "season": ["a", "u", "w", "s"],
+    }
+    df = pd.DataFrame({"id": np.arange(n)})
+    for column, values in categories.items():
+        df[column] = rng.choice(np.array(values, dtype=object), n)
+    df["cap-diameter"] = np.round(rng.uniform(0.5, 20, n), 2)
+    df["stem-height"] = np.round(rng.uniform(0, 20, n), 2)
+    df["stem-width"] = np.round(rng.uniform(0, 30, n), 2)
+    signal = (df["cap-diameter"] > 8) ^ (df["season"] == "a") ^ (df["habitat"] == "d")
+    df["class"] = np.where(rng.random(n) < 0.85, signal, ~signal).astype(int)
+    return df